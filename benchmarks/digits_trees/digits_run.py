@@ -10,11 +10,9 @@ import emlearn_trees
 
 
 def emlearn_create():
-    model = emlearn_trees.new(10, 1000, 10)
-
     # Load a CSV file with the model
     with open('eml_digits.csv', 'r') as f:
-        emlearn_trees.load_model(model, f)
+        model = emlearn_trees.load(f)
     return model
 
 def argmax(l):
@@ -71,14 +71,19 @@ def run_one(real, imag, n, repeat=10):
     # emlearn
     if emlearn:        
         fft2 = emlearn_fft.FFT(n)
-        emlearn_fft.fill(fft2, n)
         gc.collect()
 
-        start = time.ticks_us()
-        for _ in range(repeat):
-            out = fft2.run(real, imag)
-        d = ((time.ticks_diff(time.ticks_us(), start)) / repeat) / 1000.0 # ms
-        print('emlearn', n, d)
+        kernels = [
+            ('radix2', emlearn_fft.KERNEL_RADIX2),
+            ('radix4', emlearn_fft.KERNEL_RADIX4),
+        ]
+        for name, kernel in kernels:
+            fft2.setkernel(kernel)
+            start = time.ticks_us()
+            for _ in range(repeat):
+                out = fft2.run(real, imag)
+            d = ((time.ticks_diff(time.ticks_us(), start)) / repeat) / 1000.0 # ms
+            print('emlearn-'+name, n, d)
 
     gc.collect()
 
@@ -30,36 +30,16 @@ def quantize_image(img, quant, palette, rowstride):
 
     quantize_image_inner(img, quant, palette, int(rowstride), int(rows))
 
-@micropython.viper
 def quantize_image_inner(img, quant, palette, rowstride : int, rows : int):
     """
-    Assumes all inputs to be sane. To support viper code emitter
+    Assumes all inputs to be sane.
     """
 
-    rgb = bytearray([0, 0, 0])
-    #img_view = memoryview(img)
-
-    for row in range(rows):
-        row_offset = (row*rowstride)
-        for col in range(rowstride):
-            # input data
-            # PERF: just reading the pixel takes half of the execution time :(
-            i = 3 * (row_offset + col)
-            # doing the 3 bytes separately is fastest
-            rgb[0] = img[i+0]
-            rgb[1] = img[i+1]
-            rgb[2] = img[i+2]
-            # XXX: using a slice crashes/hangs with @micropython.viper
-            #rgb = img_view[i:i+3]
-            # slower than separate bytes
-            #rgb = img[i:i+3]
-
-            # find closest value in palette
-            palette_idx, distance = emlearn_kmeans.euclidean_argmin(palette, rgb)
-            #palette_idx, distance = 0, 0
-
-            o = row_offset + col
-            quant[o] = palette_idx
+    # Find closest value in palette, for all the pixels in one go
+    pixels = rows * rowstride
+    channels = 3
+    img_view = memoryview(img)[0:pixels*channels]
+    emlearn_kmeans.assign(img_view, palette, quant, channels)
 
 
 def make_image(width, height, channels=3, typecode='B', value=0):
@@ -181,10 +181,9 @@ def main():
     model_path = f'{DATASET}.trees.csv'
     class_index_to_name = { v: k for k, v in classname_index.items() }
 
-    # Load a CSV file with the model
-    model = emlearn_trees.new(10, 1000, 10)
+    # Load a CSV file with the model. Sized to fit the model exactly
     with open(model_path, 'r') as f:
-        emlearn_trees.load_model(model, f)
+        model = emlearn_trees.load(f)
 
     mpu = MPU6886(I2C(0, sda=21, scl=22, freq=100000))
 
@@ -203,9 +202,8 @@ def main():
     y_window = empty_array('h', window_length)
     z_window = empty_array('h', window_length)
 
-    features_typecode = timebased.DATA_TYPECODE
-    n_features = timebased.N_FEATURES
-    features = array.array(features_typecode, (0 for _ in range(n_features)))
+    # Preallocated, so no allocation is needed per window
+    features = array.array('f', (0.0 for _ in range(timebased.N_FEATURES)))
     out = array.array('f', range(model.outputs()))
 
     prediction_no = 0
@@ -230,8 +228,9 @@ def main():
                 copy_array_into(windower.z_values, z_window)
 
                 ff = timebased.calculate_features_xyz((x_window, y_window, z_window))
+                # Passed as float, to avoid converting each feature to int in Python
                 for i, f in enumerate(ff):
-                    features[i] = int(f)
+                    features[i] = f
 
                 # Cun classifier
                 #print(features)
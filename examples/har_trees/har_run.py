@@ -6,18 +6,8 @@ import npyfile
 import emlearn_trees
 import timebased
 
-def argmax(arr):
-    idx_max = 0
-    value_max = arr[0]
-    for i in range(1, len(arr)):
-        if arr[i] > value_max:
-            value_max = arr[i]
-            idx_max = i
-
-    return idx_max
-
 def har_load_test_data(path,
-        skip_samples=0, limit_samples=None):
+        skip_samples=0, limit_samples=None, batch_size=1):
  
     n_features = timebased.N_FEATURES
 
@@ -43,18 +33,18 @@ def har_load_test_data(path,
                 # Number of labels should match number of data items
                 assert data.shape[0] == labels.shape[0] 
 
-                # Read data and label for one image at a time
-                data_chunk = n_features
+                # Read data and labels for batch_size samples at a time
+                data_chunk = n_features * batch_size
                 sample_count = 0
 
-                label_chunks = labels.read_data_chunks(1, offset=1*skip_samples)
-                data_chunks = data.read_data_chunks(data_chunk, offset=data_chunk*skip_samples)
+                label_chunks = labels.read_data_chunks(batch_size, offset=1*skip_samples)
+                data_chunks = data.read_data_chunks(data_chunk, offset=n_features*skip_samples)
 
                 for l_arr, arr in zip(label_chunks, data_chunks):
 
                     yield arr, l_arr
 
-                    sample_count += 1
+                    sample_count += len(l_arr)
                     if limit_samples is not None and sample_count > limit_samples:
                         break
 
@@ -62,32 +52,34 @@ def har_load_test_data(path,
 
 def main():
 
-    model = emlearn_trees.new(10, 1000, 10)
-
     dataset = 'uci_har'
     #dataset = 'har_exercise_1'
 
     model_path = f'{dataset}.trees.csv'
 
-    # Load a CSV file with the model
+    # Load a CSV file with the model. Sized to fit the model exactly
     with open(model_path, 'r') as f:
-        emlearn_trees.load_model(model, f)
+        model = emlearn_trees.load(f)
 
-    out = array.array('f', range(model.outputs()))
+    batch_size = 32
+    out = array.array('B', range(batch_size))
 
     errors = 0
     total = 0
     data_path = f'{dataset}.testdata.npz'
     print('har-run-load', data_path)
-    for features, labels in har_load_test_data(data_path):
-
-        assert len(labels) == 1
-        label = labels[0]
-        model.predict(features, out)
-        result = argmax(out)
-        if result != label:
-            errors += 1
-        total += 1
+    for features, labels in har_load_test_data(data_path, batch_size=batch_size):
+
+        if len(labels) != len(out):
+            # last batch may be smaller
+            out = array.array('B', range(len(labels)))
+
+        # Predict most probable class for all samples in batch
+        model.predict_batch(features, out)
+        for result, label in zip(out, labels):
+            if result != label:
+                errors += 1
+            total += 1
 
         #print(result, label)
 
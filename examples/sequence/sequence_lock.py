@@ -19,7 +19,7 @@ class SequenceLock():
     
     def __init__(self,
         sequence_length=6,
-        model_path='sequence_model.csv',
+        model_path='sequence_model.bin',
         unlock_time=3000,
         ticks=-1):
 
@@ -58,28 +58,17 @@ class SequenceLock():
         assert self.model_path
         self._reset_model()
 
-        with open(self.model_path, 'r') as f:
-            for line in f:
-                line = line.rstrip('\r')
-                line = line.rstrip('\n')
-                tok = line.split(',')
-                values = [ int(v) for v in tok ]
-                #print('load-model-line', values)
-                a = array.array('h', values)
-                self.model.additem(a, 0)
+        with open(self.model_path, 'rb') as f:
+            data = f.read()
+        self.model.load_from(data)
 
     def save_model(self):
         assert self.model_path
-        features = self.sequence_length-1
 
-        with open(self.model_path, 'w') as f:
-            for n in range(self.training_examples):
-                item = array.array('h', [0] * features)
-                self.model.getitem(n, item)
-                values = ','.join([ str(v) for v in item ])
-                #print('save-model-line', values)
-                f.write(values)
-                f.write('\n')
+        data = bytearray(self.model.savesize())
+        self.model.save_into(data)
+        with open(self.model_path, 'wb') as f:
+            f.write(data)
 
 
     def run(self, t, event):
@@ -193,7 +182,10 @@ class SequenceLock():
         
         items = self.training_examples
         features = self.sequence_length-1
-        self.model = emlearn_neighbors.new(items, features, items)
+        # Durations are stored as int8, in steps of 2**4=16 ms, up to 2 seconds.
+        # Uses half the memory of int16, and distances are still in milliseconds
+        # k is the number of items, so getresult() gives the distances to all of them
+        self.model = emlearn_neighbors.new(items, features, items, 8, 4)
 
         # XXX: could be dropped if emlearn_neighbors allowed accessing n_items
         self.training_items = 0 
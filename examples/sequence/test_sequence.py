@@ -12,7 +12,7 @@ def test_startup_no_model():
     assert lock.state == TRAINING_STATE, lock
 
 def test_startup_with_model():
-    model_path = 'foo_model.csv'
+    model_path = 'foo_model.bin'
     lock = SequenceLock(model_path=model_path)
 
     # initial state
@@ -32,7 +32,7 @@ def test_mode_switch():
 def test_training():     
     # start without model
 
-    model_path = 'train_save_model.csv'
+    model_path = 'train_save_model.bin'
     if file_exists(model_path):
         os.unlink(model_path)
 
@@ -63,7 +63,7 @@ def test_training():
     assert model_exists
 
 def test_unlock():
-    model_path = 'foo_model.csv'
+    model_path = 'foo_model.bin'
     lock = SequenceLock(model_path=model_path)
     assert lock.state == LOCKED_STATE, lock
 
@@ -29,9 +29,12 @@ class AccelerometerClassifier():
         # Setup FFT
         fft_length = self.window_length
         self.fft = emlearn_fft.FFT(fft_length)
-        emlearn_fft.fill(self.fft, fft_length)
         self.fft_real = array.array('f', (0 for _ in range(fft_length)))
-        self.fft_imag = array.array('f', (0 for _ in range(fft_length)))
+        self.fft_imag = array.array('f', (0 for _ in range(fft_length//2+1)))
+        # FFT bins used as features. A view, so no copy is made
+        self.fft_bins = memoryview(self.fft_real)[self.fft_start:self.fft_end]
+        # Output features, written in-place for each window
+        self.features = array.array('f', (0 for _ in range(2 + self.fft_end - self.fft_start)))
 
         # Setup tree-based classification model
         self.model = None
@@ -60,22 +63,20 @@ class AccelerometerClassifier():
             if magnitude > magnitude_max:
                 magnitude_max = magnitude
             self.fft_real[i] = magnitude
-            self.fft_imag[i] = 0
 
-        self.fft.run(self.fft_real, self.fft_imag)
+        self.fft.rfft(self.fft_real, self.fft_imag)
         peak2peak = (magnitude_max - magnitude_min)
         # Normalize FFT by total energy
-        fft_energy = sum(self.fft_real)
-        if fft_energy > 1e-6:
-            for i in range(len(self.fft_real)):
-                self.fft_real[i] = 2**14 * (abs(self.fft_real[i]) / fft_energy)
-        else:
-            for i in range(len(self.fft_real)):
-                self.fft_real[i] = 0.0
-
-        # Pick relevant features
-        fft_features = list(self.fft_real[self.fft_start:self.fft_end])
-        features = [ 2**14 * peak2peak, 2**10 * fft_energy ] + fft_features
+        # rfft only gives the first half of the bins, the other half is symmetric
+        half = samples_length // 2
+        fft_energy = self.fft_real[0] + self.fft_real[half] + 2 * sum(self.fft_real[1:half])
+        scale = (2**14 / fft_energy) if fft_energy > 1e-6 else 0.0
+
+        # Pick relevant features. FFT bins are normalized natively, straight into the features
+        features = self.features
+        features[0] = 2**14 * peak2peak
+        features[1] = 2**10 * fft_energy
+        emlearn_fft.abs_scale(self.fft_bins, features, scale, 2)
         return features
 
     def classify(self, features):
@@ -113,7 +114,7 @@ def process_file(inp, out, model=None):
                     continue # last window chunk might be incomplete, skip it
 
                 features = list(pipeline.preprocess(chunk))
-                arr = array.array('h', [int(f) for f in features])
+                arr = array.array('f', features)
                 if model:
                     probabilities = pipeline.classify(arr)
                 else:
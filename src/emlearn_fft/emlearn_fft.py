@@ -9,22 +9,155 @@ except ImportError as e:
 
 import math
 import array
-import gc
 
 def fill(fft, n):
-    # pre-compute the trigonometrics needed for FFT computation
-    
-    coeffs = n // 2
+    """
+    Kept for compatibility.
+    The FFT coefficients are now computed natively when creating the FFT instance
+    """
+    pass
+
+
+def hz_to_mel(hz):
+    return 2595.0 * math.log10(1.0 + (hz / 700.0))
+
+def mel_to_hz(mel):
+    return 700.0 * (10**(mel / 2595.0) - 1.0)
+
+
+class FilterBank():
+    """
+    Triangular filterbank, to sum spectrum bins into bands
+
+    Each band is a triangle, going from the center of the previous band
+    to the center of the next band.
+    Band edges can be spaced on a 'mel', 'linear' or 'log' frequency scale.
+    """
+
+    def __init__(self, n_bins, n_bands, samplerate, fmin=0.0, fmax=None, scale='mel'):
+
+        if fmax is None:
+            fmax = samplerate / 2.0
+
+        # band edges, spaced evenly on the chosen scale
+        n_edges = n_bands + 2
+        if scale == 'mel':
+            low = hz_to_mel(fmin)
+            high = hz_to_mel(fmax)
+            edges = [ mel_to_hz(low + (high - low) * i / (n_edges-1)) for i in range(n_edges) ]
+        elif scale == 'linear':
+            edges = [ fmin + (fmax - fmin) * i / (n_edges-1) for i in range(n_edges) ]
+        elif scale == 'log':
+            if fmin <= 0.0:
+                raise ValueError("fmin must be positive for log scale")
+            edges = [ fmin * (fmax / fmin) ** (i / (n_edges-1)) for i in range(n_edges) ]
+        else:
+            raise ValueError("Unknown scale: " + str(scale))
+
+        # as (fractional) spectrum bins. Last bin is at samplerate/2
+        hz_per_bin = (samplerate / 2.0) / (n_bins - 1)
+        edges = [ e / hz_per_bin for e in edges ]
+
+        # for each bin, which pair of edges it is between, and the position between them
+        self.n_bands = n_bands
+        self.bands = array.array('h', (-1 for _ in range(n_bins)))
+        self.weights = array.array('f', (0.0 for _ in range(n_bins)))
+        j = 0
+        for k in range(n_bins):
+            while j < n_edges-1 and k >= edges[j+1]:
+                j += 1
+            if k < edges[0] or j >= n_edges-1:
+                continue
+            width = edges[j+1] - edges[j]
+            self.bands[k] = j
+            self.weights[k] = (k - edges[j]) / width
+
+    def apply(self, spectrum, out, offset=0):
+        """
+        Sum @spectrum into the bands, and write to @out starting at @offset
+        """
+        apply_filterbank(spectrum, self.bands, self.weights, out, self.n_bands, offset)
+
+
+def hann(length):
+    """
+    Periodic Hann window of @length, as array 'f'
+    """
+    return array.array('f', (0.5 - 0.5 * math.cos(2 * math.pi * i / length) for i in range(length)))
+
+def hamming(length):
+    """
+    Periodic Hamming window of @length, as array 'f'
+    """
+    return array.array('f', (0.54 - 0.46 * math.cos(2 * math.pi * i / length) for i in range(length)))
+
+
+class STFT():
+    """
+    Streaming Short-Time Fourier Transform
+
+    Takes chunks of @hop samples, and for each computes a spectrogram frame
+    from the last @length samples, with a window applied.
+    All buffers are allocated up-front, so no allocations happen per frame.
+
+    Each frame is the 'magnitude' or 'power' @spectrum, with length/2+1 bins.
+    Or with a @filterbank, the FilterBank.n_bands band values.
+    """
+
+    def __init__(self, length, hop, window='hann', filterbank=None, spectrum='magnitude'):
+
+        if hop < 1 or hop > length:
+            raise ValueError("hop must be between 1 and length")
+
+        if window == 'hann':
+            window = hann(length)
+        elif window == 'hamming':
+            window = hamming(length)
+        elif window is None or window == 'rectangular':
+            window = array.array('f', (1.0 for _ in range(length)))
+        elif len(window) != length:
+            raise ValueError("window must have same length as the FFT")
+
+        if spectrum == 'magnitude':
+            spectrum = magnitude
+        elif spectrum == 'power':
+            spectrum = power
+        else:
+            raise ValueError("Unknown spectrum: " + str(spectrum))
+
+        self.length = length
+        self.hop = hop
+        self.window = window
+        self.filterbank = filterbank
+        self.spectrum = spectrum
+        self.n_bins = (length // 2) + 1
+        self.n_outputs = filterbank.n_bands if filterbank is not None else self.n_bins
+
+        self.fft = FFT(length)
+        self.buffer = array.array('f', (0.0 for _ in range(length)))
+        self.real = array.array('f', (0.0 for _ in range(length)))
+        self.imag = array.array('f', (0.0 for _ in range(self.n_bins)))
 
-    # pre-compute the constant part of expression
-    PI2_N = (math.pi * 2.0) / n
+    def push(self, chunk, out, frame=0):
+        """
+        Add @chunk of hop samples, and write the resulting frame into @out
 
-    # compute coeffeicients
-    sin = array.array('f', (math.sin(PI2_N * i) for i in range(coeffs)) )
-    cos = array.array('f', (math.cos(PI2_N * i) for i in range(coeffs)) )
+        @chunk can be array 'h' (int16) or 'f' (float).
+        @out is array 'f', n_frames x n_outputs stored frame-by-frame.
+        The frame is written to row @frame.
+        """
+        if len(chunk) != self.hop:
+            raise ValueError("chunk must have hop samples")
+        offset = frame * self.n_outputs
+        if offset < 0 or offset + self.n_outputs > len(out):
+            raise ValueError("frame outside of out")
 
-    # pass it to the C module
-    fft.fill(sin, cos)
+        push_window(self.buffer, chunk, self.window, self.real)
+        self.fft.rfft(self.real, self.imag)
 
-    # make sure temporary arrays get freed
-    gc.collect()
+        if self.filterbank is None:
+            self.spectrum(self.real, self.imag, out, offset)
+        else:
+            # spectrum into imag, which has exactly n_bins
+            self.spectrum(self.real, self.imag, self.imag)
+            self.filterbank.apply(self.imag, out, offset)
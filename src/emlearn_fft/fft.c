@@ -23,6 +23,46 @@ void *memset(void *s, int c, size_t n) {
 #endif
 #endif
 
+// sin and cos of x, for x in [0, pi/4]. Taylor series, error below 1e-7
+static void fft_sincos_octant(float x, float *out_sin, float *out_cos) {
+    const float x2 = x * x;
+    *out_sin = x * (1.0f - x2/6.0f * (1.0f - x2/20.0f * (1.0f - x2/42.0f * (1.0f - x2/72.0f))));
+    *out_cos = 1.0f - x2/2.0f * (1.0f - x2/12.0f * (1.0f - x2/30.0f * (1.0f - x2/56.0f * (1.0f - x2/90.0f))));
+}
+
+// Fill the FFT tables for length @n, sin(2*pi*k/n) and cos(2*pi*k/n) for k in [0, n/2)
+// Computed natively, since sinf/cosf trips up mpy_ld.py
+// Uses symmetry to only evaluate angles in the first octant, where the series is accurate
+static void fft_fill_tables(float *table_sin, float *table_cos, size_t n) {
+    const float pi = 3.14159265358979f;
+    const size_t quarter = n / 4;
+    const size_t eighth = n / 8;
+
+    for (size_t k = 0; k < n/2; k++) {
+        // angle in first quadrant, k = quadrant*quarter + r
+        const size_t quadrant = (quarter > 0) ? (k / quarter) : 0;
+        const size_t r = (quarter > 0) ? (k % quarter) : k;
+
+        float s = 0.0f;
+        float c = 1.0f;
+        if (r > eighth) {
+            // sin(pi/2 - x) = cos(x)
+            fft_sincos_octant(((2.0f * pi) * (quarter - r)) / n, &c, &s);
+        } else {
+            fft_sincos_octant(((2.0f * pi) * r) / n, &s, &c);
+        }
+
+        if (quadrant == 0) {
+            table_sin[k] = s;
+            table_cos[k] = c;
+        } else {
+            // sin(pi/2 + x) = cos(x), cos(pi/2 + x) = -sin(x)
+            table_sin[k] = c;
+            table_cos[k] = -s;
+        }
+    }
+}
+
 // Copy of eml_fft.h, without eml_fft_fill
 // - contains sin/cos that trips up mpy_ld.py (even if the function is not used)
 static size_t reverse_bits(size_t x, int n) {
@@ -32,19 +72,26 @@ static size_t reverse_bits(size_t x, int n) {
 	return result;
 }
 
-EmlError
-fft_forward(float *table_sin, float *table_cos, float real[], float imag[], size_t n) {
+// Kernels for the complex FFT
+#define FFT_KERNEL_RADIX2 0 // textbook radix-2 Cooley-Tukey
+#define FFT_KERNEL_RADIX4 1 // radix-4, with a radix-2 stage when needed. 25% fewer multiplications
 
-    // Compute levels = floor(log2(n))
-	int levels = 0;
-	for (size_t temp = n; temp > 1U; temp >>= 1)
-		levels++;
+// Precomputed tables for an FFT
+// Tables made for a larger FFT can be used, with @stride and @bitrev_shift
+typedef struct _FFTTables {
+    const float *sin; // sin(2*pi*k/N) for k in [0, N/2)
+    const float *cos;
+    size_t stride; // N/n
+    const uint16_t *bitrev; // reverse_bits(i) for i in [0, N). NULL to compute on the fly
+    int bitrev_shift; // log2(N/n)
+} FFTTables;
 
-    EML_PRECONDITION(((size_t)(1U << levels)) == n, EmlSizeMismatch);
+// Bit-reversed addressing permutation
+static void fft_permute(const FFTTables *tables, int levels, float real[], float imag[], size_t n) {
 
-	// Bit-reversed addressing permutation
 	for (size_t i = 0; i < n; i++) {
-		size_t j = reverse_bits(i, levels);
+		const size_t j = (tables->bitrev) ? \
+			(size_t)(tables->bitrev[i] >> tables->bitrev_shift) : reverse_bits(i, levels);
 		if (j > i) {
 			float temp = real[i];
 			real[i] = real[j];
@@ -54,11 +101,31 @@ fft_forward(float *table_sin, float *table_cos, float real[], float imag[], size
 			imag[j] = temp;
 		}
 	}
+}
+
+// Compute levels = floor(log2(n))
+static int fft_levels(size_t n) {
+	int levels = 0;
+	for (size_t temp = n; temp > 1U; temp >>= 1)
+		levels++;
+	return levels;
+}
+
+EmlError
+fft_forward(const FFTTables *tables, float real[], float imag[], size_t n) {
+
+	const int levels = fft_levels(n);
+    EML_PRECONDITION(((size_t)(1U << levels)) == n, EmlSizeMismatch);
+
+	fft_permute(tables, levels, real, imag, n);
+
+	const float *table_sin = tables->sin;
+	const float *table_cos = tables->cos;
 
 	// Cooley-Tukey decimation-in-time radix-2 FFT
 	for (size_t size = 2; size <= n; size *= 2) {
 		size_t halfsize = size / 2;
-		size_t tablestep = n / size;
+		size_t tablestep = tables->stride * (n / size);
 		for (size_t i = 0; i < n; i += size) {
 			for (size_t j = i, k = 0; j < i + halfsize; j++, k += tablestep) {
 				size_t l = j + halfsize;
@@ -76,6 +143,339 @@ fft_forward(float *table_sin, float *table_cos, float real[], float imag[], size
 	return EmlOk;
 }
 
+// Decimation-in-time FFT, doing two radix-2 stages per pass
+// On bit-reversed input, the four quarters A,B,C,D of a block of size 4m are DFTs of length m. Then
+// Z[k] = (A + W^2 B) + (W C + W^3 D), Z[k+2m] = (A + W^2 B) - (W C + W^3 D)
+// Z[k+m] = (A - W^2 B) - i(W C - W^3 D), Z[k+3m] = (A - W^2 B) + i(W C - W^3 D)
+// with W = exp(-2*pi*i*k/4m). So 3 complex multiplications per 4 outputs, instead of 4
+EmlError
+fft_forward_radix4(const FFTTables *tables, float real[], float imag[], size_t n) {
+
+	const int levels = fft_levels(n);
+    EML_PRECONDITION(((size_t)(1U << levels)) == n, EmlSizeMismatch);
+
+	fft_permute(tables, levels, real, imag, n);
+
+	const float *table_sin = tables->sin;
+	const float *table_cos = tables->cos;
+
+	size_t m = 1;
+	if (levels % 2) {
+		// odd number of levels, start with a radix-2 stage. Twiddle factor is 1
+		for (size_t i = 0; i < n; i += 2) {
+			const float r = real[i+1];
+			const float im = imag[i+1];
+			real[i+1] = real[i] - r;
+			imag[i+1] = imag[i] - im;
+			real[i] += r;
+			imag[i] += im;
+		}
+		m = 2;
+	}
+
+	for (; m < n; m *= 4) {
+		const size_t size = 4 * m;
+		const size_t tablestep = tables->stride * (n / size);
+
+		for (size_t k = 0; k < m; k++) {
+			// twiddle factors, shared by all blocks
+			const float w1r = table_cos[k*tablestep];
+			const float w1i = -table_sin[k*tablestep];
+			const float w2r = table_cos[2*k*tablestep];
+			const float w2i = -table_sin[2*k*tablestep];
+			const float w3r = w1r*w2r - w1i*w2i;
+			const float w3i = w1r*w2i + w1i*w2r;
+
+			for (size_t i = k; i < n; i += size) {
+				const size_t a = i;
+				const size_t b = i + m;
+				const size_t c = i + 2*m;
+				const size_t d = i + 3*m;
+
+				const float br = real[b]*w2r - imag[b]*w2i;
+				const float bi = real[b]*w2i + imag[b]*w2r;
+				const float cr = real[c]*w1r - imag[c]*w1i;
+				const float ci = real[c]*w1i + imag[c]*w1r;
+				const float dr = real[d]*w3r - imag[d]*w3i;
+				const float di = real[d]*w3i + imag[d]*w3r;
+
+				const float sum_ab_r = real[a] + br;
+				const float sum_ab_i = imag[a] + bi;
+				const float diff_ab_r = real[a] - br;
+				const float diff_ab_i = imag[a] - bi;
+				const float sum_cd_r = cr + dr;
+				const float sum_cd_i = ci + di;
+				const float diff_cd_r = cr - dr;
+				const float diff_cd_i = ci - di;
+
+				real[a] = sum_ab_r + sum_cd_r;
+				imag[a] = sum_ab_i + sum_cd_i;
+				real[c] = sum_ab_r - sum_cd_r;
+				imag[c] = sum_ab_i - sum_cd_i;
+				// -i*(x) = (x.imag, -x.real)
+				real[b] = diff_ab_r + diff_cd_i;
+				imag[b] = diff_ab_i - diff_cd_r;
+				real[d] = diff_ab_r - diff_cd_i;
+				imag[d] = diff_ab_i + diff_cd_r;
+			}
+		}
+	}
+	return EmlOk;
+}
+
+// Complex FFT using the selected @kernel
+EmlError
+fft_forward_kernel(const FFTTables *tables, int kernel, float real[], float imag[], size_t n) {
+    if (kernel == FFT_KERNEL_RADIX4) {
+        return fft_forward_radix4(tables, real, imag, n);
+    } else {
+        return fft_forward(tables, real, imag, n);
+    }
+}
+
+// Real-input FFT of length @n, using a complex FFT of length n/2
+// On input, @real contains the @n samples. @imag must have space for n/2+1 values
+// On output, bins 0 to n/2 (inclusive) are in @real and @imag
+// The rest of @real is used as scratch space
+EmlError
+fft_forward_real(const FFTTables *tables, int kernel,
+        float real[], float imag[], size_t n) {
+
+    const size_t half = n / 2;
+    EML_PRECONDITION(n >= 2, EmlSizeMismatch);
+
+    // Pack even samples as real part and odd as imaginary
+    for (size_t m = 0; m < half; m++) {
+        imag[m] = real[(2*m)+1];
+    }
+    for (size_t m = 0; m < half; m++) {
+        real[m] = real[2*m];
+    }
+
+    // tables for half the length
+    FFTTables half_tables = *tables;
+    half_tables.stride = 2 * tables->stride;
+    half_tables.bitrev_shift = tables->bitrev_shift + 1;
+
+    const EmlError err = fft_forward_kernel(&half_tables, kernel, real, imag, half);
+    if (err != EmlOk) {
+        return err;
+    }
+
+    // Unpack into the spectrum of the real signal
+    // X[k] = E[k] + W^k O[k], X[half-k] = conj(E[k] - W^k O[k])
+    // E[k] = (Z[k] + conj(Z[half-k])) / 2, O[k] = (Z[k] - conj(Z[half-k])) / 2i
+    const float dc_real = real[0];
+    const float dc_imag = imag[0];
+    real[0] = dc_real + dc_imag;
+    imag[0] = 0.0f;
+    real[half] = dc_real - dc_imag;
+    imag[half] = 0.0f;
+
+    for (size_t k = 1; k <= half/2; k++) {
+        const size_t j = half - k;
+        const float even_real = 0.5f * (real[k] + real[j]);
+        const float even_imag = 0.5f * (imag[k] - imag[j]);
+        const float odd_real = 0.5f * (imag[k] + imag[j]);
+        const float odd_imag = -0.5f * (real[k] - real[j]);
+
+        const float c = tables->cos[k*tables->stride];
+        const float s = tables->sin[k*tables->stride];
+        const float t_real = c * odd_real + s * odd_imag;
+        const float t_imag = c * odd_imag - s * odd_real;
+
+        real[k] = even_real + t_real;
+        imag[k] = even_imag + t_imag;
+        real[j] = even_real - t_real;
+        imag[j] = t_imag - even_imag;
+    }
+
+    return EmlOk;
+}
+
+// Fixed-point FFT, in q15 format
+// Largest value before a stage that is guaranteed to not overflow. 12288*(1+sqrt(2)) < 32768
+#define FFT_Q15_HEADROOM 12288
+
+// Fill q15 tables from the float tables
+static void fft_fill_tables_q15(int16_t *sin_q15, int16_t *cos_q15,
+        const float *table_sin, const float *table_cos, size_t length) {
+    for (size_t k = 0; k < length; k++) {
+        const float s = table_sin[k] * 32767.0f;
+        const float c = table_cos[k] * 32767.0f;
+        sin_q15[k] = (int16_t)((s >= 0.0f) ? (s + 0.5f) : (s - 0.5f));
+        cos_q15[k] = (int16_t)((c >= 0.0f) ? (c + 0.5f) : (c - 0.5f));
+    }
+}
+
+static int32_t fft_abs_max_q15(const int16_t *values, size_t n) {
+    int32_t max = 0;
+    for (size_t i = 0; i < n; i++) {
+        const int32_t v = (values[i] < 0) ? -(int32_t)values[i] : values[i];
+        if (v > max) {
+            max = v;
+        }
+    }
+    return max;
+}
+
+// Right shift with rounding
+static void fft_shift_q15(int16_t *values, size_t n, int shift) {
+    const int32_t round = 1 << (shift - 1);
+    for (size_t i = 0; i < n; i++) {
+        values[i] = (int16_t)((values[i] + round) >> shift);
+    }
+}
+
+// Radix-2 decimation-in-time FFT on q15 data, in place
+// Uses block floating point: before each stage, all values are scaled down (if needed)
+// so that the stage cannot overflow. The number of right shifts done is returned in @out_shift,
+// and the FFT is (real + i*imag) * 2^shift
+EmlError
+fft_forward_q15(const FFTTables *tables, const int16_t *sin_q15, const int16_t *cos_q15,
+        int16_t real[], int16_t imag[], size_t n, int *out_shift) {
+
+	const int levels = fft_levels(n);
+    EML_PRECONDITION(((size_t)(1U << levels)) == n, EmlSizeMismatch);
+
+	// Bit-reversed addressing permutation
+	for (size_t i = 0; i < n; i++) {
+		const size_t j = (tables->bitrev) ? \
+			(size_t)(tables->bitrev[i] >> tables->bitrev_shift) : reverse_bits(i, levels);
+		if (j > i) {
+			int16_t temp = real[i];
+			real[i] = real[j];
+			real[j] = temp;
+			temp = imag[i];
+			imag[i] = imag[j];
+			imag[j] = temp;
+		}
+	}
+
+	int32_t max = fft_abs_max_q15(real, n);
+	const int32_t max_imag = fft_abs_max_q15(imag, n);
+	if (max_imag > max) {
+		max = max_imag;
+	}
+	int total_shift = 0;
+
+	for (size_t size = 2; size <= n; size *= 2) {
+
+		// scale to avoid overflow
+		int shift = 0;
+		while ((max >> shift) > FFT_Q15_HEADROOM) {
+			shift++;
+		}
+		if (shift > 0) {
+			fft_shift_q15(real, n, shift);
+			fft_shift_q15(imag, n, shift);
+			total_shift += shift;
+		}
+		max = 0;
+
+		const size_t halfsize = size / 2;
+		const size_t tablestep = tables->stride * (n / size);
+		for (size_t i = 0; i < n; i += size) {
+			for (size_t j = i, k = 0; j < i + halfsize; j++, k += tablestep) {
+				const size_t l = j + halfsize;
+				const int32_t c = cos_q15[k];
+				const int32_t s = sin_q15[k];
+				const int32_t tpre = ((real[l] * c) + (imag[l] * s) + (1 << 14)) >> 15;
+				const int32_t tpim = ((imag[l] * c) - (real[l] * s) + (1 << 14)) >> 15;
+
+				const int32_t out[4] = {
+					real[j] - tpre,
+					imag[j] - tpim,
+					real[j] + tpre,
+					imag[j] + tpim,
+				};
+				real[l] = out[0];
+				imag[l] = out[1];
+				real[j] = out[2];
+				imag[j] = out[3];
+
+				for (int o = 0; o < 4; o++) {
+					const int32_t v = (out[o] < 0) ? -out[o] : out[o];
+					if (v > max) {
+						max = v;
+					}
+				}
+			}
+		}
+		if (size == n)  // Prevent overflow in 'size *= 2'
+			break;
+	}
+
+	*out_shift = total_shift;
+	return EmlOk;
+}
+
+// Square root. sqrtf would need libm
+// Initial guess from halving the exponent, then Newton iterations
+static float
+fft_sqrtf(float x)
+{
+    if (x <= 0.0f) {
+        return 0.0f;
+    }
+    uint32_t bits;
+    memcpy(&bits, &x, sizeof(bits));
+    bits = (bits >> 1) + 0x1fc00000;
+    float y;
+    memcpy(&y, &bits, sizeof(y));
+    for (int i = 0; i < 3; i++) {
+        y = 0.5f * (y + x / y);
+    }
+    return y;
+}
+
+// Spectral post-processing
+// Triangular filterbank, stored per spectrum bin
+// Bin k is between edges j and j+1 of the filterbank, where @bands[k] = j, or -1 if outside all bands.
+// It contributes with weight @weights[k] to band j (rising edge), and 1-weight to band j-1 (falling edge)
+void
+fft_apply_filterbank(const float *spectrum, int n_bins,
+        const int16_t *bands, const float *weights, float *out, int n_bands)
+{
+    for (int b = 0; b < n_bands; b++) {
+        out[b] = 0.0f;
+    }
+    for (int k = 0; k < n_bins; k++) {
+        const int j = bands[k];
+        if (j < 0) {
+            continue;
+        }
+        const float value = spectrum[k];
+        const float w = weights[k];
+        if (j < n_bands) {
+            out[j] += w * value;
+        }
+        if (j >= 1) {
+            out[j-1] += (1.0f - w) * value;
+        }
+    }
+}
+
+// Integer square root
+static uint32_t
+fft_isqrt(uint32_t x)
+{
+    uint32_t r = 0;
+    uint32_t q = 1UL << 30;
+    while (q > x) {
+        q >>= 2;
+    }
+    while (q != 0) {
+        if (x >= r + q) {
+            x -= r + q;
+            r = (r >> 1) + q;
+        } else {
+            r >>= 1;
+        }
+        q >>= 2;
+    }
+    return r;
+}
 
 // MicroPython type for EmlFFT
 #if MICROPY_ENABLE_DYNRUNTIME
@@ -91,12 +491,30 @@ typedef struct _mp_obj_fft_t {
     float *sin;
     float *cos;
     bool filled;
+    int table_stride; // 1 when owning the tables, else (table length / length)
+    mp_obj_t table_owner; // FFT instance that owns the tables. Keeps them alive
+    uint16_t *bitrev; // bit-reversal permutation. Shared with table_owner
+    int8_t kernel; // FFT_KERNEL_*
+    int16_t *sin_q15; // q15 tables for run_q15(). Allocated on first use, in table_owner
+    int16_t *cos_q15;
 } mp_obj_fft_t;
 
+// Get tables to use for the FFT of instance @o
+static FFTTables fft_get_tables(mp_obj_fft_t *o) {
+    FFTTables tables = {
+        o->sin,
+        o->cos,
+        o->table_stride,
+        o->bitrev,
+        fft_levels(o->table_stride),
+    };
+    return tables;
+}
+
 // Create a new instance
 static mp_obj_t fft_new(const mp_obj_type_t *type, size_t n_args, size_t n_kw, const mp_obj_t *args_in) {
 
-    mp_arg_check_num(n_args, n_kw, 1, 1, false);
+    mp_arg_check_num(n_args, n_kw, 1, 2, false);
 
 #if DEBUG
     mp_printf(&mp_plat_print, "fft-new-start length=%d\n",
@@ -104,38 +522,63 @@ static mp_obj_t fft_new(const mp_obj_type_t *type, size_t n_args, size_t n_kw, c
 #endif
 
     const int fft_length = mp_obj_get_int(args_in[0]);
+    if (fft_length < 2 || (fft_length & (fft_length - 1)) != 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("length must be a power of 2"));
+    }
+    if (fft_length > 65536) {
+        mp_raise_ValueError(MP_ERROR_TEXT("length must be at most 65536"));
+    }
+    const int table_length = fft_length / 2;
+
+    // Optional FFT instance to share tables with
+    mp_obj_fft_t *owner = NULL;
+    if (n_args > 1 && args_in[1] != mp_const_none) {
+        if (mp_obj_get_type(args_in[1]) != (const mp_obj_type_t *)&fft_type) {
+            mp_raise_ValueError(MP_ERROR_TEXT("table must be an FFT instance"));
+        }
+        owner = MP_OBJ_TO_PTR(args_in[1]);
+        // always share from the instance that owns the tables
+        owner = MP_OBJ_TO_PTR(owner->table_owner);
+        if (owner->length < table_length) {
+            mp_raise_ValueError(MP_ERROR_TEXT("table FFT must be same length or longer"));
+        }
+    }
 
     // Construct object
     mp_obj_fft_t *o = mp_obj_malloc(mp_obj_fft_t, type);
-#if 1
-    //EmlFFT *self = &o->fft;
-    o->filled = false;
-
-    const int table_length = fft_length / 2;
-    o->cos = m_new(float, table_length);
-    o->sin = m_new(float, table_length);
     o->length = table_length;
 
-    if (o->cos == NULL || o->sin == NULL) {
-        mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("allocation failed"));
+    if (owner) {
+        o->cos = owner->cos;
+        o->sin = owner->sin;
+        o->bitrev = owner->bitrev;
+        o->table_stride = owner->length / table_length;
+        o->table_owner = MP_OBJ_FROM_PTR(owner);
+    } else {
+        o->cos = m_new(float, table_length);
+        o->sin = m_new(float, table_length);
+        o->bitrev = m_new(uint16_t, fft_length);
+        o->table_stride = 1;
+        o->table_owner = MP_OBJ_FROM_PTR(o);
+
+        if (o->cos == NULL || o->sin == NULL || o->bitrev == NULL) {
+            mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("allocation failed"));
+        }
+        fft_fill_tables(o->sin, o->cos, fft_length);
+
+        const int levels = fft_levels(fft_length);
+        for (int i = 0; i < fft_length; i++) {
+            o->bitrev[i] = reverse_bits(i, levels);
+        }
     }
-#endif
+    o->filled = true;
+    o->kernel = FFT_KERNEL_RADIX2; // same results as before. RADIX4 is opt-in with setkernel()
+    o->sin_q15 = NULL;
+    o->cos_q15 = NULL;
 
 #if DEBUG
-    mp_printf(&mp_plat_print, "fft-new length=%d\n",
-        fft_length);
-#endif
-
-#if 0
-    // Using sinf/cosf does not work with mpy_ld.py
-    // https://github.com/micropython/micropython/issues/14430
-    // As a workaround, we require the FFT factors to be filled from the MicroPython side
-    const EmlError err = eml_fft_fill(self, fft_length);
-    if (err != EmlOk) {
-        m_free(self.cos);
-        m_free(self.sin);
-        mp_raise_ValueError(MP_ERROR_TEXT("EmlError"));
-    }
+    mp_printf(&mp_plat_print, "fft-new length=%d stride=%d\n",
+        fft_length, o->table_stride);
 #endif
 
     return MP_OBJ_FROM_PTR(o);
@@ -193,6 +636,26 @@ check_extract_array(mp_obj_t obj, int length) {
     return values;
 }
 
+int16_t *
+check_extract_array_int16(mp_obj_t obj, int length) {
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(obj, &bufinfo, MP_BUFFER_RW);
+    if (bufinfo.typecode != 'h') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 array"));
+        return NULL;
+    }
+    int16_t *values = bufinfo.buf;
+    const int array_length = bufinfo.len / sizeof(*values);
+
+    if (array_length != length) {
+        mp_raise_ValueError(MP_ERROR_TEXT("wrong array length"));
+        return NULL;
+    }
+
+    return values;
+}
+
 // Fill the FFT factors
 static mp_obj_t fft_fill(mp_obj_t self_obj, mp_obj_t sin_obj, mp_obj_t cos_obj) {
 
@@ -200,6 +663,10 @@ static mp_obj_t fft_fill(mp_obj_t self_obj, mp_obj_t sin_obj, mp_obj_t cos_obj)
     //EmlFFT *self = &o->fft;
     const int length = o->length;
 
+    if (o->table_stride != 1) {
+        mp_raise_ValueError(MP_ERROR_TEXT("cannot fill shared tables"));
+    }
+
 
     float *sin_values = check_extract_array(sin_obj, length);
     float *cos_values = check_extract_array(cos_obj, length);
@@ -226,7 +693,8 @@ static mp_obj_t fft_run(mp_obj_t self_obj, mp_obj_t real_obj, mp_obj_t imag_obj)
     float *real_values = check_extract_array(real_obj, fft_length);
     float *imag_values = check_extract_array(imag_obj, fft_length);
 
-    const EmlError err = fft_forward(o->sin, o->cos, real_values, imag_values, fft_length);
+    const FFTTables tables = fft_get_tables(o);
+    const EmlError err = fft_forward_kernel(&tables, o->kernel, real_values, imag_values, fft_length);
     if (err != EmlOk) {
         mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("eml_fft_forward error"));
     }
@@ -235,10 +703,308 @@ static mp_obj_t fft_run(mp_obj_t self_obj, mp_obj_t real_obj, mp_obj_t imag_obj)
  }
 static MP_DEFINE_CONST_FUN_OBJ_3(fft_run_obj, fft_run);
 
+// Compute the FFT of real-valued input
+static mp_obj_t fft_rfft(mp_obj_t self_obj, mp_obj_t real_obj, mp_obj_t imag_obj) {
+
+    mp_obj_fft_t *o = MP_OBJ_TO_PTR(self_obj);
+    const int fft_length = o->length*2;
+
+    if (!o->filled) {
+        mp_raise_ValueError(MP_ERROR_TEXT("fill() not called first"));
+    }
+
+    float *real_values = check_extract_array(real_obj, fft_length);
+    float *imag_values = check_extract_array(imag_obj, o->length+1);
+
+    const FFTTables tables = fft_get_tables(o);
+    const EmlError err = fft_forward_real(&tables, o->kernel, real_values, imag_values, fft_length);
+    if (err != EmlOk) {
+        mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("eml_fft_forward error"));
+    }
+
+    return mp_const_none;
+ }
+static MP_DEFINE_CONST_FUN_OBJ_3(fft_rfft_obj, fft_rfft);
+
+// Compute the FFT of q15 data
+static mp_obj_t fft_run_q15(mp_obj_t self_obj, mp_obj_t real_obj, mp_obj_t imag_obj) {
+
+    mp_obj_fft_t *o = MP_OBJ_TO_PTR(self_obj);
+    mp_obj_fft_t *owner = MP_OBJ_TO_PTR(o->table_owner);
+    const int fft_length = o->length*2;
+
+    int16_t *real_values = check_extract_array_int16(real_obj, fft_length);
+    int16_t *imag_values = check_extract_array_int16(imag_obj, fft_length);
+
+    // q15 tables are only allocated when used
+    if (owner->sin_q15 == NULL) {
+        int16_t *sin_q15 = m_new(int16_t, owner->length);
+        int16_t *cos_q15 = m_new(int16_t, owner->length);
+        fft_fill_tables_q15(sin_q15, cos_q15, owner->sin, owner->cos, owner->length);
+        owner->sin_q15 = sin_q15;
+        owner->cos_q15 = cos_q15;
+    }
+
+    int shift = 0;
+    const FFTTables tables = fft_get_tables(o);
+    const EmlError err = fft_forward_q15(&tables, owner->sin_q15, owner->cos_q15,
+            real_values, imag_values, fft_length, &shift);
+    if (err != EmlOk) {
+        mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("eml_fft_forward error"));
+    }
+
+    return mp_obj_new_int(shift);
+ }
+static MP_DEFINE_CONST_FUN_OBJ_3(fft_run_q15_obj, fft_run_q15);
+
+// Set the kernel used for the complex FFT
+static mp_obj_t fft_setkernel(mp_obj_t self_obj, mp_obj_t kernel_obj) {
+
+    mp_obj_fft_t *o = MP_OBJ_TO_PTR(self_obj);
+    const mp_int_t kernel = mp_obj_get_int(kernel_obj);
+
+    if (kernel != FFT_KERNEL_RADIX2 && kernel != FFT_KERNEL_RADIX4) {
+        mp_raise_ValueError(MP_ERROR_TEXT("invalid kernel"));
+    }
+    o->kernel = kernel;
+
+    return mp_const_none;
+ }
+static MP_DEFINE_CONST_FUN_OBJ_2(fft_setkernel_obj, fft_setkernel);
+
+// Magnitude of complex q15 values
+static mp_obj_t fft_magnitude_q15(mp_obj_t real_obj, mp_obj_t imag_obj, mp_obj_t out_obj) {
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(real_obj, &bufinfo, MP_BUFFER_READ);
+    if (bufinfo.typecode != 'h') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 array"));
+    }
+    const int length = bufinfo.len / sizeof(int16_t);
+    const int16_t *real_values = bufinfo.buf;
+    const int16_t *imag_values = check_extract_array_int16(imag_obj, length);
+
+    // uint16 can hold all magnitudes, int16 saturates. Can be one of the inputs
+    mp_get_buffer_raise(out_obj, &bufinfo, MP_BUFFER_RW);
+    if ((bufinfo.typecode != 'h') && (bufinfo.typecode != 'H')) {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 or uint16 array"));
+    }
+    if ((int)(bufinfo.len / sizeof(int16_t)) != length) {
+        mp_raise_ValueError(MP_ERROR_TEXT("wrong array length"));
+    }
+    const uint32_t max = (bufinfo.typecode == 'h') ? INT16_MAX : UINT16_MAX;
+
+    for (int i = 0; i < length; i++) {
+        const int32_t re = real_values[i];
+        const int32_t im = imag_values[i];
+        uint32_t mag = fft_isqrt((uint32_t)(re*re) + (uint32_t)(im*im));
+        if (mag > max) {
+            mag = max;
+        }
+        if (bufinfo.typecode == 'h') {
+            ((int16_t *)bufinfo.buf)[i] = mag;
+        } else {
+            ((uint16_t *)bufinfo.buf)[i] = mag;
+        }
+    }
+
+    return mp_const_none;
+ }
+static MP_DEFINE_CONST_FUN_OBJ_3(fft_magnitude_q15_obj, fft_magnitude_q15);
+
+// Get float array from @obj, that has at least @length items
+static float *
+check_extract_array_min(mp_obj_t obj, int length) {
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(obj, &bufinfo, MP_BUFFER_RW);
+    if (bufinfo.typecode != 'f') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting float array"));
+    }
+    if ((int)(bufinfo.len / sizeof(float)) < length) {
+        mp_raise_ValueError(MP_ERROR_TEXT("array too short"));
+    }
+    return bufinfo.buf;
+}
+
+// Get float array from @obj, and the number of items
+static float *
+check_extract_array_any(mp_obj_t obj, int *out_length) {
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(obj, &bufinfo, MP_BUFFER_RW);
+    if (bufinfo.typecode != 'f') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting float array"));
+    }
+    *out_length = bufinfo.len / sizeof(float);
+    return bufinfo.buf;
+}
+
+// Magnitude or power of complex values, written to @out_obj starting at @offset
+// Length is the shortest of the arrays. So the output of rfft() can be used, and @out_obj can be @real_obj
+static void
+fft_spectrum(size_t n_args, const mp_obj_t *args, bool power) {
+
+    int real_length = 0;
+    int imag_length = 0;
+    int out_length = 0;
+    const float *real_values = check_extract_array_any(args[0], &real_length);
+    const float *imag_values = check_extract_array_any(args[1], &imag_length);
+    float *out = check_extract_array_any(args[2], &out_length);
+    const mp_int_t offset = (n_args > 3) ? mp_obj_get_int(args[3]) : 0;
+    if (offset < 0 || offset > out_length) {
+        mp_raise_ValueError(MP_ERROR_TEXT("invalid offset"));
+    }
+    out += offset;
+    int length = out_length - offset;
+    if (real_length < length) {
+        length = real_length;
+    }
+    if (imag_length < length) {
+        length = imag_length;
+    }
+
+    for (int i = 0; i < length; i++) {
+        const float re = real_values[i];
+        const float im = imag_values[i];
+        const float p = (re * re) + (im * im);
+        out[i] = (power) ? p : fft_sqrtf(p);
+    }
+}
+
+// Magnitude of complex values
+static mp_obj_t fft_magnitude(size_t n_args, const mp_obj_t *args) {
+    fft_spectrum(n_args, args, false);
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(fft_magnitude_obj, 3, 4, fft_magnitude);
+
+// Power of complex values
+static mp_obj_t fft_power(size_t n_args, const mp_obj_t *args) {
+    fft_spectrum(n_args, args, true);
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(fft_power_obj, 3, 4, fft_power);
+
+// Absolute values multiplied by @scale, written to @out starting at @offset
+// Length is the shortest of @values and the rest of @out. For normalizing spectrum bins into a feature array
+static mp_obj_t fft_abs_scale(size_t n_args, const mp_obj_t *args) {
+
+    int values_length = 0;
+    int out_length = 0;
+    const float *values = check_extract_array_any(args[0], &values_length);
+    float *out = check_extract_array_any(args[1], &out_length);
+    const float scale = mp_obj_get_float_to_f(args[2]);
+    const mp_int_t offset = (n_args > 3) ? mp_obj_get_int(args[3]) : 0;
+    if (offset < 0 || offset > out_length) {
+        mp_raise_ValueError(MP_ERROR_TEXT("invalid offset"));
+    }
+    out += offset;
+    int length = out_length - offset;
+    if (values_length < length) {
+        length = values_length;
+    }
+
+    for (int i = 0; i < length; i++) {
+        const float v = values[i];
+        out[i] = scale * ((v < 0.0f) ? -v : v);
+    }
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(fft_abs_scale_obj, 3, 4, fft_abs_scale);
+
+// Shift @chunk_obj into the end of @buffer_obj, and write buffer multiplied by @window_obj to @out_obj
+// Used for overlapping frames in a STFT, without allocating
+static mp_obj_t fft_push_window(size_t n_args, const mp_obj_t *args) {
+
+    int length = 0;
+    float *buffer = check_extract_array_any(args[0], &length);
+    const float *window = check_extract_array_min(args[2], length);
+    float *out = check_extract_array_min(args[3], length);
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(args[1], &bufinfo, MP_BUFFER_READ);
+    int hop = 0;
+    if (bufinfo.typecode == 'f') {
+        hop = bufinfo.len / sizeof(float);
+    } else if (bufinfo.typecode == 'h') {
+        hop = bufinfo.len / sizeof(int16_t);
+    } else {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting float or int16 array"));
+    }
+    if (hop > length) {
+        mp_raise_ValueError(MP_ERROR_TEXT("chunk longer than buffer"));
+    }
+
+    // Move older samples to the start. Regions may overlap, so copy forwards
+    const int keep = length - hop;
+    for (int i = 0; i < keep; i++) {
+        buffer[i] = buffer[i+hop];
+    }
+    if (bufinfo.typecode == 'f') {
+        const float *chunk = bufinfo.buf;
+        for (int i = 0; i < hop; i++) {
+            buffer[keep+i] = chunk[i];
+        }
+    } else {
+        const int16_t *chunk = bufinfo.buf;
+        for (int i = 0; i < hop; i++) {
+            buffer[keep+i] = (float)chunk[i];
+        }
+    }
+
+    for (int i = 0; i < length; i++) {
+        out[i] = buffer[i] * window[i];
+    }
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(fft_push_window_obj, 4, 4, fft_push_window);
+
+// Sum spectrum into bands of a filterbank
+static mp_obj_t fft_filterbank(size_t n_args, const mp_obj_t *args) {
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(args[0], &bufinfo, MP_BUFFER_READ);
+    if (bufinfo.typecode != 'f') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting float array"));
+    }
+    const float *spectrum = bufinfo.buf;
+    const int n_bins = bufinfo.len / sizeof(float);
+
+    mp_get_buffer_raise(args[1], &bufinfo, MP_BUFFER_READ);
+    if (bufinfo.typecode != 'h') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 array for bands"));
+    }
+    if ((int)(bufinfo.len / sizeof(int16_t)) < n_bins) {
+        mp_raise_ValueError(MP_ERROR_TEXT("bands shorter than spectrum"));
+    }
+    const int16_t *bands = bufinfo.buf;
+    const float *weights = check_extract_array_min(args[2], n_bins);
+
+    const mp_int_t n_bands = mp_obj_get_int(args[4]);
+    const mp_int_t offset = (n_args > 5) ? mp_obj_get_int(args[5]) : 0;
+    if (n_bands < 1 || offset < 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("invalid n_bands or offset"));
+    }
+    for (int k = 0; k < n_bins; k++) {
+        if (bands[k] > n_bands) {
+            mp_raise_ValueError(MP_ERROR_TEXT("band index out of range"));
+        }
+    }
+    float *out = check_extract_array_min(args[3], offset + n_bands);
+
+    fft_apply_filterbank(spectrum, n_bins, bands, weights, out + offset, n_bands);
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(fft_filterbank_obj, 5, 6, fft_filterbank);
+
 
 
 #ifdef MICROPY_ENABLE_DYNRUNTIME
-mp_map_elem_t mod_locals_dit_table[3];
+mp_map_elem_t mod_locals_dit_table[6];
 static MP_DEFINE_CONST_DICT(mod_locals_dit, mod_locals_dit_table);
 
 // This is the entry point and is called when the module is imported
@@ -259,11 +1025,24 @@ mp_obj_t mpy_init(mp_obj_fun_bc_t *self, size_t n_args, size_t n_kw, mp_obj_t *a
     mod_locals_dit_table[0] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_run), MP_OBJ_FROM_PTR(&fft_run_obj) };
     mod_locals_dit_table[1] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR___del__), MP_OBJ_FROM_PTR(&fft_del_obj) };
     mod_locals_dit_table[2] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_fill), MP_OBJ_FROM_PTR(&fft_fill_obj) };
-    MP_OBJ_TYPE_SET_SLOT(&fft_type, locals_dict, (void*)&mod_locals_dit, 3);
+    mod_locals_dit_table[3] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_rfft), MP_OBJ_FROM_PTR(&fft_rfft_obj) };
+    mod_locals_dit_table[4] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_setkernel), MP_OBJ_FROM_PTR(&fft_setkernel_obj) };
+    mod_locals_dit_table[5] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_run_q15), MP_OBJ_FROM_PTR(&fft_run_q15_obj) };
+    MP_OBJ_TYPE_SET_SLOT(&fft_type, locals_dict, (void*)&mod_locals_dit, 6);
 
     // Make the Factorial type available on the module.
     mp_store_global(MP_QSTR_FFT, MP_OBJ_FROM_PTR(&fft_type));
 
+    mp_store_global(MP_QSTR_KERNEL_RADIX2, MP_OBJ_NEW_SMALL_INT(FFT_KERNEL_RADIX2));
+    mp_store_global(MP_QSTR_KERNEL_RADIX4, MP_OBJ_NEW_SMALL_INT(FFT_KERNEL_RADIX4));
+
+    mp_store_global(MP_QSTR_magnitude_q15, MP_OBJ_FROM_PTR(&fft_magnitude_q15_obj));
+    mp_store_global(MP_QSTR_magnitude, MP_OBJ_FROM_PTR(&fft_magnitude_obj));
+    mp_store_global(MP_QSTR_power, MP_OBJ_FROM_PTR(&fft_power_obj));
+    mp_store_global(MP_QSTR_apply_filterbank, MP_OBJ_FROM_PTR(&fft_filterbank_obj));
+    mp_store_global(MP_QSTR_push_window, MP_OBJ_FROM_PTR(&fft_push_window_obj));
+    mp_store_global(MP_QSTR_abs_scale, MP_OBJ_FROM_PTR(&fft_abs_scale_obj));
+
     // This must be last, it restores the globals dict
     MP_DYNRUNTIME_INIT_EXIT
 }
@@ -272,6 +1051,9 @@ mp_obj_t mpy_init(mp_obj_fun_bc_t *self, size_t n_args, size_t n_kw, mp_obj_t *a
 // Define a class
 static const mp_rom_map_elem_t emlearn_fft_locals_dict_table[] = {
     { MP_ROM_QSTR(MP_QSTR_run), MP_ROM_PTR(&fft_run_obj) },
+    { MP_ROM_QSTR(MP_QSTR_rfft), MP_ROM_PTR(&fft_rfft_obj) },
+    { MP_ROM_QSTR(MP_QSTR_setkernel), MP_ROM_PTR(&fft_setkernel_obj) },
+    { MP_ROM_QSTR(MP_QSTR_run_q15), MP_ROM_PTR(&fft_run_q15_obj) },
     { MP_ROM_QSTR(MP_QSTR_fill), MP_ROM_PTR(&fft_fill_obj) },
     { MP_ROM_QSTR(MP_QSTR___del__), MP_ROM_PTR(&fft_del_obj) }
 };
@@ -288,7 +1070,15 @@ static MP_DEFINE_CONST_OBJ_TYPE(
 
 // Define module object.
 static const mp_rom_map_elem_t emlearn_fft_globals_table[] = {
-    { MP_ROM_QSTR(MP_QSTR_FFT), MP_ROM_PTR(&fft_type) }
+    { MP_ROM_QSTR(MP_QSTR_FFT), MP_ROM_PTR(&fft_type) },
+    { MP_ROM_QSTR(MP_QSTR_KERNEL_RADIX2), MP_ROM_INT(FFT_KERNEL_RADIX2) },
+    { MP_ROM_QSTR(MP_QSTR_KERNEL_RADIX4), MP_ROM_INT(FFT_KERNEL_RADIX4) },
+    { MP_ROM_QSTR(MP_QSTR_magnitude_q15), MP_ROM_PTR(&fft_magnitude_q15_obj) },
+    { MP_ROM_QSTR(MP_QSTR_magnitude), MP_ROM_PTR(&fft_magnitude_obj) },
+    { MP_ROM_QSTR(MP_QSTR_power), MP_ROM_PTR(&fft_power_obj) },
+    { MP_ROM_QSTR(MP_QSTR_apply_filterbank), MP_ROM_PTR(&fft_filterbank_obj) },
+    { MP_ROM_QSTR(MP_QSTR_push_window), MP_ROM_PTR(&fft_push_window_obj) },
+    { MP_ROM_QSTR(MP_QSTR_abs_scale), MP_ROM_PTR(&fft_abs_scale_obj) }
 };
 static MP_DEFINE_CONST_DICT(emlearn_fft_globals, emlearn_fft_globals_table);
 
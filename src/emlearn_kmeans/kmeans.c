@@ -4,7 +4,7 @@
 #include <string.h>
 #include <stdint.h>
 
-#ifndef BYTEARRAY_TYPECODE 
+#ifndef BYTEARRAY_TYPECODE
 #define BYTEARRAY_TYPECODE 1
 #endif
 
@@ -15,60 +15,327 @@
 #endif
 
 
-// Find which vector in @vectors that @v is closes to
-uint16_t
-compute_euclidean3_argmin_uint8(const uint8_t *vectors, int vectors_length,
-            const uint8_t *vv, int channels, uint32_t *out_dist)
+// Indices of centroids, for assignments. Stored as uint8 ('B'), uint16 ('H') or uint32 ('I')
+static inline uint32_t
+kmeans_index_get(const void *indices, char typecode, int i)
 {
+    if (typecode == 'I') {
+        return ((const uint32_t *)indices)[i];
+    } else if (typecode == 'H') {
+        return ((const uint16_t *)indices)[i];
+    } else {
+        return ((const uint8_t *)indices)[i];
+    }
+}
 
-    uint16_t min_idx = 0;
-    uint32_t min_value = UINT32_MAX-10;
-    for (int i=0; i<vectors_length; i++) {
-        uint32_t dist = 0;
+static inline void
+kmeans_index_set(void *indices, char typecode, int i, uint32_t value)
+{
+    if (typecode == 'I') {
+        ((uint32_t *)indices)[i] = value;
+    } else if (typecode == 'H') {
+        ((uint16_t *)indices)[i] = value;
+    } else {
+        ((uint8_t *)indices)[i] = value;
+    }
+}
 
-        for (int j=0; j<channels; j++) {
-            uint8_t c = vectors[(i*channels)+j];
-            uint8_t v = vv[j];
-            dist += (v - c) * (v - c);
-        }
-        if (dist < min_value) {
-            min_value = dist;
-            min_idx = i;
-        }
+// Distances are given out as uint32 for integer data, and float for float data
+static inline uint32_t
+kmeans_distance_uint32(uint64_t dist)
+{
+    return (dist > UINT32_MAX) ? UINT32_MAX : (uint32_t)dist;
+}
+
+static inline float
+kmeans_distance_float(float dist)
+{
+    return dist;
+}
+
+// Pseudo-random number, using xorshift32
+static uint32_t
+kmeans_random(uint32_t *state)
+{
+    uint32_t x = *state;
+    x ^= x << 13;
+    x ^= x >> 17;
+    x ^= x << 5;
+    *state = x;
+    return x;
+}
+
+// Define the K-means functions for one type of data
+// @value_t: type of the values and centroids
+// @dist_t: type for (squared euclidean) distances. Must hold the sum over all channels
+// @dist_max: largest value of dist_t
+// @sum_t: type for sums over all samples in kmeans_step
+// @update_sum_t: type for sums in kmeans_update. At most max_count samples
+// @out_dist_t: type for distances given out to Python, @out_dist converts to it
+#define KMEANS_DEFINE(suffix, value_t, dist_t, dist_max, sum_t, update_sum_t, out_dist_t, out_dist) \
+\
+/* Find which vector in @vectors that @v is closes to */ \
+uint32_t \
+compute_euclidean_argmin_##suffix(const value_t *vectors, int vectors_length, \
+            const value_t *vv, int channels, dist_t *out_dist) \
+{ \
+    uint32_t min_idx = 0; \
+    dist_t min_value = dist_max; \
+    for (int i=0; i<vectors_length; i++) { \
+        const value_t *c = vectors + (i*channels); \
+        dist_t dist = 0; \
+        for (int j=0; j<channels; j++) { \
+            /* also correct for negative differences, with unsigned dist_t */ \
+            const dist_t diff = (dist_t)(vv[j] - c[j]); \
+            dist += diff * diff; \
+        } \
+        if (dist < min_value) { \
+            min_value = dist; \
+            min_idx = i; \
+        } \
+    } \
+    if (out_dist) { \
+        *out_dist = min_value; \
+    } \
+    return min_idx; \
+} \
+\
+/* Find closest centroid for each of @points */ \
+void \
+kmeans_assign_##suffix(const value_t *points, int n_points, \
+            const value_t *centroids, int n_clusters, int channels, \
+            void *indices, char index_typecode, out_dist_t *out_distances) \
+{ \
+    for (int i=0; i<n_points; i++) { \
+        dist_t dist = 0; \
+        const uint32_t idx = compute_euclidean_argmin_##suffix(centroids, n_clusters, \
+                points + (i*channels), channels, &dist); \
+        kmeans_index_set(indices, index_typecode, i, idx); \
+        if (out_distances) { \
+            out_distances[i] = out_dist(dist); \
+        } \
+    } \
+} \
+\
+/* Assign each sample in @values to the closest centroid, */ \
+/* then move each centroid to the mean of the samples assigned to it. */ \
+/* Centroids without any samples are left as-is. */ \
+/* Returns the number of samples that changed assignment */ \
+int \
+kmeans_step_##suffix(const value_t *values, int n_samples, \
+            value_t *centroids, int n_clusters, int channels, \
+            void *assignments, char index_typecode, sum_t *sums, uint32_t *counts) \
+{ \
+    int changes = 0; \
+    for (int c=0; c<n_clusters*channels; c++) { \
+        sums[c] = 0; \
+    } \
+    for (int c=0; c<n_clusters; c++) { \
+        counts[c] = 0; \
+    } \
+    /* update sample assignments */ \
+    for (int s=0; s<n_samples; s++) { \
+        const value_t *v = values + (s*channels); \
+        const uint32_t idx = \
+            compute_euclidean_argmin_##suffix(centroids, n_clusters, v, channels, NULL); \
+        if (idx != kmeans_index_get(assignments, index_typecode, s)) { \
+            changes += 1; \
+        } \
+        kmeans_index_set(assignments, index_typecode, s, idx); \
+        for (int j=0; j<channels; j++) { \
+            sums[(idx*channels)+j] += v[j]; \
+        } \
+        counts[idx] += 1; \
+    } \
+    /* update cluster centroids */ \
+    for (int c=0; c<n_clusters; c++) { \
+        const uint32_t count = counts[c]; \
+        if (count == 0) { \
+            continue; \
+        } \
+        for (int j=0; j<channels; j++) { \
+            centroids[(c*channels)+j] = sums[(c*channels)+j] / (sum_t)count; \
+        } \
+    } \
+    return changes; \
+} \
+\
+/* Pick initial centroids among @values, using k-means++ */ \
+/* The first centroid is a random sample. The following are random samples, */ \
+/* with probability proportional to the squared distance to the closest centroid so far. */ \
+/* @distances must have space for @n_samples */ \
+void \
+kmeans_plusplus_##suffix(const value_t *values, int n_samples, \
+            value_t *centroids, int n_clusters, int channels, \
+            float *distances, uint32_t *random_state) \
+{ \
+    int chosen = kmeans_random(random_state) % n_samples; \
+    for (int c=0; c<n_clusters; c++) { \
+        value_t *centroid = centroids + (c*channels); \
+        memcpy(centroid, values + (chosen*channels), sizeof(value_t)*channels); \
+        if (c == n_clusters-1) { \
+            break; \
+        } \
+        /* update distance to closest centroid */ \
+        float total = 0.0f; \
+        for (int s=0; s<n_samples; s++) { \
+            dist_t dist = 0; \
+            compute_euclidean_argmin_##suffix(centroid, 1, values + (s*channels), channels, &dist); \
+            if (c == 0 || (float)dist < distances[s]) { \
+                distances[s] = (float)dist; \
+            } \
+            total += distances[s]; \
+        } \
+        /* pick next, weighted by the distance */ \
+        if (total <= 0.0f) { \
+            /* all samples are on existing centroids */ \
+            chosen = kmeans_random(random_state) % n_samples; \
+            continue; \
+        } \
+        const float r = total * (kmeans_random(random_state) / 4294967296.0f); \
+        float cumulative = 0.0f; \
+        for (int s=0; s<n_samples; s++) { \
+            if (distances[s] <= 0.0f) { \
+                continue; \
+            } \
+            /* fallback to last candidate, in case of rounding errors */ \
+            chosen = s; \
+            cumulative += distances[s]; \
+            if (cumulative > r) { \
+                break; \
+            } \
+        } \
+    } \
+} \
+\
+/* Online K-means update with the samples in @values */ \
+/* Each sample is assigned to the closest centroid, which is moved to the running mean. */ \
+/* The running mean is kept in @sums and @counts. */ \
+/* When @counts reaches @max_count, it and the sums are halved, giving more weight to recent samples */ \
+void \
+kmeans_update_##suffix(const value_t *values, int n_samples, \
+            value_t *centroids, int n_clusters, int channels, \
+            update_sum_t *sums, uint32_t *counts, uint32_t max_count) \
+{ \
+    for (int s=0; s<n_samples; s++) { \
+        const value_t *v = values + (s*channels); \
+        const uint32_t idx = \
+            compute_euclidean_argmin_##suffix(centroids, n_clusters, v, channels, NULL); \
+        update_sum_t *sum = sums + (idx*channels); \
+        if (counts[idx] >= max_count) { \
+            counts[idx] /= 2; \
+            for (int j=0; j<channels; j++) { \
+                sum[j] /= 2; \
+            } \
+        } \
+        counts[idx] += 1; \
+        const update_sum_t count = counts[idx]; \
+        for (int j=0; j<channels; j++) { \
+            sum[j] += v[j]; \
+            centroids[(idx*channels)+j] = sum[j] / count; \
+        } \
+    } \
+}
+
+// uint8. Squared differences fit in uint32
+KMEANS_DEFINE(uint8, uint8_t, uint32_t, UINT32_MAX, uint32_t, int32_t, uint32_t, kmeans_distance_uint32)
+// int16. Squared differences need the full uint32, so the sum over channels uses uint64
+KMEANS_DEFINE(int16, int16_t, uint64_t, UINT64_MAX, int64_t, int32_t, uint32_t, kmeans_distance_uint32)
+// float
+KMEANS_DEFINE(float, float, float, 3.4e38f, float, float, float, kmeans_distance_float)
+
+
+// Get buffer of values from @obj
+// Supports uint8 ('B' and bytearray), int16 ('h') and float ('f')
+// Returns the number of values in @out_length, and the (normalized) typecode in @out_typecode
+static void *
+get_values_buffer(mp_obj_t obj, size_t *out_length, char *out_typecode) {
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(obj, &bufinfo, MP_BUFFER_RW);
+    if ((bufinfo.typecode == 'B') || (bufinfo.typecode == BYTEARRAY_TYPECODE)) {
+        *out_typecode = 'B';
+        *out_length = bufinfo.len / sizeof(uint8_t);
+    } else if (bufinfo.typecode == 'h') {
+        *out_typecode = 'h';
+        *out_length = bufinfo.len / sizeof(int16_t);
+    } else if (bufinfo.typecode == 'f') {
+        *out_typecode = 'f';
+        *out_length = bufinfo.len / sizeof(float);
+    } else {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting B (uint8), h (int16) or f (float) array"));
     }
-    if (out_dist) {
-        *out_dist = min_value;
+    return bufinfo.buf;
+}
+
+// Get buffer of centroid indices from @obj
+// Supports uint8 ('B' and bytearray), uint16 ('H') and uint32 ('I')
+// Returns the largest number of centroids that can be indexed in @out_max_clusters
+static void *
+get_indices_buffer(mp_obj_t obj, size_t *out_length, char *out_typecode, uint32_t *out_max_clusters) {
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(obj, &bufinfo, MP_BUFFER_RW);
+    if ((bufinfo.typecode == 'B') || (bufinfo.typecode == BYTEARRAY_TYPECODE)) {
+        *out_typecode = 'B';
+        *out_length = bufinfo.len / sizeof(uint8_t);
+        *out_max_clusters = UINT8_MAX+1;
+    } else if (bufinfo.typecode == 'H') {
+        *out_typecode = 'H';
+        *out_length = bufinfo.len / sizeof(uint16_t);
+        *out_max_clusters = UINT16_MAX+1;
+    } else if (bufinfo.typecode == 'I') {
+        *out_typecode = 'I';
+        *out_length = bufinfo.len / sizeof(uint32_t);
+        *out_max_clusters = UINT32_MAX;
+    } else {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting B (uint8), H (uint16) or I (uint32) array for indices"));
     }
+    return bufinfo.buf;
+}
 
-    return min_idx;
+// Check that @values and @centroids have compatible shapes. Returns number of centroids
+static int
+check_values_centroids(size_t values_length, char values_typecode,
+        size_t centroids_length, char centroids_typecode, mp_int_t channels)
+{
+    if (channels <= 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("features must be positive"));
+    }
+    if (values_typecode != centroids_typecode) {
+        mp_raise_ValueError(MP_ERROR_TEXT("values and centroids must have same typecode"));
+    }
+    if (((values_length % channels) != 0) || ((centroids_length % channels) != 0)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("values and centroids length must be divisible by features"));
+    }
+    const int n_clusters = centroids_length / channels;
+    if (n_clusters < 1) {
+        mp_raise_ValueError(MP_ERROR_TEXT("need at least 1 centroid"));
+    }
+    return n_clusters;
 }
 
 // MicroPython API
 static mp_obj_t
 euclidean_argmin(mp_obj_t vectors_obj, mp_obj_t point_obj) {
 
-    // First arg
-    mp_buffer_info_t bufinfo;
-    mp_get_buffer_raise(vectors_obj, &bufinfo, MP_BUFFER_RW);
-    if ((bufinfo.typecode != 'B') && (bufinfo.typecode != BYTEARRAY_TYPECODE)) {
-        mp_raise_ValueError(MP_ERROR_TEXT("expecting B array (uint8)"));
-    }
-    const uint8_t *values = bufinfo.buf;
-    const int values_length = bufinfo.len / sizeof(*values);
-
-    // Second arg
-    mp_get_buffer_raise(point_obj, &bufinfo, MP_BUFFER_RW);
+    size_t values_length = 0;
+    size_t n_channels = 0;
+    char values_typecode = 0;
+    char point_typecode = 0;
+    const void *values = get_values_buffer(vectors_obj, &values_length, &values_typecode);
+    const void *point = get_values_buffer(point_obj, &n_channels, &point_typecode);
 
     debug_printf("point typecode=%d \n", \
-        bufinfo.typecode
+        point_typecode
     );
 
-    if ((bufinfo.typecode != 'B') && (bufinfo.typecode != BYTEARRAY_TYPECODE)) {
-        mp_raise_ValueError(MP_ERROR_TEXT("expecting B array (uint8)"));
+    if (values_typecode != point_typecode) {
+        mp_raise_ValueError(MP_ERROR_TEXT("vectors and point must have same typecode"));
+    }
+    if (n_channels == 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("point must not be empty"));
     }
-    const uint8_t *point = bufinfo.buf;
-    const int n_channels = bufinfo.len / sizeof(*values);
-
     if ((values_length % n_channels) != 0) {
         mp_raise_ValueError(MP_ERROR_TEXT("vectors length must be divisible by @point dimensions"));
     }
@@ -79,31 +346,251 @@ euclidean_argmin(mp_obj_t vectors_obj, mp_obj_t point_obj) {
         values_length, vector_length, n_channels
     );
 
-    uint32_t min_dist = 0;
-    const uint16_t min_index = \
-        compute_euclidean3_argmin_uint8(values, vector_length, point, n_channels, &min_dist);
+    uint32_t min_index = 0;
+    mp_obj_t min_dist = mp_const_none;
+    if (values_typecode == 'f') {
+        float dist = 0.0f;
+        min_index = compute_euclidean_argmin_float(values, vector_length, point, n_channels, &dist);
+        min_dist = mp_obj_new_float_from_f(dist);
+    } else if (values_typecode == 'h') {
+        uint64_t dist = 0;
+        min_index = compute_euclidean_argmin_int16(values, vector_length, point, n_channels, &dist);
+        min_dist = mp_obj_new_int_from_uint(kmeans_distance_uint32(dist));
+    } else {
+        uint32_t dist = 0;
+        min_index = compute_euclidean_argmin_uint8(values, vector_length, point, n_channels, &dist);
+        min_dist = mp_obj_new_int_from_uint(dist);
+    }
 
-    debug_printf("out idx=%d dist=%d \n", \
-        (int)min_index, (int)min_dist
+    debug_printf("out idx=%d \n", \
+        (int)min_index
     );
 
     return mp_obj_new_tuple(2, ((mp_obj_t []) {
         mp_obj_new_int(min_index),
-        mp_obj_new_int(min_dist),
+        min_dist,
     }));
  }
 static MP_DEFINE_CONST_FUN_OBJ_2(euclidian_argmin_obj, euclidean_argmin);
 
 
+// One iteration of K-means. Assignment of samples and update of centroids
+static mp_obj_t
+kmeans_step(size_t n_args, const mp_obj_t *args) {
+
+    size_t values_length = 0;
+    size_t centroids_length = 0;
+    size_t assignments_length = 0;
+    char values_typecode = 0;
+    char centroids_typecode = 0;
+    char index_typecode = 0;
+    uint32_t max_clusters = 0;
+    const void *values = get_values_buffer(args[0], &values_length, &values_typecode);
+    void *centroids = get_values_buffer(args[1], &centroids_length, &centroids_typecode);
+    void *assignments = get_indices_buffer(args[2], &assignments_length, &index_typecode, &max_clusters);
+    const mp_int_t channels = mp_obj_get_int(args[3]);
+
+    const int n_clusters = check_values_centroids(values_length, values_typecode,
+            centroids_length, centroids_typecode, channels);
+    const int n_samples = values_length / channels;
+    if ((uint32_t)n_clusters > max_clusters) {
+        mp_raise_ValueError(MP_ERROR_TEXT("too many centroids for assignments typecode"));
+    }
+    if (assignments_length < (size_t)n_samples) {
+        mp_raise_ValueError(MP_ERROR_TEXT("assignments too short"));
+    }
+
+    uint32_t *counts = m_new(uint32_t, n_clusters);
+    int changes = 0;
+
+    if (values_typecode == 'f') {
+        float *sums = m_new(float, n_clusters*channels);
+        changes = kmeans_step_float(values, n_samples,
+            centroids, n_clusters, channels, assignments, index_typecode, sums, counts);
+        m_del(float, sums, n_clusters*channels);
+    } else if (values_typecode == 'h') {
+        int64_t *sums = m_new(int64_t, n_clusters*channels);
+        changes = kmeans_step_int16(values, n_samples,
+            centroids, n_clusters, channels, assignments, index_typecode, sums, counts);
+        m_del(int64_t, sums, n_clusters*channels);
+    } else {
+        uint32_t *sums = m_new(uint32_t, n_clusters*channels);
+        changes = kmeans_step_uint8(values, n_samples,
+            centroids, n_clusters, channels, assignments, index_typecode, sums, counts);
+        m_del(uint32_t, sums, n_clusters*channels);
+    }
+
+    m_del(uint32_t, counts, n_clusters);
+
+    return mp_obj_new_int(changes);
+ }
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(kmeans_step_obj, 4, 4, kmeans_step);
+
+// Find the closest centroid for each of the points
+static mp_obj_t
+kmeans_assign(size_t n_args, const mp_obj_t *args) {
+
+    size_t points_length = 0;
+    size_t centroids_length = 0;
+    size_t indices_length = 0;
+    char points_typecode = 0;
+    char centroids_typecode = 0;
+    char index_typecode = 0;
+    uint32_t max_clusters = 0;
+    const void *points = get_values_buffer(args[0], &points_length, &points_typecode);
+    const void *centroids = get_values_buffer(args[1], &centroids_length, &centroids_typecode);
+    void *indices = get_indices_buffer(args[2], &indices_length, &index_typecode, &max_clusters);
+    const mp_int_t channels = mp_obj_get_int(args[3]);
+
+    const int n_clusters = check_values_centroids(points_length, points_typecode,
+            centroids_length, centroids_typecode, channels);
+    const int n_points = points_length / channels;
+    if ((uint32_t)n_clusters > max_clusters) {
+        mp_raise_ValueError(MP_ERROR_TEXT("too many centroids for out_indices typecode"));
+    }
+    if (indices_length < (size_t)n_points) {
+        mp_raise_ValueError(MP_ERROR_TEXT("out_indices too short"));
+    }
+
+    // Optional output of distances. float for float data, else uint32
+    void *distances = NULL;
+    if (n_args > 4 && args[4] != mp_const_none) {
+        const char expect_typecode = (points_typecode == 'f') ? 'f' : 'I';
+        mp_buffer_info_t bufinfo;
+        mp_get_buffer_raise(args[4], &bufinfo, MP_BUFFER_RW);
+        if (bufinfo.typecode != expect_typecode) {
+            mp_raise_ValueError(MP_ERROR_TEXT("expecting out_distances I array (uint32), or f array (float) for float data"));
+        }
+        if ((bufinfo.len / 4) < (size_t)n_points) {
+            mp_raise_ValueError(MP_ERROR_TEXT("out_distances too short"));
+        }
+        distances = bufinfo.buf;
+    }
+
+    if (points_typecode == 'f') {
+        kmeans_assign_float(points, n_points, centroids, n_clusters, channels,
+            indices, index_typecode, distances);
+    } else if (points_typecode == 'h') {
+        kmeans_assign_int16(points, n_points, centroids, n_clusters, channels,
+            indices, index_typecode, distances);
+    } else {
+        kmeans_assign_uint8(points, n_points, centroids, n_clusters, channels,
+            indices, index_typecode, distances);
+    }
+
+    return mp_const_none;
+ }
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(kmeans_assign_obj, 4, 5, kmeans_assign);
+
+// Initialize centroids using k-means++
+static mp_obj_t
+kmeans_plusplus(size_t n_args, const mp_obj_t *args) {
+
+    size_t values_length = 0;
+    size_t centroids_length = 0;
+    char values_typecode = 0;
+    char centroids_typecode = 0;
+    const void *values = get_values_buffer(args[0], &values_length, &values_typecode);
+    void *centroids = get_values_buffer(args[1], &centroids_length, &centroids_typecode);
+    const mp_int_t channels = mp_obj_get_int(args[2]);
+    const uint32_t seed = (n_args > 3) ? mp_obj_get_int(args[3]) : 1;
+
+    const int n_clusters = check_values_centroids(values_length, values_typecode,
+            centroids_length, centroids_typecode, channels);
+    const int n_samples = values_length / channels;
+    if (n_samples < n_clusters) {
+        mp_raise_ValueError(MP_ERROR_TEXT("need at least as many samples as centroids"));
+    }
+
+    uint32_t random_state = (seed != 0) ? seed : 1; // xorshift needs non-zero state
+    float *distances = m_new(float, n_samples);
+
+    if (values_typecode == 'f') {
+        kmeans_plusplus_float(values, n_samples,
+            centroids, n_clusters, channels, distances, &random_state);
+    } else if (values_typecode == 'h') {
+        kmeans_plusplus_int16(values, n_samples,
+            centroids, n_clusters, channels, distances, &random_state);
+    } else {
+        kmeans_plusplus_uint8(values, n_samples,
+            centroids, n_clusters, channels, distances, &random_state);
+    }
+
+    m_del(float, distances, n_samples);
+
+    return mp_const_none;
+ }
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(kmeans_plusplus_obj, 3, 4, kmeans_plusplus);
+
+// Online/mini-batch update of centroids
+static mp_obj_t
+kmeans_update(size_t n_args, const mp_obj_t *args) {
+
+    size_t values_length = 0;
+    size_t centroids_length = 0;
+    char values_typecode = 0;
+    char centroids_typecode = 0;
+    const void *values = get_values_buffer(args[0], &values_length, &values_typecode);
+    void *centroids = get_values_buffer(args[1], &centroids_length, &centroids_typecode);
+    const mp_int_t channels = mp_obj_get_int(args[4]);
+    const mp_int_t max_count = mp_obj_get_int(args[5]);
+
+    const int n_clusters = check_values_centroids(values_length, values_typecode,
+            centroids_length, centroids_typecode, channels);
+    const int n_samples = values_length / channels;
+    if (max_count < 1 || max_count > 32767) {
+        mp_raise_ValueError(MP_ERROR_TEXT("max_count must be 1-32767"));
+    }
+
+    // sums are float for float data, else int32
+    const char sums_typecode = (values_typecode == 'f') ? 'f' : 'i';
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(args[2], &bufinfo, MP_BUFFER_RW);
+    if (bufinfo.typecode != sums_typecode) {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting sums i array (int32), or f array (float) for float data"));
+    }
+    if ((bufinfo.len / 4) != (size_t)(n_clusters*channels)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("sums length must match centroids"));
+    }
+    void *sums = bufinfo.buf;
+
+    mp_get_buffer_raise(args[3], &bufinfo, MP_BUFFER_RW);
+    if (bufinfo.typecode != 'I') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting counts I array (uint32)"));
+    }
+    if ((bufinfo.len / sizeof(uint32_t)) != (size_t)n_clusters) {
+        mp_raise_ValueError(MP_ERROR_TEXT("counts length must match number of centroids"));
+    }
+    uint32_t *counts = bufinfo.buf;
+
+    if (values_typecode == 'f') {
+        kmeans_update_float(values, n_samples,
+            centroids, n_clusters, channels, sums, counts, max_count);
+    } else if (values_typecode == 'h') {
+        kmeans_update_int16(values, n_samples,
+            centroids, n_clusters, channels, sums, counts, max_count);
+    } else {
+        kmeans_update_uint8(values, n_samples,
+            centroids, n_clusters, channels, sums, counts, max_count);
+    }
+
+    return mp_const_none;
+ }
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(kmeans_update_obj, 6, 6, kmeans_update);
+
+
 // This is the entry point and is called when the module is imported
 mp_obj_t mpy_init(mp_obj_fun_bc_t *self, size_t n_args, size_t n_kw, mp_obj_t *args) {
     // This must be first, it sets up the globals dict and other things
     MP_DYNRUNTIME_INIT_ENTRY
 
     mp_store_global(MP_QSTR_euclidean_argmin, MP_OBJ_FROM_PTR(&euclidian_argmin_obj));
+    mp_store_global(MP_QSTR_kmeans_step, MP_OBJ_FROM_PTR(&kmeans_step_obj));
+    mp_store_global(MP_QSTR_assign, MP_OBJ_FROM_PTR(&kmeans_assign_obj));
+    mp_store_global(MP_QSTR_kmeans_plusplus, MP_OBJ_FROM_PTR(&kmeans_plusplus_obj));
+    mp_store_global(MP_QSTR_kmeans_update, MP_OBJ_FROM_PTR(&kmeans_update_obj));
 
     // This must be last, it restores the globals dict
     MP_DYNRUNTIME_INIT_EXIT
 }
 
-
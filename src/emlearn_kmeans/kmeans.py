@@ -1,47 +1,27 @@
 
 import array
 
-# FIXME: get Exception: can't merge files when more than one contains native code
-# when the native code emitter is enabled. Which is critical for performance...
-# maybe we can move the inner part into a kmeans_cluster_step done in C
 
-
-#@micropython.native
 def cluster_iter(values, centroids, assignments, features,
         max_iter=10, stop_changes=0):
     """
     Perform K-Means clustering of @values
 
     Uses the @centroid as initial values for the clusters.
+    Each iteration is done in C by kmeans_step()
+
+    @values and @centroids can be array 'B' (uint8), 'h' (int16) or 'f' (float).
+    @assignments can be array 'B' (uint8), 'H' (uint16) or 'I' (uint32).
 
     NOTE: will mutate @centroids
     """
 
     channels = features
-    n_clusters = len(centroids) // channels
-    n_samples = len(values) // channels
-
-    assert channels < 255, channels
-    assert n_clusters < 255, n_clusters
-    assert n_samples < 65535, n_samples
-
-    cluster_sums = array.array('L', (0 for _ in range(n_clusters*channels)))
-    cluster_counts = array.array('H', (0 for _ in range(n_clusters)))
 
     for i in range(max_iter):
 
-        ## update sample assignments
-        changes = 0
-        for s in range(n_samples):
-            v = values[s*channels:(s+1)*channels]
-
-            # PERF: considering taking all N points at the same time, filling indices and (optionally) distances
-            idx, dist = euclidean_argmin(centroids, v)
-            #idx, dist = 0, 0
-
-            if idx != assignments[s]:
-                changes += 1            
-            assignments[s] = idx
+        # update sample assignments, and the cluster centroids
+        changes = kmeans_step(values, centroids, assignments, channels)
 
         # Pass control back to caller
         # So one can do other work between the iterations
@@ -51,38 +31,37 @@ def cluster_iter(values, centroids, assignments, features,
         if changes <= stop_changes:
             break
 
-        ## update cluster centroids
-        # PERF: consider moving this to C. With a update_centroids() function
-        # reset old values
-        for c in range(n_clusters*channels):
-            cluster_sums[c] = 0
-        for c in range(n_clusters):
-            cluster_counts[c] = 0
 
-        # evaluate samples
-        for s in range(n_samples):
-            c = assignments[s]
-            for i in range(channels):
-                cluster_sums[(c*channels)+i] += values[(s*channels)+i]
+def _index_typecode(n_clusters):
+    """Smallest array typecode that can hold indices for @n_clusters, and one invalid"""
 
-            cluster_counts[c] += 1
+    if n_clusters < 255:
+        return 'B'
+    elif n_clusters < 65535:
+        return 'H'
+    else:
+        return 'I'
 
-        # set new centroid means
-        for c in range(n_clusters):
-            count = cluster_counts[c]
-            if count == 0:
-                continue
 
-            for i in range(channels):
-                centroids[(c*channels)+i] = cluster_sums[(c*channels)+i] // count
-        
+def cluster(values, centroids, features, init=None, seed=1, **kwargs):
+    """
+    Convenience wrapper around cluster_iter
 
+    With init='k-means++', @centroids are first initialized from @values
+    using k-means++, instead of using the values given.
+    """
 
-def cluster(values, centroids, features, **kwargs):
-    """Convenience wrapper around cluster_iter"""
+    if init == 'k-means++':
+        kmeans_plusplus(values, centroids, features, seed)
+    elif init is not None:
+        raise ValueError("Unknown init: " + str(init))
 
     n_samples = len(values) // features
-    assignments = array.array('B', (255 for _ in range(n_samples)))
+    n_clusters = len(centroids) // features
+    typecode = _index_typecode(n_clusters)
+    # initialize with an invalid index, so all samples count as changed
+    unassigned = n_clusters
+    assignments = array.array(typecode, (unassigned for _ in range(n_samples)))
 
     generator = cluster_iter(values, centroids, assignments, features, **kwargs)
     for changes in generator:
@@ -90,3 +69,52 @@ def cluster(values, centroids, features, **kwargs):
 
     return assignments
 
+
+class MiniBatch():
+    """
+    Online/mini-batch K-Means clustering
+
+    Samples can be pushed in chunks as they arrive,
+    without keeping the whole dataset in memory.
+
+    Each centroid is the running mean of the samples assigned to it.
+    After @max_count samples, older samples are given less weight,
+    so that the centroids can follow data that changes over time.
+
+    NOTE: will mutate @centroids
+    """
+
+    def __init__(self, centroids, features, init='k-means++', max_count=1000, seed=1):
+
+        n_clusters = len(centroids) // features
+        self.centroids = centroids
+        self.features = features
+        self.max_count = max_count
+        self.seed = seed
+        # running sums are float for float data, else int32
+        sums_typecode = 'f' if isinstance(centroids[0], float) else 'i'
+        self.sums = array.array(sums_typecode, (0 for _ in range(n_clusters*features)))
+        self.counts = array.array('I', (0 for _ in range(n_clusters)))
+
+        if init == 'k-means++':
+            self.initialized = False
+        elif init is None:
+            self.initialized = True
+        else:
+            raise ValueError("Unknown init: " + str(init))
+
+    def push(self, values):
+        """
+        Update the centroids with the samples in @values
+
+        With init='k-means++', the first chunk is used to initialize the centroids,
+        and must have at least as many samples as there are centroids.
+        """
+
+        if not self.initialized:
+            kmeans_plusplus(values, self.centroids, self.features, self.seed)
+            self.initialized = True
+
+        kmeans_update(values, self.centroids, self.sums, self.counts,
+            self.features, self.max_count)
+
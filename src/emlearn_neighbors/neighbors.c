@@ -28,13 +28,63 @@ void *memset(void *s, int c, size_t n) {
 #endif // MICROPY_ENABLE_DYNRUNTIME
 
 
+// How to find the k nearest items, among the distances to all items
+#define NEIGHBORS_SELECT_AUTO 0 // top-k when there are many items, else sort
+#define NEIGHBORS_SELECT_SORT 1 // sort all the distances
+#define NEIGHBORS_SELECT_TOPK 2 // partial selection of the k smallest distances
+// With fewer items than this, sorting everything is cheap
+#define NEIGHBORS_TOPK_MIN_ITEMS 32
+
+// Distance between items
+#define NEIGHBORS_METRIC_EUCLIDEAN 0
+#define NEIGHBORS_METRIC_SQEUCLIDEAN 1 // squared euclidean. Same neighbors as euclidean, without square root
+#define NEIGHBORS_METRIC_MANHATTAN 2
+#define NEIGHBORS_METRIC_CHEBYSHEV 3
+
+// What additem() does when the model is full
+#define NEIGHBORS_STORE_FIXED 0 // raise an error
+#define NEIGHBORS_STORE_RING 1 // replace the oldest item
+#define NEIGHBORS_STORE_RESERVOIR 2 // reservoir sampling: replace a random item, or drop the new one
+
 // MicroPython type for EmlNeighborsModel
 typedef struct _mp_obj_neighbors_model_t {
     mp_obj_base_t base;
     EmlNeighborsModel model;
     EmlNeighborsDistanceItem *distances;
+    int8_t select; // NEIGHBORS_SELECT_*
+    int8_t selected; // algorithm used in last prediction. SORT or TOPK
+    int8_t store; // NEIGHBORS_STORE_*
+    int16_t oldest; // STORE_RING: index of the oldest item. Items are in order of age from there
+    uint32_t seen; // STORE_RESERVOIR: number of items offered to additem()
+    uint32_t random_state; // xorshift32
+    int8_t metric; // NEIGHBORS_METRIC_*
+    int8_t item_bits; // 16 or 8. With 8, items are stored in data8 instead of model.data
+    int8_t item_shift; // With 8 bit items, int16 values are divided by 2**item_shift before storing
+    int8_t *data8; // (max_items * n_features)
+    int16_t *query; // n_features. Input converted to int16, when needed
 } mp_obj_neighbors_model_t;
 
+// Binary format, for save_into() and load_from()
+//
+// Header, followed by the item data (int16 or int8, as given by item_bits), and labels (int16).
+// item_shift was a reserved zero byte in earlier files, so those load as item_shift=0.
+// All values are little-endian, like all the supported architectures.
+#define NEIGHBORS_BINARY_MAGIC "EMLN"
+#define NEIGHBORS_BINARY_VERSION 1
+
+typedef struct _NeighborsBinaryHeader {
+    char magic[4];
+    uint8_t version;
+    uint8_t item_bits;
+    uint16_t n_features;
+    uint16_t n_items;
+    uint8_t item_shift;
+    uint8_t reserved;
+} NeighborsBinaryHeader;
+
+// Binary format assumes no padding other than what is listed above
+typedef char neighbors_binary_header_size_check[(sizeof(NeighborsBinaryHeader) == 12) ? 1 : -1];
+
 #ifdef MICROPY_ENABLE_DYNRUNTIME
 mp_obj_full_type_t neighbors_model_type;
 #else
@@ -43,11 +93,19 @@ static const mp_obj_type_t neighbors_model_type;
 
 
 // Create a new instace
-static mp_obj_t neighbors_model_new(mp_obj_t items_obj, mp_obj_t features_obj, mp_obj_t neighbors_obj) {
-
-    mp_int_t max_items = mp_obj_get_int(items_obj);
-    mp_int_t n_features = mp_obj_get_int(features_obj);
-    mp_int_t k_neighbors = mp_obj_get_int(neighbors_obj);
+static mp_obj_t neighbors_model_new(size_t n_args, const mp_obj_t *args) {
+
+    mp_int_t max_items = mp_obj_get_int(args[0]);
+    mp_int_t n_features = mp_obj_get_int(args[1]);
+    mp_int_t k_neighbors = mp_obj_get_int(args[2]);
+    mp_int_t item_bits = (n_args >= 4) ? mp_obj_get_int(args[3]) : 16;
+    mp_int_t item_shift = (n_args >= 5) ? mp_obj_get_int(args[4]) : 0;
+    if (item_bits != 16 && item_bits != 8) {
+        mp_raise_ValueError(MP_ERROR_TEXT("item_bits must be 8 or 16"));
+    }
+    if (item_shift < 0 || item_shift > 8 || (item_bits == 16 && item_shift != 0)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("item_shift must be 0-8, and only used with item_bits=8"));
+    }
 
     // allocate space
     mp_obj_neighbors_model_t *o = \
@@ -60,17 +118,33 @@ static mp_obj_t neighbors_model_new(mp_obj_t items_obj, mp_obj_t features_obj, m
     self->n_features = n_features;
     self->n_items = 0;
     self->max_items = max_items;
-    self->data = (int16_t *)m_malloc(sizeof(int16_t)*n_features*max_items);
+    if (item_bits == 8) {
+        self->data = NULL;
+        o->data8 = (int8_t *)m_malloc(sizeof(int8_t)*n_features*max_items);
+    } else {
+        self->data = (int16_t *)m_malloc(sizeof(int16_t)*n_features*max_items);
+        o->data8 = NULL;
+    }
+    o->item_bits = item_bits;
+    o->item_shift = item_shift;
+    o->query = (int16_t *)m_malloc(sizeof(int16_t)*n_features);
+    o->metric = NEIGHBORS_METRIC_EUCLIDEAN;
     self->labels = (int16_t *)m_malloc(sizeof(int16_t)*max_items);
     self->k_neighbors = k_neighbors;
     o->distances = (EmlNeighborsDistanceItem *)m_malloc(sizeof(EmlNeighborsDistanceItem)*max_items);
+    o->select = NEIGHBORS_SELECT_AUTO;
+    o->selected = NEIGHBORS_SELECT_SORT;
+    o->store = NEIGHBORS_STORE_FIXED;
+    o->oldest = 0;
+    o->seen = 0;
+    o->random_state = 1;
 
     return MP_OBJ_FROM_PTR(o);
 
 
 }
 // Define a Python reference to the function above
-static MP_DEFINE_CONST_FUN_OBJ_3(neighbors_model_new_obj, neighbors_model_new);
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(neighbors_model_new_obj, 3, 5, neighbors_model_new);
 
 
 // Delete an instance
@@ -80,7 +154,12 @@ static mp_obj_t neighbors_model_del(mp_obj_t self_obj) {
     EmlNeighborsModel *self = &o->model;   
 
     // free allocated memory
-    m_del(int16_t, self->data, self->n_features*self->max_items);
+    if (o->item_bits == 8) {
+        m_del(int8_t, o->data8, self->n_features*self->max_items);
+    } else {
+        m_del(int16_t, self->data, self->n_features*self->max_items);
+    }
+    m_del(int16_t, o->query, self->n_features);
     m_del(int16_t, self->labels, self->max_items);
     m_del(EmlNeighborsDistanceItem, o->distances, self->max_items);
 
@@ -90,6 +169,92 @@ static mp_obj_t neighbors_model_del(mp_obj_t self_obj) {
 static MP_DEFINE_CONST_FUN_OBJ_1(neighbors_model_del_obj, neighbors_model_del);
 
 
+// Pseudo-random number, using xorshift32
+static uint32_t
+neighbors_random(mp_obj_neighbors_model_t *o)
+{
+    uint32_t x = o->random_state;
+    x ^= x << 13;
+    x ^= x >> 17;
+    x ^= x << 5;
+    o->random_state = x;
+    return x;
+}
+
+// Move item @from to @to. Items do not overlap
+static void
+neighbors_copy_item(mp_obj_neighbors_model_t *o, int to, int from)
+{
+    EmlNeighborsModel *self = &o->model;
+    const int n_features = self->n_features;
+    if (o->item_bits == 8) {
+        memcpy(o->data8 + (to*n_features), o->data8 + (from*n_features), sizeof(int8_t)*n_features);
+    } else {
+        memcpy(self->data + (to*n_features), self->data + (from*n_features), sizeof(int16_t)*n_features);
+    }
+    self->labels[to] = self->labels[from];
+}
+
+// Overwrite an existing item
+// With 8 bit items, values are saturated to the int8 range
+static void
+neighbors_set_item(mp_obj_neighbors_model_t *o, int index,
+        const int16_t *features, int16_t label)
+{
+    EmlNeighborsModel *self = &o->model;
+    const int n_features = self->n_features;
+    if (o->item_bits == 8) {
+        int8_t *item = o->data8 + (index*n_features);
+        for (int i=0; i<n_features; i++) {
+            const int16_t v = features[i];
+            item[i] = (v > INT8_MAX) ? INT8_MAX : (v < INT8_MIN) ? INT8_MIN : v;
+        }
+    } else {
+        memcpy(self->data + (index*n_features), features, sizeof(int16_t)*n_features);
+    }
+    self->labels[index] = label;
+}
+
+// Get input data as int16, from an array with typecode 'h' (int16) or 'b' (int8)
+// With 8 bit items, int16 values are quantized like the stored items: scaled by item_shift, rounded and saturated.
+// int8 values are used as-is, so they are in the same units as the stored items.
+// Returns pointer to the data, or to o->query when converted
+static const int16_t *
+neighbors_get_input(mp_obj_neighbors_model_t *o, const mp_buffer_info_t *bufinfo, int offset)
+{
+    const int n_features = o->model.n_features;
+    if (bufinfo->typecode == 'h') {
+        const int16_t *values = (const int16_t *)bufinfo->buf + offset;
+        if (o->item_bits == 16) {
+            return values;
+        }
+        const int shift = o->item_shift;
+        const int32_t half = (shift > 0) ? (1 << (shift-1)) : 0;
+        for (int i=0; i<n_features; i++) {
+            const int32_t v = (values[i] + half) >> shift;
+            o->query[i] = (v > INT8_MAX) ? INT8_MAX : (v < INT8_MIN) ? INT8_MIN : v;
+        }
+    } else {
+        const int8_t *values = (const int8_t *)bufinfo->buf + offset;
+        for (int i=0; i<n_features; i++) {
+            o->query[i] = values[i];
+        }
+    }
+    return o->query;
+}
+
+// Get length of input data. Typecode 'h' (int16) or 'b' (int8)
+static int
+neighbors_input_length(const mp_buffer_info_t *bufinfo)
+{
+    if (bufinfo->typecode == 'h') {
+        return bufinfo->len / sizeof(int16_t);
+    } else if (bufinfo->typecode == 'b') {
+        return bufinfo->len / sizeof(int8_t);
+    }
+    mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 (h) or int8 (b) array"));
+}
+
 // Add data to the model
 static mp_obj_t neighbors_model_additem(size_t n_args, const mp_obj_t *args) {
 
@@ -99,22 +264,51 @@ static mp_obj_t neighbors_model_additem(size_t n_args, const mp_obj_t *args) {
     // Extract buffer pointer and verify typecode
     mp_buffer_info_t bufinfo;
     mp_get_buffer_raise(args[1], &bufinfo, MP_BUFFER_RW);
-    if (bufinfo.typecode != 'h') {
-        mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 array"));
-    }
-    const int16_t *features = bufinfo.buf;
-    const int n_features = bufinfo.len / sizeof(*features);
+    const int n_features = neighbors_input_length(&bufinfo);
 
     const int16_t label = mp_obj_get_int(args[2]);
 
-    const int item_idx = self->n_items;
-    EmlError err = eml_neighbors_add_item(self, features, n_features, label);
-    if (err != EmlOk) {
+    if (n_features != self->n_features) {
         mp_raise_ValueError(MP_ERROR_TEXT("additem failed"));
     }
+    const int16_t *features = neighbors_get_input(o, &bufinfo, 0);
+    o->seen += 1;
+
+    if (self->n_items < self->max_items) {
+        int item_idx = self->n_items;
+        if (o->store == NEIGHBORS_STORE_RING && o->oldest != 0) {
+            // After removeitem(), keep the items in order of age
+            // by putting the newest just before the oldest
+            for (int i=self->n_items; i>o->oldest; i--) {
+                neighbors_copy_item(o, i, i-1);
+            }
+            item_idx = o->oldest;
+            o->oldest += 1;
+        }
+
+        neighbors_set_item(o, item_idx, features, label);
+        self->n_items += 1;
+        return mp_obj_new_int(item_idx);
+    }
 
-    return mp_obj_new_int(item_idx);
- }
+    // Model is full
+    if (o->store == NEIGHBORS_STORE_RING) {
+        const int item_idx = o->oldest;
+        neighbors_set_item(o, item_idx, features, label);
+        o->oldest = (o->oldest + 1) % self->max_items;
+        return mp_obj_new_int(item_idx);
+    } else if (o->store == NEIGHBORS_STORE_RESERVOIR) {
+        // Each item seen has the same probability of being in the model
+        const uint32_t r = neighbors_random(o) % o->seen;
+        if (r >= (uint32_t)self->max_items) {
+            return mp_obj_new_int(-1);
+        }
+        neighbors_set_item(o, r, features, label);
+        return mp_obj_new_int(r);
+    }
+
+    mp_raise_ValueError(MP_ERROR_TEXT("additem failed"));
+}
 static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(neighbors_model_additem_obj, 3, 3, neighbors_model_additem);
 
 
@@ -132,18 +326,29 @@ static mp_obj_t neighbors_model_get_item(mp_obj_t self_obj, mp_obj_t index_obj,
     // Extract buffer pointer and verify typecode
     mp_buffer_info_t bufinfo;
     mp_get_buffer_raise(out_obj, &bufinfo, MP_BUFFER_RW);
-    if (bufinfo.typecode != 'h') {
-        mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 array"));
-    }
-    int16_t *features = bufinfo.buf;
-    const int n_features = bufinfo.len / sizeof(*features);
+    const int n_features = neighbors_input_length(&bufinfo);
 
     if (n_features != self->n_features) {
         mp_raise_ValueError(MP_ERROR_TEXT("Buffer is wrong size"));
     }
 
-    const int16_t *item = self->data + (index*n_features);
-    memcpy(features, item, sizeof(int16_t)*n_features);
+    if (o->item_bits == 8) {
+        // int16 outputs are scaled back to the units of the inputs
+        const int8_t *item = o->data8 + (index*n_features);
+        for (int i=0; i<n_features; i++) {
+            if (bufinfo.typecode == 'h') {
+                ((int16_t *)bufinfo.buf)[i] = item[i] * (1 << o->item_shift);
+            } else {
+                ((int8_t *)bufinfo.buf)[i] = item[i];
+            }
+        }
+    } else {
+        const int16_t *item = self->data + (index*n_features);
+        if (bufinfo.typecode != 'h') {
+            mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 array"));
+        }
+        memcpy(bufinfo.buf, item, sizeof(int16_t)*n_features);
+    }
 
     return mp_const_none;
 }
@@ -151,37 +356,343 @@ static mp_obj_t neighbors_model_get_item(mp_obj_t self_obj, mp_obj_t index_obj,
 static MP_DEFINE_CONST_FUN_OBJ_3(neighbors_model_get_item_obj, neighbors_model_get_item);
 
 
+// Remove an item. Items after it are moved down by one
+static mp_obj_t neighbors_model_remove_item(mp_obj_t self_obj, mp_obj_t index_obj) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
+    EmlNeighborsModel *self = &o->model;
+
+    const mp_int_t index = mp_obj_get_int(index_obj);
+    if (index < 0 || index >= self->n_items) {
+        mp_raise_ValueError(MP_ERROR_TEXT("Index out of bounds"));
+    }
+
+    for (int i=index; i<self->n_items-1; i++) {
+        neighbors_copy_item(o, i, i+1);
+    }
+    self->n_items -= 1;
+
+    if (index < o->oldest) {
+        o->oldest -= 1;
+    }
+    if (o->oldest >= self->n_items) {
+        o->oldest = 0;
+    }
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_2(neighbors_model_remove_item_obj, neighbors_model_remove_item);
+
+
+// Remove all items
+static mp_obj_t neighbors_model_clear(mp_obj_t self_obj) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
+    EmlNeighborsModel *self = &o->model;
+
+    self->n_items = 0;
+    o->oldest = 0;
+    o->seen = 0;
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_1(neighbors_model_clear_obj, neighbors_model_clear);
+
+
+// Set what additem() does when the model is full
+static mp_obj_t neighbors_model_setstore(size_t n_args, const mp_obj_t *args) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(args[0]);
+    EmlNeighborsModel *self = &o->model;
+
+    const mp_int_t store = mp_obj_get_int(args[1]);
+    if (store != NEIGHBORS_STORE_FIXED && store != NEIGHBORS_STORE_RING && store != NEIGHBORS_STORE_RESERVOIR) {
+        mp_raise_ValueError(MP_ERROR_TEXT("unknown store"));
+    }
+    if (n_args >= 3) {
+        const uint32_t seed = mp_obj_get_int(args[2]);
+        o->random_state = (seed != 0) ? seed : 1; // xorshift needs non-zero state
+    }
+
+    o->store = store;
+    o->oldest = 0;
+    o->seen = self->n_items;
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(neighbors_model_setstore_obj, 2, 3, neighbors_model_setstore);
+
+
+
+
+// Integer square root, rounded down
+static uint32_t
+neighbors_isqrt(uint32_t x)
+{
+    uint32_t r = 0;
+    uint32_t q = 1UL << 30;
+    while (q > x) {
+        q >>= 2;
+    }
+    while (q != 0) {
+        if (x >= r + q) {
+            x -= r + q;
+            r = (r >> 1) + q;
+        } else {
+            r >>= 1;
+        }
+        q >>= 2;
+    }
+    return r;
+}
+
+// Distance between input @a and item @b
+// Stops early once the distance is known to be larger than @bound,
+// and then returns a value that is larger than @bound, but may be smaller than the real distance
+#define NEIGHBORS_DEFINE_DISTANCE(name, item_type) \
+static uint32_t \
+name(const int16_t *a, const item_type *b, int length, int metric, uint32_t bound) \
+{ \
+    if (metric == NEIGHBORS_METRIC_MANHATTAN) { \
+        uint32_t sum = 0; \
+        for (int i=0; i<length; i++) { \
+            const int32_t diff = a[i] - b[i]; \
+            sum += (diff < 0) ? -diff : diff; \
+            if (sum > bound) { \
+                return sum; \
+            } \
+        } \
+        return sum; \
+    } else if (metric == NEIGHBORS_METRIC_CHEBYSHEV) { \
+        uint32_t max = 0; \
+        for (int i=0; i<length; i++) { \
+            const int32_t diff = a[i] - b[i]; \
+            const uint32_t d = (diff < 0) ? -diff : diff; \
+            if (d > max) { \
+                max = d; \
+                if (max > bound) { \
+                    return max; \
+                } \
+            } \
+        } \
+        return max; \
+    } \
+    /* euclidean: compare the squared sum against the squared bound */ \
+    const bool squared = (metric == NEIGHBORS_METRIC_SQEUCLIDEAN); \
+    const uint32_t limit = (squared || bound >= UINT16_MAX) ? \
+        bound : ((bound+1) * (bound+1)) - 1; \
+    uint32_t sum = 0; \
+    for (int i=0; i<length; i++) { \
+        const int32_t diff = a[i] - b[i]; \
+        const uint32_t next = sum + ((uint32_t)diff * (uint32_t)diff); \
+        sum = (next < sum) ? UINT32_MAX : next; /* saturate */ \
+        if (sum > limit) { \
+            return (squared) ? sum : bound + 1; \
+        } \
+    } \
+    return (squared) ? sum : neighbors_isqrt(sum); \
+}
+
+NEIGHBORS_DEFINE_DISTANCE(neighbors_distance_int16, int16_t)
+NEIGHBORS_DEFINE_DISTANCE(neighbors_distance_int8, int8_t)
+
+// Distance from input to an item
+static uint32_t
+neighbors_distance(const mp_obj_neighbors_model_t *o, const int16_t *features, int index, uint32_t bound)
+{
+    const int n_features = o->model.n_features;
+    if (o->item_bits == 8) {
+        return neighbors_distance_int8(features, o->data8 + (index*n_features),
+            n_features, o->metric, bound);
+    } else {
+        return neighbors_distance_int16(features, o->model.data + (index*n_features),
+            n_features, o->metric, bound);
+    }
+}
+
+// Distance in the units of int16 inputs
+// With item_shift, distances are computed between quantized values, and are scaled back here
+static uint32_t
+neighbors_output_distance(const mp_obj_neighbors_model_t *o, uint32_t distance)
+{
+    const int shift = (o->metric == NEIGHBORS_METRIC_SQEUCLIDEAN) ? 2*o->item_shift : o->item_shift;
+    if (distance > (UINT32_MAX >> shift)) {
+        return UINT32_MAX;
+    }
+    return distance << shift;
+}
+
+// Add distances[index] to the k smallest distances, kept sorted at the start
+// The other items are left after these, in no particular order
+// O(n) over all items when k is small, since most items are larger than the k'th smallest seen so far
+static void
+neighbors_select_topk(EmlNeighborsDistanceItem *distances, int index, int k)
+{
+    const EmlNeighborsDistanceItem item = distances[index];
+    int j = index;
+    if (index >= k) {
+        if (item.distance >= distances[k-1].distance) {
+            return;
+        }
+        // swap out the largest
+        distances[index] = distances[k-1];
+        j = k-1;
+    }
+    for (; j > 0 && item.distance < distances[j-1].distance; j--) {
+        distances[j] = distances[j-1];
+    }
+    distances[j] = item;
+}
+
+// Run the model on one input, leaving the k nearest first in o->distances
+static int16_t
+neighbors_predict_one(mp_obj_neighbors_model_t *o, const int16_t *features)
+{
+    EmlNeighborsModel *self = &o->model;
+    const int n_items = self->n_items;
+    const int k = self->k_neighbors;
+    EmlNeighborsDistanceItem *distances = o->distances;
+
+    bool topk = false;
+    if (o->select == NEIGHBORS_SELECT_TOPK) {
+        topk = (k > 0) && (k < n_items);
+    } else if (o->select == NEIGHBORS_SELECT_AUTO) {
+        topk = (k > 0) && (k < n_items) && (n_items >= NEIGHBORS_TOPK_MIN_ITEMS);
+    }
+    o->selected = (topk) ? NEIGHBORS_SELECT_TOPK : NEIGHBORS_SELECT_SORT;
+
+    // Compute distances
+    // With top-k, items further away than the k'th nearest so far are not computed fully
+    // When sorting, all distances are available from getresult(), so they must be exact
+    for (int i=0; i<n_items; i++) {
+        const uint32_t bound = (topk && i >= k) ? distances[k-1].distance : UINT32_MAX;
+        distances[i].index = i;
+        distances[i].distance = neighbors_distance(o, features, i, bound);
+        if (topk) {
+            neighbors_select_topk(distances, i, k);
+        }
+    }
+
+    // Find kNN predictions. Sorts the distances
+    int16_t out = -1;
+    const int length = (topk) ? k : n_items;
+    const EmlError err = eml_neighbors_find_nearest(self, distances, length, k, &out);
+    if (err != EmlOk) {
+        mp_raise_ValueError(MP_ERROR_TEXT("EmlError"));
+    }
 
+    return out;
+}
 
 // Takes a integer array
 static mp_obj_t neighbors_model_predict(mp_obj_t self_obj, mp_obj_t data_obj) {
 
     mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
-    EmlNeighborsModel *self = &o->model;    
 
     // Extract buffer pointer and verify typecode
     mp_buffer_info_t bufinfo;
     mp_get_buffer_raise(data_obj, &bufinfo, MP_BUFFER_RW);
-    if (bufinfo.typecode != 'h') {
-        mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 array"));
+    const int n_features = neighbors_input_length(&bufinfo);
+    if (n_features != o->model.n_features) {
+        mp_raise_ValueError(MP_ERROR_TEXT("EmlError"));
     }
-    const int16_t *features = bufinfo.buf;
-    const int n_features = bufinfo.len / sizeof(*features);
+    const int16_t *features = neighbors_get_input(o, &bufinfo, 0);
 
     // call model
-    int16_t out = -1;
-    const EmlError err = eml_neighbors_predict(self,
-            features, n_features,
-            o->distances, self->max_items,
-            &out);
-    if (err != EmlOk) {
-        mp_raise_ValueError(MP_ERROR_TEXT("EmlError"));
-    }
+    const int16_t out = neighbors_predict_one(o, features);
 
     return mp_obj_new_int(out);
 }
 static MP_DEFINE_CONST_FUN_OBJ_2(neighbors_model_predict_obj, neighbors_model_predict);
 
+
+// Takes a 2d array of input data, (n_samples x n_features) stored as a flat array
+// Outputs the predicted label for each sample
+static mp_obj_t neighbors_model_predict_batch(mp_obj_t self_obj, mp_obj_t data_obj, mp_obj_t out_obj) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
+    EmlNeighborsModel *self = &o->model;
+
+    // Extract buffer pointer and verify typecode
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(data_obj, &bufinfo, MP_BUFFER_READ);
+    mp_buffer_info_t inputs = bufinfo;
+    const int features_length = neighbors_input_length(&inputs);
+    const int n_features = self->n_features;
+    if (n_features == 0 || (features_length % n_features) != 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("inputs length must be multiple of n_features"));
+    }
+    const int n_samples = features_length / n_features;
+
+    // Extract output
+    mp_get_buffer_raise(out_obj, &bufinfo, MP_BUFFER_RW);
+    if (bufinfo.typecode != 'h') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 output array"));
+    }
+    int16_t *labels = bufinfo.buf;
+    const int labels_length = bufinfo.len / sizeof(*labels);
+    if (labels_length != n_samples) {
+        mp_raise_ValueError(MP_ERROR_TEXT("outputs length must be n_samples"));
+    }
+
+    for (int i=0; i<n_samples; i++) {
+        const int16_t *features = neighbors_get_input(o, &inputs, i*n_features);
+        labels[i] = neighbors_predict_one(o, features);
+    }
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_3(neighbors_model_predict_batch_obj, neighbors_model_predict_batch);
+
+
+// Get an optional output array for neighbors_into()
+static void *
+neighbors_get_output(mp_obj_t obj, char typecode, size_t item_size, int length)
+{
+    if (obj == mp_const_none) {
+        return NULL;
+    }
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(obj, &bufinfo, MP_BUFFER_RW);
+    if (bufinfo.typecode != typecode) {
+        mp_raise_ValueError(MP_ERROR_TEXT("unexpected array typecode"));
+    }
+    if ((int)(bufinfo.len / item_size) < length) {
+        mp_raise_ValueError(MP_ERROR_TEXT("output array too short"));
+    }
+    return bufinfo.buf;
+}
+
+// Copy details about the nearest neighbors of last prediction into arrays
+// Any of the arrays can be None. Returns the number of neighbors written
+static mp_obj_t neighbors_model_neighbors_into(size_t n_args, const mp_obj_t *args) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(args[0]);
+    EmlNeighborsModel *self = &o->model;
+
+    const int n_neighbors = (self->k_neighbors < self->n_items) ? self->k_neighbors : self->n_items;
+
+    int16_t *indices = neighbors_get_output(args[1], 'h', sizeof(int16_t), n_neighbors);
+    uint32_t *distances = neighbors_get_output(args[2], 'I', sizeof(uint32_t), n_neighbors);
+    int16_t *labels = neighbors_get_output(args[3], 'h', sizeof(int16_t), n_neighbors);
+
+    for (int i=0; i<n_neighbors; i++) {
+        const EmlNeighborsDistanceItem *item = &o->distances[i];
+        if (indices) {
+            indices[i] = item->index;
+        }
+        if (distances) {
+            distances[i] = neighbors_output_distance(o, item->distance);
+        }
+        if (labels) {
+            labels[i] = self->labels[item->index];
+        }
+    }
+
+    return mp_obj_new_int(n_neighbors);
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(neighbors_model_neighbors_into_obj, 4, 4, neighbors_model_neighbors_into);
+
 // Access details about prediction result
 static mp_obj_t neighbors_model_get_result(mp_obj_t self_obj, mp_obj_t index_obj) {
 
@@ -192,12 +703,17 @@ static mp_obj_t neighbors_model_get_result(mp_obj_t self_obj, mp_obj_t index_obj
     if (index < 0 || index >= self->n_items) {
         mp_raise_ValueError(MP_ERROR_TEXT("Index out of bounds"));
     }
+    // With top-k, the items after the k nearest are not ordered,
+    // and their distances may only be computed partially
+    if (o->selected == NEIGHBORS_SELECT_TOPK && index >= self->k_neighbors) {
+        mp_raise_msg(&mp_type_IndexError, MP_ERROR_TEXT("only k nearest are known with SELECT_TOPK"));
+    }
 
     const EmlNeighborsDistanceItem *item = &o->distances[index];
 
     mp_obj_tuple_t *tuple = MP_OBJ_TO_PTR(mp_obj_new_tuple(3, NULL));
     tuple->items[0] = mp_obj_new_int(item->index);
-    tuple->items[1] = mp_obj_new_int(item->distance);
+    tuple->items[1] = mp_obj_new_int_from_uint(neighbors_output_distance(o, item->distance));
     tuple->items[2] = mp_obj_new_int(self->labels[item->index]);
 
     return tuple;
@@ -206,10 +722,155 @@ static mp_obj_t neighbors_model_get_result(mp_obj_t self_obj, mp_obj_t index_obj
 static MP_DEFINE_CONST_FUN_OBJ_2(neighbors_model_get_result_obj, neighbors_model_get_result);
 
 
+// Set how the nearest neighbors are found
+static mp_obj_t neighbors_model_setselect(mp_obj_t self_obj, mp_obj_t select_obj) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
+
+    const mp_int_t select = mp_obj_get_int(select_obj);
+    if (select != NEIGHBORS_SELECT_AUTO && select != NEIGHBORS_SELECT_SORT && select != NEIGHBORS_SELECT_TOPK) {
+        mp_raise_ValueError(MP_ERROR_TEXT("unknown select"));
+    }
+    o->select = select;
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_2(neighbors_model_setselect_obj, neighbors_model_setselect);
+
+// Size of the items in binary format, in bytes
+static size_t
+neighbors_binary_size(const mp_obj_neighbors_model_t *o, int n_items)
+{
+    const size_t item_size = (o->item_bits / 8) * o->model.n_features;
+    return sizeof(NeighborsBinaryHeader) + (n_items * (item_size + sizeof(int16_t)));
+}
+
+// Size needed by save_into()
+static mp_obj_t neighbors_model_savesize(mp_obj_t self_obj) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
+
+    return mp_obj_new_int(neighbors_binary_size(o, o->model.n_items));
+}
+static MP_DEFINE_CONST_FUN_OBJ_1(neighbors_model_savesize_obj, neighbors_model_savesize);
+
+// Save all items, in binary format
+// Returns the number of bytes written
+static mp_obj_t neighbors_model_save_into(mp_obj_t self_obj, mp_obj_t buffer_obj) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
+    EmlNeighborsModel *self = &o->model;
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(buffer_obj, &bufinfo, MP_BUFFER_WRITE);
+    uint8_t *out = bufinfo.buf;
+
+    const int n_items = self->n_items;
+    const size_t length = neighbors_binary_size(o, n_items);
+    if (bufinfo.len < length) {
+        mp_raise_ValueError(MP_ERROR_TEXT("buffer too small"));
+    }
+
+    const char *magic = NEIGHBORS_BINARY_MAGIC;
+    NeighborsBinaryHeader header = {
+        { magic[0], magic[1], magic[2], magic[3] },
+        NEIGHBORS_BINARY_VERSION, o->item_bits, self->n_features, n_items, o->item_shift, 0
+    };
+    memcpy(out, &header, sizeof(header));
+    out += sizeof(header);
+
+    const size_t data_size = (o->item_bits / 8) * self->n_features * n_items;
+    const void *data = (o->item_bits == 8) ? (const void *)o->data8 : (const void *)self->data;
+    memcpy(out, data, data_size);
+    out += data_size;
+    memcpy(out, self->labels, sizeof(int16_t) * n_items);
+
+    return mp_obj_new_int(length);
+}
+static MP_DEFINE_CONST_FUN_OBJ_2(neighbors_model_save_into_obj, neighbors_model_save_into);
+
+// Load items in binary format, replacing all existing items
+// Returns the number of items loaded
+static mp_obj_t neighbors_model_load_from(mp_obj_t self_obj, mp_obj_t buffer_obj) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
+    EmlNeighborsModel *self = &o->model;
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(buffer_obj, &bufinfo, MP_BUFFER_READ);
+    const uint8_t *in = bufinfo.buf;
+
+    // Check header
+    NeighborsBinaryHeader header;
+    if (bufinfo.len < sizeof(header)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("binary data too short"));
+    }
+    memcpy(&header, in, sizeof(header));
+    in += sizeof(header);
+
+    const char *magic = NEIGHBORS_BINARY_MAGIC;
+    if (header.magic[0] != magic[0] || header.magic[1] != magic[1] ||
+            header.magic[2] != magic[2] || header.magic[3] != magic[3]) {
+        mp_raise_ValueError(MP_ERROR_TEXT("not a binary neighbors model"));
+    }
+    if (header.version != NEIGHBORS_BINARY_VERSION) {
+        mp_raise_ValueError(MP_ERROR_TEXT("unsupported binary model version"));
+    }
+    if (header.item_bits != o->item_bits || header.item_shift != o->item_shift ||
+            header.n_features != self->n_features) {
+        mp_raise_ValueError(MP_ERROR_TEXT("item_bits, item_shift or features does not match model"));
+    }
+    if (header.n_items > self->max_items) {
+        mp_raise_ValueError(MP_ERROR_TEXT("max items"));
+    }
+    const int n_items = header.n_items;
+    if (bufinfo.len < neighbors_binary_size(o, n_items)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("binary data too short"));
+    }
+
+    const size_t data_size = (o->item_bits / 8) * self->n_features * n_items;
+    void *data = (o->item_bits == 8) ? (void *)o->data8 : (void *)self->data;
+    memcpy(data, in, data_size);
+    in += data_size;
+    memcpy(self->labels, in, sizeof(int16_t) * n_items);
+
+    self->n_items = n_items;
+    o->oldest = 0;
+    o->seen = n_items;
+
+    return mp_obj_new_int(n_items);
+}
+static MP_DEFINE_CONST_FUN_OBJ_2(neighbors_model_load_from_obj, neighbors_model_load_from);
+
+
+// Set the distance metric
+static mp_obj_t neighbors_model_setmetric(mp_obj_t self_obj, mp_obj_t metric_obj) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
+
+    const mp_int_t metric = mp_obj_get_int(metric_obj);
+    if (metric < NEIGHBORS_METRIC_EUCLIDEAN || metric > NEIGHBORS_METRIC_CHEBYSHEV) {
+        mp_raise_ValueError(MP_ERROR_TEXT("unknown metric"));
+    }
+    o->metric = metric;
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_2(neighbors_model_setmetric_obj, neighbors_model_setmetric);
+
+// Get the algorithm used to find the nearest neighbors in last prediction
+static mp_obj_t neighbors_model_selection(mp_obj_t self_obj) {
+
+    mp_obj_neighbors_model_t *o = MP_OBJ_TO_PTR(self_obj);
+
+    return mp_obj_new_int(o->selected);
+}
+static MP_DEFINE_CONST_FUN_OBJ_1(neighbors_model_selection_obj, neighbors_model_selection);
+
 
 #ifdef MICROPY_ENABLE_DYNRUNTIME
 // Module setup
-mp_map_elem_t neighbors_model_locals_dict_table[5];
+mp_map_elem_t neighbors_model_locals_dict_table[16];
 static MP_DEFINE_CONST_DICT(neighbors_model_locals_dict, neighbors_model_locals_dict_table);
 
 // Module setup entrypoint
@@ -218,6 +879,16 @@ mp_obj_t mpy_init(mp_obj_fun_bc_t *self, size_t n_args, size_t n_kw, mp_obj_t *a
     MP_DYNRUNTIME_INIT_ENTRY
 
     mp_store_global(MP_QSTR_new, MP_OBJ_FROM_PTR(&neighbors_model_new_obj));
+    mp_store_global(MP_QSTR_SELECT_AUTO, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_SELECT_AUTO));
+    mp_store_global(MP_QSTR_SELECT_SORT, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_SELECT_SORT));
+    mp_store_global(MP_QSTR_SELECT_TOPK, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_SELECT_TOPK));
+    mp_store_global(MP_QSTR_STORE_FIXED, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_STORE_FIXED));
+    mp_store_global(MP_QSTR_STORE_RING, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_STORE_RING));
+    mp_store_global(MP_QSTR_STORE_RESERVOIR, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_STORE_RESERVOIR));
+    mp_store_global(MP_QSTR_METRIC_EUCLIDEAN, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_METRIC_EUCLIDEAN));
+    mp_store_global(MP_QSTR_METRIC_SQEUCLIDEAN, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_METRIC_SQEUCLIDEAN));
+    mp_store_global(MP_QSTR_METRIC_MANHATTAN, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_METRIC_MANHATTAN));
+    mp_store_global(MP_QSTR_METRIC_CHEBYSHEV, MP_OBJ_NEW_SMALL_INT(NEIGHBORS_METRIC_CHEBYSHEV));
 
     neighbors_model_type.base.type = (void*)&mp_fun_table.type_type;
     neighbors_model_type.flags = MP_TYPE_FLAG_ITER_IS_CUSTOM;
@@ -228,8 +899,19 @@ mp_obj_t mpy_init(mp_obj_fun_bc_t *self, size_t n_args, size_t n_kw, mp_obj_t *a
     neighbors_model_locals_dict_table[2] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR___del__), MP_OBJ_FROM_PTR(&neighbors_model_del_obj) };
     neighbors_model_locals_dict_table[3] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_getresult), MP_OBJ_FROM_PTR(&neighbors_model_get_result_obj) };
     neighbors_model_locals_dict_table[4] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_getitem), MP_OBJ_FROM_PTR(&neighbors_model_get_item_obj) };
-
-    MP_OBJ_TYPE_SET_SLOT(&neighbors_model_type, locals_dict, (void*)&neighbors_model_locals_dict, 5);
+    neighbors_model_locals_dict_table[5] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_predict_batch), MP_OBJ_FROM_PTR(&neighbors_model_predict_batch_obj) };
+    neighbors_model_locals_dict_table[6] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_neighbors_into), MP_OBJ_FROM_PTR(&neighbors_model_neighbors_into_obj) };
+    neighbors_model_locals_dict_table[7] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_setselect), MP_OBJ_FROM_PTR(&neighbors_model_setselect_obj) };
+    neighbors_model_locals_dict_table[8] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_selection), MP_OBJ_FROM_PTR(&neighbors_model_selection_obj) };
+    neighbors_model_locals_dict_table[9] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_removeitem), MP_OBJ_FROM_PTR(&neighbors_model_remove_item_obj) };
+    neighbors_model_locals_dict_table[10] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_clear), MP_OBJ_FROM_PTR(&neighbors_model_clear_obj) };
+    neighbors_model_locals_dict_table[11] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_setstore), MP_OBJ_FROM_PTR(&neighbors_model_setstore_obj) };
+    neighbors_model_locals_dict_table[12] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_setmetric), MP_OBJ_FROM_PTR(&neighbors_model_setmetric_obj) };
+    neighbors_model_locals_dict_table[13] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_savesize), MP_OBJ_FROM_PTR(&neighbors_model_savesize_obj) };
+    neighbors_model_locals_dict_table[14] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_save_into), MP_OBJ_FROM_PTR(&neighbors_model_save_into_obj) };
+    neighbors_model_locals_dict_table[15] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_load_from), MP_OBJ_FROM_PTR(&neighbors_model_load_from_obj) };
+
+    MP_OBJ_TYPE_SET_SLOT(&neighbors_model_type, locals_dict, (void*)&neighbors_model_locals_dict, 16);
 
     // This must be last, it restores the globals dict
     MP_DYNRUNTIME_INIT_EXIT
@@ -244,7 +926,18 @@ static const mp_rom_map_elem_t neighbors_model_locals_dict_table[] = {
     { MP_ROM_QSTR(MP_QSTR_additem), MP_ROM_PTR(&neighbors_model_additem_obj) },
     { MP_ROM_QSTR(MP_QSTR___del__), MP_ROM_PTR(&neighbors_model_del_obj) },
     { MP_ROM_QSTR(MP_QSTR_getresult), MP_ROM_PTR(&neighbors_model_get_result_obj) },
-    { MP_ROM_QSTR(MP_QSTR_getitem), MP_ROM_PTR(&neighbors_model_get_item_obj) }
+    { MP_ROM_QSTR(MP_QSTR_getitem), MP_ROM_PTR(&neighbors_model_get_item_obj) },
+    { MP_ROM_QSTR(MP_QSTR_predict_batch), MP_ROM_PTR(&neighbors_model_predict_batch_obj) },
+    { MP_ROM_QSTR(MP_QSTR_neighbors_into), MP_ROM_PTR(&neighbors_model_neighbors_into_obj) },
+    { MP_ROM_QSTR(MP_QSTR_setselect), MP_ROM_PTR(&neighbors_model_setselect_obj) },
+    { MP_ROM_QSTR(MP_QSTR_selection), MP_ROM_PTR(&neighbors_model_selection_obj) },
+    { MP_ROM_QSTR(MP_QSTR_removeitem), MP_ROM_PTR(&neighbors_model_remove_item_obj) },
+    { MP_ROM_QSTR(MP_QSTR_clear), MP_ROM_PTR(&neighbors_model_clear_obj) },
+    { MP_ROM_QSTR(MP_QSTR_setstore), MP_ROM_PTR(&neighbors_model_setstore_obj) },
+    { MP_ROM_QSTR(MP_QSTR_setmetric), MP_ROM_PTR(&neighbors_model_setmetric_obj) },
+    { MP_ROM_QSTR(MP_QSTR_savesize), MP_ROM_PTR(&neighbors_model_savesize_obj) },
+    { MP_ROM_QSTR(MP_QSTR_save_into), MP_ROM_PTR(&neighbors_model_save_into_obj) },
+    { MP_ROM_QSTR(MP_QSTR_load_from), MP_ROM_PTR(&neighbors_model_load_from_obj) },
 };
 static MP_DEFINE_CONST_DICT(neighbors_model_locals_dict, neighbors_model_locals_dict_table);
 
@@ -258,6 +951,16 @@ static MP_DEFINE_CONST_OBJ_TYPE(
 // Define module object.
 static const mp_rom_map_elem_t emlearn_neighbors_globals_table[] = {
     { MP_ROM_QSTR(MP_QSTR_new), MP_ROM_PTR(&neighbors_model_new_obj) },
+    { MP_ROM_QSTR(MP_QSTR_SELECT_AUTO), MP_ROM_INT(NEIGHBORS_SELECT_AUTO) },
+    { MP_ROM_QSTR(MP_QSTR_SELECT_SORT), MP_ROM_INT(NEIGHBORS_SELECT_SORT) },
+    { MP_ROM_QSTR(MP_QSTR_SELECT_TOPK), MP_ROM_INT(NEIGHBORS_SELECT_TOPK) },
+    { MP_ROM_QSTR(MP_QSTR_STORE_FIXED), MP_ROM_INT(NEIGHBORS_STORE_FIXED) },
+    { MP_ROM_QSTR(MP_QSTR_STORE_RING), MP_ROM_INT(NEIGHBORS_STORE_RING) },
+    { MP_ROM_QSTR(MP_QSTR_STORE_RESERVOIR), MP_ROM_INT(NEIGHBORS_STORE_RESERVOIR) },
+    { MP_ROM_QSTR(MP_QSTR_METRIC_EUCLIDEAN), MP_ROM_INT(NEIGHBORS_METRIC_EUCLIDEAN) },
+    { MP_ROM_QSTR(MP_QSTR_METRIC_SQEUCLIDEAN), MP_ROM_INT(NEIGHBORS_METRIC_SQEUCLIDEAN) },
+    { MP_ROM_QSTR(MP_QSTR_METRIC_MANHATTAN), MP_ROM_INT(NEIGHBORS_METRIC_MANHATTAN) },
+    { MP_ROM_QSTR(MP_QSTR_METRIC_CHEBYSHEV), MP_ROM_INT(NEIGHBORS_METRIC_CHEBYSHEV) },
 };
 static MP_DEFINE_CONST_DICT(emlearn_neighbors_globals, emlearn_neighbors_globals_table);
 
@@ -7,16 +7,28 @@ try:
 except ImportError as e:
     pass
 
-def load_model(builder, f):
+import struct
 
-    leaves_found = 0
-    n_classes = None
-    n_features = None
+BINARY_MAGIC = b'EMLT'
+BINARY_VERSION = 1
+BINARY_HEADER = '<4sBBHHHIII'
+
+def _read_csv(f):
 
     for line in f:
         line = line.rstrip('\r')
         line = line.rstrip('\n')
         tok = line.split(',')
+        yield tok
+
+def load_model(builder, f):
+
+    leaves_found = 0
+    n_classes = None
+    n_features = None
+    leaf_bits = 0
+
+    for tok in _read_csv(f):
         kind = tok[0]
         if kind == 'r':
             root = int(tok[1])
@@ -28,17 +40,135 @@ def load_model(builder, f):
             right = int(tok[4])
             builder.addnode(left, right, feature, value)
         elif kind == 'l':
-            leaf = int(tok[1])
+            leaf = float(tok[1]) if leaf_bits == 32 else int(tok[1])
             builder.addleaf(leaf)
             leaves_found += 1
         elif kind == 'f':
             n_features = int(tok[1])
         elif kind == 'c':
             n_classes = int(tok[1])
-        else:        
+        elif kind == 'lb':
+            # must be set before leaves are added
+            leaf_bits = int(tok[1])
+            builder.setdata(n_features, n_classes, leaf_bits)
+        else:
             # unknown value
             pass
 
-    builder.setdata(n_features, n_classes)
+    builder.setdata(n_features, n_classes, leaf_bits)
 
     #print('load-model', leaves_found)
+
+def load_model_binary(builder, data, in_place=False):
+
+    if hasattr(data, 'read'):
+        data = data.read()
+
+    builder.loadbinary(data, in_place)
+
+def _count_csv(f):
+
+    n_trees = 0
+    n_nodes = 0
+    n_leaves = 0
+    for tok in _read_csv(f):
+        kind = tok[0]
+        if kind == 'r':
+            n_trees += 1
+        elif kind == 'n':
+            n_nodes += 1
+        elif kind == 'l':
+            n_leaves += 1
+
+    return n_trees, n_nodes, n_leaves
+
+def load(f):
+
+    # First pass: find the size of the model
+    n_trees, n_nodes, n_leaves = _count_csv(f)
+
+    # Second pass: load the model, with exactly the capacity needed
+    f.seek(0)
+    model = new(n_trees, n_nodes, n_leaves)
+    load_model(model, f)
+
+    return model
+
+def load_models(files):
+
+    # First pass: find the total size of all the models
+    n_trees = 0
+    n_nodes = 0
+    n_leaves = 0
+    for f in files:
+        t, n, l = _count_csv(f)
+        n_trees += t
+        n_nodes += n
+        n_leaves += l
+
+    # Second pass: load each model into the shared pool
+    model = new(n_trees, n_nodes, n_leaves, len(files))
+    for i, f in enumerate(files):
+        if i != 0:
+            model.addmodel()
+        f.seek(0)
+        load_model(model, f)
+
+    return model
+
+def load_binary(data, in_place=False):
+
+    if hasattr(data, 'read'):
+        data = data.read()
+
+    header = struct.unpack_from(BINARY_HEADER, data, 0)
+    n_trees, n_nodes, n_leaves = header[-3:]
+    if in_place:
+        # nodes and leaves are used directly from data
+        n_nodes = 0
+        n_leaves = 0
+
+    model = new(n_trees, n_nodes, n_leaves)
+    model.loadbinary(data, in_place)
+
+    return model
+
+def convert_csv_to_binary(inp, out):
+
+    roots = []
+    nodes = []
+    leaves = []
+    n_classes = None
+    n_features = None
+    leaf_bits = 0
+
+    for tok in _read_csv(inp):
+        kind = tok[0]
+        if kind == 'r':
+            roots.append(int(tok[1]))
+        elif kind == 'n':
+            nodes.append((int(tok[1]), int(float(tok[2])), int(tok[3]), int(tok[4])))
+        elif kind == 'l':
+            leaves.append(tok[1])
+        elif kind == 'f':
+            n_features = int(tok[1])
+        elif kind == 'c':
+            n_classes = int(tok[1])
+        elif kind == 'lb':
+            leaf_bits = int(tok[1])
+
+    if leaf_bits == 32:
+        leaf_format, leaf_size, leaf_type = '<f', 4, float
+    elif leaf_bits == 16:
+        leaf_format, leaf_size, leaf_type = '<h', 2, int
+    else:
+        leaf_format, leaf_size, leaf_type = '<B', 1, int
+
+    out.write(struct.pack(BINARY_HEADER, BINARY_MAGIC, BINARY_VERSION, leaf_bits,
+        n_features, n_classes, 0, len(roots), len(nodes), leaf_size*len(leaves)))
+    for root in roots:
+        out.write(struct.pack('<i', root))
+    for feature, value, left, right in nodes:
+        out.write(struct.pack('<Hhhh', feature, value, left, right))
+    for leaf in leaves:
+        out.write(struct.pack(leaf_format, leaf_type(leaf)))
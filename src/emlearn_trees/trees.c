@@ -6,6 +6,8 @@
 #include "py/runtime.h"
 #endif
 
+// NOTE: inference is implemented in this file, instead of using eml_trees_predict_proba() et.c.
+// To support more than 128 features, profiling, regression with int16 leaves, and several models in one pool
 #define EML_TREES_REGRESSION_ENABLE 0
 #include <eml_trees.h>
 
@@ -13,6 +15,10 @@
 
 #define EMLEARN_MICROPYTHON_DEBUG 0
 
+#ifndef BYTEARRAY_TYPECODE
+#define BYTEARRAY_TYPECODE 1
+#endif
+
 #ifdef MICROPY_ENABLE_DYNRUNTIME
 // memset is used by some standard C constructs
 #if !defined(__linux__) && !defined(__APPLE__)
@@ -25,20 +31,365 @@ void *memset(void *s, int c, size_t n) {
 #endif
 #endif
 
-// For building up an EmlTrees structure
+// Decision node
+// Same size as EmlTreesNode, but uses its padding byte to have a 16 bit feature index.
+// For features below 128 the layout is also identical, on little-endian
+typedef struct _TreesNode {
+    uint16_t feature;
+    int16_t value;
+    int16_t left;
+    int16_t right;
+} TreesNode;
+
+// Tree ensemble
+// Same as EmlTrees, but with TreesNode, and up to 65535 features
+typedef struct _TreesModel {
+    int32_t n_nodes;
+    TreesNode *nodes;
+
+    int32_t n_trees;
+    int32_t *tree_roots;
+
+    int32_t n_leaves;
+    uint8_t *leaves;
+    int8_t leaf_bits;
+
+    uint16_t n_features;
+    int8_t n_classes;
+} TreesModel;
+
+// Profiling counters, accumulated over predictions
+#define TREES_PROFILE_MAX_DEPTH 32
+typedef struct _TreesProfile {
+    uint32_t predictions;
+    uint32_t trees; // number of trees evaluated
+    uint32_t nodes; // number of decision nodes visited
+    uint32_t max_depth;
+    uint32_t depths[TREES_PROFILE_MAX_DEPTH]; // histogram of depth per tree. Last bin is for deeper
+    int n_features;
+    uint32_t *features; // number of splits done on each feature
+} TreesProfile;
+
+// One model, in a pool of trees/nodes/leaves shared by several models
+// Trees of a model are from tree_start until tree_start of the next model
+typedef struct _TreesModelInfo {
+    int32_t tree_start;
+    int32_t node_start; // added to the tree roots of this model
+    int32_t leaf_start; // added to the leaf references of this model
+    uint16_t n_features;
+    int8_t n_classes;
+} TreesModelInfo;
+
+// For building up a TreesModel structure
+// Can contain several models. trees.n_features and trees.n_classes are for the last model
 typedef struct _EmlTreesBuilder {
-    EmlTrees trees;
+    TreesModel trees;
     int max_nodes;
     int max_trees;
-    int max_leaves;
+    int max_leaves; // number of leaves. Storage is max_leaves*trees_leaf_size() bytes
+    TreesModelInfo *models;
+    int n_models;
+    int max_models;
+    TreesProfile *profile; // NULL when profiling is disabled
+    int16_t *inputs; // for converting float inputs. Reused between predictions
+    int inputs_length;
 } EmlTreesBuilder;
 
+// Kinds of leaves supported
+// 0: class number, for classification with majority voting
+// 16: int16 value, for regression
+// 32: float value, for regression
+static bool trees_leaf_bits_valid(int leaf_bits) {
+    return (leaf_bits == 0) || (leaf_bits == 16) || (leaf_bits == 32);
+}
+
+static bool trees_is_regression(const TreesModel *trees) {
+    return (trees->leaf_bits == 16) || (trees->leaf_bits == 32);
+}
+
+// Size of one leaf, in bytes
+static int trees_leaf_size(const TreesModel *trees) {
+    return (trees->leaf_bits == 0) ? 1 : (trees->leaf_bits / 8);
+}
+
+// Number of model outputs. Class probabilities, or a single regression value
+static int trees_outputs(const TreesModel *trees) {
+    return trees_is_regression(trees) ? 1 : trees->n_classes;
+}
+
+// Evaluate a single tree, and update the profiling counters
+static int32_t
+trees_predict_tree_profile(const TreesModel *trees, TreesProfile *profile,
+        int32_t tree_root, const int16_t *features)
+{
+    int32_t node_idx = tree_root;
+    uint32_t depth = 0;
+    while (node_idx >= 0) {
+        const TreesNode *node = &trees->nodes[node_idx];
+        const int16_t child = (features[node->feature] < node->value) ? node->left : node->right;
+        if (node->feature < profile->n_features) {
+            profile->features[node->feature] += 1;
+        }
+        depth += 1;
+        node_idx = (child >= 0) ? (node_idx + child) : child;
+    }
+
+    profile->trees += 1;
+    profile->nodes += depth;
+    if (depth > profile->max_depth) {
+        profile->max_depth = depth;
+    }
+    const int bin = (depth < TREES_PROFILE_MAX_DEPTH) ? depth : (TREES_PROFILE_MAX_DEPTH-1);
+    profile->depths[bin] += 1;
+
+    return -node_idx-1;
+}
+
+// Evaluate a single tree, returns the leaf number
+static int32_t
+trees_predict_tree(const TreesModel *trees, TreesProfile *profile,
+        int32_t tree_root, const int16_t *features)
+{
+    if (profile) {
+        return trees_predict_tree_profile(trees, profile, tree_root, features);
+    }
+
+    const TreesNode *nodes = trees->nodes;
+    int32_t node_idx = tree_root;
+    while (node_idx >= 0) {
+        const TreesNode *node = &nodes[node_idx];
+        const int16_t child = (features[node->feature] < node->value) ? node->left : node->right;
+        node_idx = (child >= 0) ? (node_idx + child) : child;
+    }
+    return -node_idx-1;
+}
+
+// Number of input values in buffer
+// Inputs can be int16 (h), or float (f) which is converted by trees_get_inputs()
+static int trees_inputs_length(const mp_buffer_info_t *bufinfo) {
+    if (bufinfo->typecode == 'h') {
+        return bufinfo->len / sizeof(int16_t);
+    } else if (bufinfo->typecode == 'f') {
+        return bufinfo->len / sizeof(float);
+    }
+    mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 (h) or float (f) array"));
+    return 0;
+}
+
+// Get input values [offset, offset+length) as int16
+// Float values are converted like int() does, saturated to the int16 range
+static const int16_t *
+trees_get_inputs(EmlTreesBuilder *self, const mp_buffer_info_t *bufinfo, int offset, int length)
+{
+    if (bufinfo->typecode == 'h') {
+        return ((const int16_t *)bufinfo->buf) + offset;
+    }
+
+    if (self->inputs_length < length) {
+        self->inputs = m_renew(int16_t, self->inputs, self->inputs_length, length);
+        self->inputs_length = length;
+    }
+    const float *values = ((const float *)bufinfo->buf) + offset;
+    for (int i=0; i<length; i++) {
+        const float v = values[i];
+        if (v >= INT16_MAX) {
+            self->inputs[i] = INT16_MAX;
+        } else if (v <= INT16_MIN) {
+            self->inputs[i] = INT16_MIN;
+        } else if (v == v) {
+            self->inputs[i] = (int16_t)v; // truncates towards zero
+        } else {
+            self->inputs[i] = 0; // NaN
+        }
+    }
+    return self->inputs;
+}
+
+// Run classification model with majority voting, outputs class probabilities
+// Same as eml_trees_predict_proba, but supports profiling
+static EmlError
+trees_predict_proba(const TreesModel *trees, TreesProfile *profile,
+        const int16_t *features, int features_length,
+        float *out, int32_t out_length)
+{
+    if (out_length != trees->n_classes || features_length != trees->n_features) {
+        return EmlSizeMismatch;
+    }
+    if (trees->leaf_bits != 0) {
+        return EmlUnsupported;
+    }
+    if (profile) {
+        profile->predictions += 1;
+    }
+
+    for (int i=0; i<out_length; i++) {
+        out[i] = 0.0f;
+    }
+    for (int32_t i=0; i<trees->n_trees; i++) {
+        const int32_t leaf_number = \
+            trees_predict_tree(trees, profile, trees->tree_roots[i], features);
+        const int32_t class_no = trees->leaves[leaf_number];
+        if (class_no >= out_length) {
+            return EmlUnknownError;
+        }
+        out[class_no] += 1.0f;
+    }
+    for (int i=0; i<out_length; i++) {
+        out[i] = out[i] / trees->n_trees;
+    }
+
+    return EmlOk;
+}
+
+// Run classification model, returns the most probable class, or -EmlError on failure
+static int32_t
+trees_predict(const TreesModel *trees, TreesProfile *profile,
+        const int16_t *features, int features_length)
+{
+    const int n_classes = trees->n_classes;
+    if (features_length != trees->n_features || n_classes > EMTREES_MAX_CLASSES) {
+        return -EmlSizeMismatch;
+    }
+
+    float votes[EMTREES_MAX_CLASSES];
+    const EmlError err = \
+        trees_predict_proba(trees, profile, features, features_length, votes, n_classes);
+    if (err != EmlOk) {
+        return -err;
+    }
+
+    int32_t most_voted_class = -1;
+    float most_voted_value = 0.0f;
+    for (int32_t i=0; i<n_classes; i++) {
+        if (votes[i] > most_voted_value) {
+            most_voted_class = i;
+            most_voted_value = votes[i];
+        }
+    }
+    return most_voted_class;
+}
+
+// Run regression model, output is the average of leaf values over all trees
+static EmlError
+trees_regress(const TreesModel *trees, TreesProfile *profile,
+        const int16_t *features, int features_length,
+        float *out, int32_t out_length)
+{
+    if (out_length != 1 || features_length != trees->n_features) {
+        return EmlSizeMismatch;
+    }
+    if (profile) {
+        profile->predictions += 1;
+    }
+
+    float sum = 0.0f;
+    for (int32_t i=0; i<trees->n_trees; i++) {
+        const int32_t leaf_number = \
+            trees_predict_tree(trees, profile, trees->tree_roots[i], features);
+        if (trees->leaf_bits == 32) {
+            sum += ((const float *)trees->leaves)[leaf_number];
+        } else if (trees->leaf_bits == 16) {
+            sum += ((const int16_t *)trees->leaves)[leaf_number];
+        } else {
+            return EmlUnsupported;
+        }
+    }
+    out[0] = sum / trees->n_trees;
+
+    return EmlOk;
+}
+
+// Get one of the models in the pool
+static void
+trees_get_model(const EmlTreesBuilder *self, mp_int_t model, TreesModel *out)
+{
+    if (model < 0 || model >= self->n_models) {
+        mp_raise_ValueError(MP_ERROR_TEXT("invalid model"));
+    }
+    const TreesModelInfo *info = &self->models[model];
+    const int32_t tree_end = (model+1 < self->n_models) ? \
+        self->models[model+1].tree_start : self->trees.n_trees;
+
+    *out = self->trees;
+    out->tree_roots = self->trees.tree_roots + info->tree_start;
+    out->n_trees = tree_end - info->tree_start;
+    out->n_features = info->n_features;
+    out->n_classes = info->n_classes;
+}
+
 // MicroPython type for EmlTreesBuilder
 typedef struct _mp_obj_trees_builder_t {
     mp_obj_base_t base;
     EmlTreesBuilder builder;
+    mp_obj_t data_obj; // buffer with model data, when used in-place. Else MP_OBJ_NULL
 } mp_obj_trees_builder_t;
 
+// Binary model format
+//
+// Header, followed by tree roots (int32), decision nodes and leaves.
+// Leaves are uint8 class numbers, or int16/float values, as given by leaf_bits.
+// Decision nodes are stored with the same layout as TreesNode:
+// feature (uint16), value (int16), left (int16), right (int16)
+// This allows the data to be copied in one go, or to be used in-place.
+// All values are little-endian, like all the supported architectures.
+#define TREES_BINARY_MAGIC "EMLT"
+#define TREES_BINARY_VERSION 1
+
+typedef struct _TreesBinaryHeader {
+    char magic[4];
+    uint8_t version;
+    uint8_t leaf_bits;
+    uint16_t n_features;
+    uint16_t n_classes;
+    uint16_t reserved;
+    uint32_t n_trees;
+    uint32_t n_nodes;
+    uint32_t n_leaves; // in bytes
+} TreesBinaryHeader;
+
+// Binary format assumes no padding other than what is listed above
+typedef char trees_binary_header_size_check[(sizeof(TreesBinaryHeader) == 24) ? 1 : -1];
+typedef char trees_binary_node_size_check[(sizeof(TreesNode) == 8) ? 1 : -1];
+
+// Check that all references in a binary model are inside the model
+// Roots and children that are >= 0 must be nodes, negative ones must be leaves.
+// Children are relative to their node, and must be after it. So trees always terminate.
+// Data might not be aligned, so values are copied out before use
+static bool
+trees_binary_valid(const uint8_t *roots_data, uint32_t n_trees,
+        const uint8_t *nodes_data, uint32_t n_nodes,
+        uint32_t n_leaves, uint16_t n_features)
+{
+    for (uint32_t i=0; i<n_trees; i++) {
+        int32_t root;
+        memcpy(&root, roots_data + (sizeof(int32_t) * i), sizeof(root));
+        if (root >= 0 && (uint32_t)root >= n_nodes) {
+            return false;
+        }
+        if (root < 0 && (uint32_t)(-(root+1)) >= n_leaves) {
+            return false;
+        }
+    }
+    for (uint32_t i=0; i<n_nodes; i++) {
+        TreesNode node;
+        memcpy(&node, nodes_data + (sizeof(TreesNode) * i), sizeof(node));
+        if (node.feature >= n_features) {
+            return false;
+        }
+        const int16_t children[2] = { node.left, node.right };
+        for (int c=0; c<2; c++) {
+            const int16_t child = children[c];
+            if (child >= 0 && (child == 0 || (uint32_t)child >= (n_nodes - i))) {
+                return false;
+            }
+            if (child < 0 && (uint32_t)(-(child+1)) >= n_leaves) {
+                return false;
+            }
+        }
+    }
+    return true;
+}
+
 #if MICROPY_ENABLE_DYNRUNTIME
 mp_obj_full_type_t trees_builder_type;
 #else
@@ -46,11 +397,15 @@ static const mp_obj_type_t trees_builder_type;
 #endif
 
 // Create a new tree builder
-static mp_obj_t builder_new(mp_obj_t trees_obj, mp_obj_t nodes_obj, mp_obj_t leaves_obj) {
-
-    mp_int_t max_nodes = mp_obj_get_int(nodes_obj);
-    mp_int_t max_trees = mp_obj_get_int(trees_obj);
-    mp_int_t max_leaves = mp_obj_get_int(leaves_obj);
+static mp_obj_t builder_new(size_t n_args, const mp_obj_t *args) {
+
+    mp_int_t max_nodes = mp_obj_get_int(args[1]);
+    mp_int_t max_trees = mp_obj_get_int(args[0]);
+    mp_int_t max_leaves = mp_obj_get_int(args[2]);
+    mp_int_t max_models = (n_args >= 4) ? mp_obj_get_int(args[3]) : 1;
+    if (max_models < 1) {
+        mp_raise_ValueError(MP_ERROR_TEXT("max_models must be at least 1"));
+    }
 
 #if EMLEARN_MICROPYTHON_DEBUG
     mp_printf(&mp_plat_print, "builder-new nodes=%d trees=%d\n", max_nodes, max_trees);
@@ -66,9 +421,10 @@ static mp_obj_t builder_new(mp_obj_t trees_obj, mp_obj_t nodes_obj, mp_obj_t lea
     self->max_nodes = max_nodes;
     self->max_trees = max_trees;
     self->max_leaves = max_leaves;
+    self->max_models = max_models;
 
     // create storage for trees
-    EmlTreesNode *nodes = m_new(EmlTreesNode, self->max_nodes);
+    TreesNode *nodes = m_new(TreesNode, self->max_nodes);
     int32_t *roots = m_new(int32_t, self->max_trees);
     uint8_t *leaves = m_new(uint8_t, self->max_leaves);
 
@@ -82,7 +438,7 @@ static mp_obj_t builder_new(mp_obj_t trees_obj, mp_obj_t nodes_obj, mp_obj_t lea
     self->trees.n_trees = 0;
     self->trees.tree_roots = roots;
 
-    self->trees.leaf_bits = 0; // XXX: only class supported so far 
+    self->trees.leaf_bits = 0; // NOTE: can be changed in setdata(), before adding leaves
     self->trees.n_leaves = 0;
     self->trees.leaves = leaves;
 
@@ -90,9 +446,27 @@ static mp_obj_t builder_new(mp_obj_t trees_obj, mp_obj_t nodes_obj, mp_obj_t lea
     self->trees.n_classes = 0;
     self->trees.n_features = 0;
 
+    // The first model starts at the beginning of the pool. More can be added with addmodel()
+    self->models = m_new(TreesModelInfo, self->max_models);
+    self->models[0] = (TreesModelInfo){ 0, 0, 0, 0, 0 };
+    self->n_models = 1;
+
+    self->profile = NULL;
+    self->inputs = NULL;
+    self->inputs_length = 0;
+    o->data_obj = MP_OBJ_NULL;
+
     return MP_OBJ_FROM_PTR(o);
 }
-static MP_DEFINE_CONST_FUN_OBJ_3(builder_new_obj, builder_new);
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(builder_new_obj, 3, 4, builder_new);
+
+static void trees_profile_free(EmlTreesBuilder *self) {
+    if (self->profile) {
+        m_del(uint32_t, self->profile->features, self->profile->n_features);
+        m_del(TreesProfile, self->profile, 1);
+        self->profile = NULL;
+    }
+}
 
 // Delete a tree builder
 static mp_obj_t builder_del(mp_obj_t trees_obj) {
@@ -101,9 +475,15 @@ static mp_obj_t builder_del(mp_obj_t trees_obj) {
     EmlTreesBuilder *self = &o->builder;
 
     // free allocated data
-    m_del(EmlTreesNode, self->trees.nodes, self->max_nodes);
-    m_del(int32_t, self->trees.tree_roots, self->max_nodes);
-    m_del(uint8_t, self->trees.leaves, self->max_leaves);
+    // NOTE: when data is used in-place, nodes and leaves are not owned by us
+    if (o->data_obj == MP_OBJ_NULL) {
+        m_del(TreesNode, self->trees.nodes, self->max_nodes);
+        m_del(uint8_t, self->trees.leaves, self->max_leaves * trees_leaf_size(&self->trees));
+    }
+    m_del(int32_t, self->trees.tree_roots, self->max_trees);
+    m_del(TreesModelInfo, self->models, self->max_models);
+    m_del(int16_t, self->inputs, self->inputs_length);
+    trees_profile_free(self);
 
 #if EMLEARN_MICROPYTHON_DEBUG
     mp_printf(&mp_plat_print, "emltrees del \n");
@@ -113,18 +493,45 @@ static mp_obj_t builder_del(mp_obj_t trees_obj) {
 }
 static MP_DEFINE_CONST_FUN_OBJ_1(builder_del_obj, builder_del);
 
-// set number of features and classes
-static mp_obj_t builder_setdata(mp_obj_t self_obj, mp_obj_t features_obj, mp_obj_t classes_obj) {
+// set number of features and classes, and optionally kind of leaves
+static mp_obj_t builder_setdata(size_t n_args, const mp_obj_t *args) {
 
-    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(self_obj);
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(args[0]);
     EmlTreesBuilder *self = &o->builder;    
 
-    self->trees.n_features = mp_obj_get_int(features_obj);
-    self->trees.n_classes = mp_obj_get_int(classes_obj);
+    const int leaf_bits = (n_args >= 4) ? mp_obj_get_int(args[3]) : self->trees.leaf_bits;
+    if (!trees_leaf_bits_valid(leaf_bits)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("unsupported leaf_bits"));
+    }
+
+    if (leaf_bits != self->trees.leaf_bits) {
+        if (self->trees.n_leaves != 0 || o->data_obj != MP_OBJ_NULL) {
+            mp_raise_ValueError(MP_ERROR_TEXT("leaf_bits must be set before adding leaves"));
+        }
+        if (self->n_models > 1) {
+            mp_raise_ValueError(MP_ERROR_TEXT("all models must have the same leaf_bits"));
+        }
+        // Resize leaf storage, keeping the same number of leaves
+        const int old_size = self->max_leaves * trees_leaf_size(&self->trees);
+        self->trees.leaf_bits = leaf_bits;
+        const int new_size = self->max_leaves * trees_leaf_size(&self->trees);
+        self->trees.leaves = m_renew(uint8_t, self->trees.leaves, old_size, new_size);
+    }
+
+    const mp_int_t n_features = mp_obj_get_int(args[1]);
+    if (n_features < 0 || n_features > UINT16_MAX) {
+        mp_raise_ValueError(MP_ERROR_TEXT("features out of bounds"));
+    }
+    self->trees.n_features = n_features;
+    self->trees.n_classes = mp_obj_get_int(args[2]);
+
+    TreesModelInfo *model = &self->models[self->n_models-1];
+    model->n_features = self->trees.n_features;
+    model->n_classes = self->trees.n_classes;
 
     return MP_OBJ_FROM_PTR(o);
 }
-static MP_DEFINE_CONST_FUN_OBJ_3(builder_setdata_obj, builder_setdata);
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(builder_setdata_obj, 3, 4, builder_setdata);
 
 
 // Add a node to the tree
@@ -133,26 +540,39 @@ static mp_obj_t builder_addnode(size_t n_args, const mp_obj_t *args) {
     mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(args[0]);
     EmlTreesBuilder *self = &o->builder;    
 
-    const int16_t left = mp_obj_get_int(args[1]);
-    const int16_t right = mp_obj_get_int(args[2]);
+    mp_int_t left = mp_obj_get_int(args[1]);
+    mp_int_t right = mp_obj_get_int(args[2]);
     const int feature = mp_obj_get_int(args[3]);
     const int16_t value = mp_obj_get_int(args[4]);
 
-    if (feature > 127 || feature < -1) {
+    if (feature > UINT16_MAX || feature < 0) {
         mp_raise_ValueError(MP_ERROR_TEXT("feature out of bounds"));
     }
 
+    // Leaves are relative to the start of the current model in the pool
+    const int32_t leaf_start = self->models[self->n_models-1].leaf_start;
+    if (left < 0) {
+        left -= leaf_start;
+    }
+    if (right < 0) {
+        right -= leaf_start;
+    }
+    if (left < INT16_MIN || right < INT16_MIN) {
+        mp_raise_ValueError(MP_ERROR_TEXT("leaf out of bounds"));
+    }
+
     if (self->trees.n_nodes >= self->max_nodes) {
         mp_raise_ValueError(MP_ERROR_TEXT("max nodes"));
     }
 
     const int node_index = self->trees.n_nodes++;
-    self->trees.nodes[node_index] = (EmlTreesNode){ (int8_t)feature, value, left, right };
+    self->trees.nodes[node_index] = \
+        (TreesNode){ (uint16_t)feature, value, (int16_t)left, (int16_t)right };
 
 #if EMLEARN_MICROPYTHON_DEBUG
     mp_printf(&mp_plat_print,
-        "emltrees-addnode feature=%d threshold=%f left=%d right=%d \n",
-        feature, value, left, right
+        "emltrees-addnode feature=%d threshold=%d left=%d right=%d \n",
+        feature, value, (int)left, (int)right
     );
 #endif
 
@@ -167,14 +587,22 @@ static mp_obj_t builder_addroot(size_t n_args, const mp_obj_t *args) {
     mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(args[0]);
     EmlTreesBuilder *self = &o->builder;    
 
-    const int16_t root = mp_obj_get_int(args[1]);
+    int32_t root = mp_obj_get_int(args[1]);
 
     if (self->trees.n_trees >= self->max_trees) {
         mp_raise_ValueError(MP_ERROR_TEXT("max trees"));
     }
 
+    // Nodes and leaves are relative to the start of the current model in the pool
+    const TreesModelInfo *model = &self->models[self->n_models-1];
+    if (root >= 0) {
+        root += model->node_start;
+    } else {
+        root -= model->leaf_start;
+    }
+
     const int root_index = self->trees.n_trees++;
-    self->trees.tree_roots[root_index] = root; 
+    self->trees.tree_roots[root_index] = root;
 
     return mp_const_none;
  }
@@ -187,59 +615,435 @@ static mp_obj_t builder_addleaf(mp_obj_t self_obj, mp_obj_t leaf_obj) {
     mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(self_obj);
     EmlTreesBuilder *self = &o->builder;    
 
-    mp_int_t leaf_value = mp_obj_get_int(leaf_obj);
-
     if (self->trees.n_leaves >= self->max_leaves) {
         mp_raise_ValueError(MP_ERROR_TEXT("max leaves"));
     }
 
     const int leaf_index = self->trees.n_leaves++;
-    self->trees.leaves[leaf_index] = (uint8_t)leaf_value;
+    if (self->trees.leaf_bits == 32) {
+        ((float *)self->trees.leaves)[leaf_index] = mp_obj_get_float_to_f(leaf_obj);
+    } else if (self->trees.leaf_bits == 16) {
+        ((int16_t *)self->trees.leaves)[leaf_index] = mp_obj_get_int(leaf_obj);
+    } else {
+        self->trees.leaves[leaf_index] = (uint8_t)mp_obj_get_int(leaf_obj);
+    }
 
     return mp_const_none;
  }
 static MP_DEFINE_CONST_FUN_OBJ_2(builder_addleaf_obj, builder_addleaf);
 
 
-// Return the shape of the output
-static mp_obj_t builder_get_outputs(mp_obj_t self_obj) {
+// Start a new model in the pool
+// Following trees/nodes/leaves, and setdata()/loadbinary(), are for this model
+// Returns the model id
+static mp_obj_t builder_addmodel(mp_obj_t self_obj) {
+
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(self_obj);
+    EmlTreesBuilder *self = &o->builder;
+
+    if (o->data_obj != MP_OBJ_NULL) {
+        mp_raise_ValueError(MP_ERROR_TEXT("model data is read-only"));
+    }
+    if (self->n_models >= self->max_models) {
+        mp_raise_ValueError(MP_ERROR_TEXT("max models"));
+    }
+
+    const int model_index = self->n_models++;
+    self->models[model_index] = (TreesModelInfo){
+        self->trees.n_trees, self->trees.n_nodes, self->trees.n_leaves, 0, 0
+    };
+    // NOTE: these are set later, in setdata()
+    self->trees.n_features = 0;
+    self->trees.n_classes = 0;
+
+    return mp_obj_new_int(model_index);
+}
+static MP_DEFINE_CONST_FUN_OBJ_1(builder_addmodel_obj, builder_addmodel);
+
+
+// Load a complete model from binary format
+static mp_obj_t builder_loadbinary(size_t n_args, const mp_obj_t *args) {
+
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(args[0]);
+    EmlTreesBuilder *self = &o->builder;
+
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(args[1], &bufinfo, MP_BUFFER_READ);
+    const uint8_t *data = bufinfo.buf;
+    const size_t data_length = bufinfo.len;
+
+    const bool in_place = (n_args >= 3) ? mp_obj_is_true(args[2]) : false;
+
+    if (o->data_obj != MP_OBJ_NULL) {
+        mp_raise_ValueError(MP_ERROR_TEXT("model data is read-only"));
+    }
+
+    // Check header
+    TreesBinaryHeader header;
+    if (data_length < sizeof(header)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("binary model too short"));
+    }
+    memcpy(&header, data, sizeof(header));
+
+    const char *magic = TREES_BINARY_MAGIC;
+    if (header.magic[0] != magic[0] || header.magic[1] != magic[1] ||
+            header.magic[2] != magic[2] || header.magic[3] != magic[3]) {
+        mp_raise_ValueError(MP_ERROR_TEXT("not a binary trees model"));
+    }
+    if (header.version != TREES_BINARY_VERSION) {
+        mp_raise_ValueError(MP_ERROR_TEXT("unsupported binary model version"));
+    }
+    if (!trees_leaf_bits_valid(header.leaf_bits)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("unsupported leaf_bits"));
+    }
+    const int leaf_size = (header.leaf_bits == 0) ? 1 : (header.leaf_bits / 8);
+    if ((header.n_leaves % leaf_size) != 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("leaves length must be multiple of leaf size"));
+    }
+
+    // Computed in 64 bit, so that large counts in the header cannot wrap around
+    const uint64_t roots_offset = sizeof(header);
+    const uint64_t nodes_offset = roots_offset + ((uint64_t)sizeof(int32_t) * header.n_trees);
+    const uint64_t leaves_offset = nodes_offset + ((uint64_t)sizeof(TreesNode) * header.n_nodes);
+    const uint64_t expect_length = leaves_offset + ((uint64_t)sizeof(uint8_t) * header.n_leaves);
+    if ((uint64_t)data_length < expect_length) {
+        mp_raise_ValueError(MP_ERROR_TEXT("binary model too short"));
+    }
+
+    if (!trees_binary_valid(data + roots_offset, header.n_trees,
+            data + nodes_offset, header.n_nodes,
+            header.n_leaves / leaf_size, header.n_features)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("invalid binary model"));
+    }
+
+#if EMLEARN_MICROPYTHON_DEBUG
+    mp_printf(&mp_plat_print,
+        "emltrees-loadbinary trees=%d nodes=%d leaves=%d in-place=%d \n",
+        (int)header.n_trees, (int)header.n_nodes, (int)header.n_leaves, (int)in_place
+    );
+#endif
+
+    // Loaded into the current model, after any previous models in the pool
+    TreesModelInfo *model = &self->models[self->n_models-1];
+    if (self->n_models > 1 && header.leaf_bits != self->trees.leaf_bits) {
+        mp_raise_ValueError(MP_ERROR_TEXT("all models must have the same leaf_bits"));
+    }
+
+    // Roots are always copied. Small, and might not be aligned in buffer
+    if (header.n_trees > (uint32_t)(self->max_trees - model->tree_start)) {
+        mp_raise_ValueError(MP_ERROR_TEXT("max trees"));
+    }
+
+    if (in_place) {
+        if (self->n_models > 1) {
+            mp_raise_ValueError(MP_ERROR_TEXT("in_place only supported for a single model"));
+        }
+        if ((((uintptr_t)(data + nodes_offset) % sizeof(int16_t)) != 0) ||
+                (((uintptr_t)(data + leaves_offset) % leaf_size) != 0)) {
+            mp_raise_ValueError(MP_ERROR_TEXT("buffer not aligned"));
+        }
+
+        // Release our own storage, use the data from buffer instead
+        m_del(TreesNode, self->trees.nodes, self->max_nodes);
+        m_del(uint8_t, self->trees.leaves, self->max_leaves * trees_leaf_size(&self->trees));
+        self->max_nodes = 0;
+        self->max_leaves = 0;
+        self->trees.nodes = (TreesNode *)(data + nodes_offset);
+        self->trees.leaves = (uint8_t *)(data + leaves_offset);
+        // keep a reference, so the buffer is not garbage collected
+        o->data_obj = args[1];
+    } else {
+        if (header.n_nodes > (uint32_t)(self->max_nodes - model->node_start)) {
+            mp_raise_ValueError(MP_ERROR_TEXT("max nodes"));
+        }
+        // Leaf storage is reused, also when the size of each leaf is different
+        const uint32_t leaves_capacity = self->max_leaves * trees_leaf_size(&self->trees);
+        const uint32_t leaves_used = model->leaf_start * leaf_size;
+        if (header.n_leaves > leaves_capacity - leaves_used) {
+            mp_raise_ValueError(MP_ERROR_TEXT("max leaves"));
+        }
+        TreesNode *nodes = self->trees.nodes + model->node_start;
+        memcpy(nodes, data + nodes_offset, sizeof(TreesNode) * header.n_nodes);
+        memcpy(self->trees.leaves + leaves_used, data + leaves_offset,
+            sizeof(uint8_t) * header.n_leaves);
+        self->max_leaves = leaves_capacity / leaf_size;
+
+        // Make leaf references relative to the start of the pool
+        if (model->leaf_start != 0) {
+            for (uint32_t i=0; i<header.n_nodes; i++) {
+                const int32_t left = nodes[i].left - ((nodes[i].left < 0) ? model->leaf_start : 0);
+                const int32_t right = nodes[i].right - ((nodes[i].right < 0) ? model->leaf_start : 0);
+                if (left < INT16_MIN || right < INT16_MIN) {
+                    mp_raise_ValueError(MP_ERROR_TEXT("leaf out of bounds"));
+                }
+                nodes[i].left = left;
+                nodes[i].right = right;
+            }
+        }
+    }
+    int32_t *roots = self->trees.tree_roots + model->tree_start;
+    memcpy(roots, data + roots_offset, sizeof(int32_t) * header.n_trees);
+    for (uint32_t i=0; i<header.n_trees; i++) {
+        if (roots[i] >= 0) {
+            roots[i] += model->node_start;
+        } else {
+            roots[i] -= model->leaf_start;
+        }
+    }
+
+    self->trees.n_trees = model->tree_start + header.n_trees;
+    self->trees.n_nodes = model->node_start + header.n_nodes;
+    self->trees.n_leaves = model->leaf_start + (header.n_leaves / leaf_size);
+    self->trees.leaf_bits = header.leaf_bits;
+    self->trees.n_features = header.n_features;
+    self->trees.n_classes = header.n_classes;
+    model->n_features = self->trees.n_features;
+    model->n_classes = self->trees.n_classes;
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(builder_loadbinary_obj, 2, 3, builder_loadbinary);
+
+
+// Release unused capacity, after the model has been loaded
+static mp_obj_t builder_shrink(mp_obj_t self_obj) {
 
     mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(self_obj);
     EmlTreesBuilder *self = &o->builder;
 
-    const int n_classes = self->trees.n_classes;
-    if (n_classes == 0) {
+    const int n_trees = self->trees.n_trees;
+    const int n_nodes = self->trees.n_nodes;
+    const int n_leaves = self->trees.n_leaves;
+
+#if EMLEARN_MICROPYTHON_DEBUG
+    mp_printf(&mp_plat_print,
+        "emltrees-shrink trees=%d/%d nodes=%d/%d leaves=%d/%d \n",
+        n_trees, self->max_trees, n_nodes, self->max_nodes, n_leaves, self->max_leaves
+    );
+#endif
+
+    if (n_trees < self->max_trees) {
+        self->trees.tree_roots = m_renew(int32_t, self->trees.tree_roots, self->max_trees, n_trees);
+        self->max_trees = n_trees;
+    }
+    // NOTE: when data is used in-place, nodes and leaves are not owned by us
+    if (o->data_obj == MP_OBJ_NULL) {
+        if (n_nodes < self->max_nodes) {
+            self->trees.nodes = m_renew(TreesNode, self->trees.nodes, self->max_nodes, n_nodes);
+            self->max_nodes = n_nodes;
+        }
+        if (n_leaves < self->max_leaves) {
+            const int leaf_size = trees_leaf_size(&self->trees);
+            self->trees.leaves = m_renew(uint8_t, self->trees.leaves,
+                self->max_leaves * leaf_size, n_leaves * leaf_size);
+            self->max_leaves = n_leaves;
+        }
+    }
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_1(builder_shrink_obj, builder_shrink);
+
+
+// Reorder the decision nodes, to improve memory locality during inference
+// Without samples, the nodes of each tree are laid out breadth-first.
+// With samples, the nodes are laid out depth-first, with the most visited child directly after its parent.
+// Nodes of one tree are kept together, and trees are in the same order as before.
+// Nodes that are not reachable from any tree are removed.
+static mp_obj_t builder_reorder(size_t n_args, const mp_obj_t *args) {
+
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(args[0]);
+    EmlTreesBuilder *self = &o->builder;
+    TreesModel *trees = &self->trees;
+
+    if (o->data_obj != MP_OBJ_NULL) {
+        mp_raise_ValueError(MP_ERROR_TEXT("model data is read-only"));
+    }
+    const int n_nodes = trees->n_nodes;
+    const int n_features = trees->n_features;
+    if (n_features == 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("model not loaded"));
+    }
+
+    // Count how often each node is visited
+    uint32_t *visits = NULL;
+    if (n_args >= 2 && args[1] != mp_const_none) {
+        if (self->n_models > 1) {
+            mp_raise_ValueError(MP_ERROR_TEXT("samples only supported for a single model"));
+        }
+        mp_buffer_info_t bufinfo;
+        mp_get_buffer_raise(args[1], &bufinfo, MP_BUFFER_READ);
+        if (bufinfo.typecode != 'h') {
+            mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 (h) array"));
+        }
+        const int16_t *features = bufinfo.buf;
+        const int features_length = bufinfo.len / sizeof(*features);
+        if ((features_length % n_features) != 0) {
+            mp_raise_ValueError(MP_ERROR_TEXT("inputs length must be multiple of n_features"));
+        }
+        const int n_samples = features_length / n_features;
+
+        visits = m_new(uint32_t, n_nodes);
+        memset(visits, 0, sizeof(uint32_t) * n_nodes);
+        for (int s=0; s<n_samples; s++) {
+            const int16_t *sample = features + (s*n_features);
+            for (int t=0; t<trees->n_trees; t++) {
+                int32_t node_idx = trees->tree_roots[t];
+                while (node_idx >= 0) {
+                    const TreesNode *node = &trees->nodes[node_idx];
+                    visits[node_idx] += 1;
+                    const int16_t child = (sample[node->feature] < node->value) ? node->left : node->right;
+                    node_idx = (child >= 0) ? (node_idx + child) : child;
+                }
+            }
+        }
+    }
+
+    // Find new order of nodes. order[new_index] = old_index
+    int32_t *order = m_new(int32_t, n_nodes);
+    int32_t *new_index = m_new(int32_t, n_nodes);
+    int32_t *work = m_new(int32_t, n_nodes); // queue for breadth-first, stack for depth-first
+    for (int i=0; i<n_nodes; i++) {
+        new_index[i] = -1;
+    }
+
+    int placed = 0;
+    for (int t=0; t<trees->n_trees; t++) {
+        const int32_t root = trees->tree_roots[t];
+        if (root < 0) {
+            continue; // tree is only a leaf
+        }
+        if (root >= n_nodes || new_index[root] >= 0) {
+            mp_raise_ValueError(MP_ERROR_TEXT("invalid tree root"));
+        }
+
+        int work_start = 0;
+        int work_end = 0;
+        work[work_end++] = root;
+        new_index[root] = n_nodes; // mark as seen
+        while (work_end > work_start) {
+            const int32_t idx = (visits) ? work[--work_end] : work[work_start++];
+            new_index[idx] = placed;
+            order[placed++] = idx;
+
+            const TreesNode *node = &trees->nodes[idx];
+            int32_t children[2] = { -1, -1 };
+            if (node->left >= 0) {
+                children[0] = idx + node->left;
+            }
+            if (node->right >= 0) {
+                children[1] = idx + node->right;
+            }
+            // for depth-first, the child pushed last is placed next
+            if (visits && children[0] >= 0 && children[1] >= 0 && visits[children[0]] > visits[children[1]]) {
+                const int32_t tmp = children[0];
+                children[0] = children[1];
+                children[1] = tmp;
+            }
+            for (int c=0; c<2; c++) {
+                const int32_t child = children[c];
+                if (child < 0) {
+                    continue;
+                }
+                if (child >= n_nodes || new_index[child] != -1) {
+                    mp_raise_ValueError(MP_ERROR_TEXT("invalid child node"));
+                }
+                new_index[child] = n_nodes; // mark as seen
+                work[work_end++] = child;
+            }
+        }
+    }
+
+    // Create the nodes in new order, with updated child offsets
+    TreesNode *nodes = m_new(TreesNode, placed);
+    for (int i=0; i<placed; i++) {
+        const int32_t old_idx = order[i];
+        TreesNode node = trees->nodes[old_idx];
+        if (node.left >= 0) {
+            const int32_t offset = new_index[old_idx + node.left] - i;
+            if (offset > INT16_MAX) {
+                mp_raise_ValueError(MP_ERROR_TEXT("child offset too large"));
+            }
+            node.left = offset;
+        }
+        if (node.right >= 0) {
+            const int32_t offset = new_index[old_idx + node.right] - i;
+            if (offset > INT16_MAX) {
+                mp_raise_ValueError(MP_ERROR_TEXT("child offset too large"));
+            }
+            node.right = offset;
+        }
+        nodes[i] = node;
+    }
+
+    // Everything is valid, update the model
+    memcpy(trees->nodes, nodes, sizeof(TreesNode) * placed);
+    trees->n_nodes = placed;
+    for (int t=0; t<trees->n_trees; t++) {
+        const int32_t root = trees->tree_roots[t];
+        if (root >= 0) {
+            trees->tree_roots[t] = new_index[root];
+        }
+    }
+
+#if EMLEARN_MICROPYTHON_DEBUG
+    mp_printf(&mp_plat_print, "emltrees-reorder nodes=%d placed=%d visits=%d \n",
+        n_nodes, placed, (int)(visits != NULL));
+#endif
+
+    m_del(TreesNode, nodes, placed);
+    m_del(int32_t, work, n_nodes);
+    m_del(int32_t, new_index, n_nodes);
+    m_del(int32_t, order, n_nodes);
+    if (visits) {
+        m_del(uint32_t, visits, n_nodes);
+    }
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(builder_reorder_obj, 1, 2, builder_reorder);
+
+
+// Return the shape of the output
+static mp_obj_t builder_get_outputs(size_t n_args, const mp_obj_t *args) {
+
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(args[0]);
+    EmlTreesBuilder *self = &o->builder;
+
+    TreesModel model;
+    trees_get_model(self, (n_args >= 2) ? mp_obj_get_int(args[1]) : 0, &model);
+
+    const int n_outputs = trees_outputs(&model);
+    if (n_outputs == 0) {
         mp_raise_ValueError(MP_ERROR_TEXT("model not loaded"));
     }
 
-    return mp_obj_new_int(n_classes);
+    return mp_obj_new_int(n_outputs);
 }
-static MP_DEFINE_CONST_FUN_OBJ_1(builder_get_outputs_obj, builder_get_outputs);
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(builder_get_outputs_obj, 1, 2, builder_get_outputs);
 
 
 
 // Takes a array of input data
-static mp_obj_t builder_predict(mp_obj_t self_obj, mp_obj_t features_obj, mp_obj_t output_obj) {
+static mp_obj_t builder_predict(size_t n_args, const mp_obj_t *args) {
 
-    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(self_obj);
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(args[0]);
     EmlTreesBuilder *self = &o->builder;    
 
+    TreesModel model;
+    trees_get_model(self, (n_args >= 4) ? mp_obj_get_int(args[3]) : 0, &model);
+
     // Extract buffer pointer and verify typecode
     mp_buffer_info_t bufinfo;
-    mp_get_buffer_raise(features_obj, &bufinfo, MP_BUFFER_RW);
-    if (bufinfo.typecode != 'h') {
-        mp_raise_ValueError(MP_ERROR_TEXT("expecting int16 (h) array"));
-    }
-
-    const int16_t *features = bufinfo.buf;
-    const int n_features = bufinfo.len / sizeof(*features);
-    const int n_outputs = self->trees.n_classes;
+    mp_get_buffer_raise(args[1], &bufinfo, MP_BUFFER_READ);
+    const int n_features = trees_inputs_length(&bufinfo);
+    const int n_outputs = trees_outputs(&model);
 
 #if EMLEARN_MICROPYTHON_DEBUG
     mp_printf(&mp_plat_print,
         "emltrees-predict n_features=%d n_classes=%d leaves=%d nodes=%d trees=%d length=%d \n",
-        self->trees.n_features, self->trees.n_classes,
-        self->trees.n_leaves, self->trees.n_nodes, self->trees.n_trees,
+        model.n_features, model.n_classes,
+        model.n_leaves, model.n_nodes, model.n_trees,
         n_features
     );
 #endif
@@ -247,9 +1051,10 @@ static mp_obj_t builder_predict(mp_obj_t self_obj, mp_obj_t features_obj, mp_obj
     if (n_features == 0 || n_outputs == 0) {        
         mp_raise_ValueError(MP_ERROR_TEXT("model not loaded"));
     }
+    const int16_t *features = trees_get_inputs(self, &bufinfo, 0, n_features);
 
     // Extract output
-    mp_get_buffer_raise(output_obj, &bufinfo, MP_BUFFER_RW);
+    mp_get_buffer_raise(args[2], &bufinfo, MP_BUFFER_RW);
     if (bufinfo.typecode != 'f') {
         mp_raise_ValueError(MP_ERROR_TEXT("expecting float output array"));
     }
@@ -259,20 +1064,358 @@ static mp_obj_t builder_predict(mp_obj_t self_obj, mp_obj_t features_obj, mp_obj
 
     // call model
     // NOTE: also handles checking of input and output lengths
-    const EmlError err = \
-        eml_trees_predict_proba(&self->trees, features, n_features, output_buffer, output_length);
+    if (trees_is_regression(&model)) {
+        const EmlError err = \
+            trees_regress(&model, self->profile, features, n_features, output_buffer, output_length);
+        if (err != EmlOk) {
+            mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("trees_regress error"));
+        }
+    } else {
+        const EmlError err = trees_predict_proba(&model, self->profile,
+            features, n_features, output_buffer, output_length);
+        if (err != EmlOk) {
+            mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("eml_trees_predict_proba error"));
+        }
+    }
 
-    if (err != EmlOk) {
-        mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("eml_trees_predict_proba error"));
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(builder_predict_obj, 3, 4, builder_predict);
+
+
+// Takes a 2d array of input data, (n_samples x n_features) stored as a flat array
+// Outputs are either probabilities (n_samples x n_classes) or class indices (n_samples)
+static mp_obj_t builder_predict_batch(size_t n_args, const mp_obj_t *args) {
+
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(args[0]);
+    EmlTreesBuilder *self = &o->builder;
+
+    TreesModel model;
+    trees_get_model(self, (n_args >= 4) ? mp_obj_get_int(args[3]) : 0, &model);
+
+    const int n_features = model.n_features;
+    const int n_outputs = trees_outputs(&model);
+    const bool regression = trees_is_regression(&model);
+    if (n_features == 0 || n_outputs == 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("model not loaded"));
+    }
+
+    // Extract buffer pointer and verify typecode
+    mp_buffer_info_t inputs;
+    mp_get_buffer_raise(args[1], &inputs, MP_BUFFER_READ);
+    const int features_length = trees_inputs_length(&inputs);
+
+    if ((features_length % n_features) != 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("inputs length must be multiple of n_features"));
+    }
+    const int n_samples = features_length / n_features;
+
+    // Extract output
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(args[2], &bufinfo, MP_BUFFER_RW);
+    const char output_type = bufinfo.typecode;
+
+#if EMLEARN_MICROPYTHON_DEBUG
+    mp_printf(&mp_plat_print,
+        "emltrees-predict-batch samples=%d features=%d outputs=%d typecode=%d \n",
+        n_samples, n_features, n_outputs, (int)output_type
+    );
+#endif
+
+    if (output_type == 'f') {
+        // probabilities for each class, or regression value
+        float *output_buffer = bufinfo.buf;
+        const int output_length = bufinfo.len / sizeof(*output_buffer);
+        if (output_length != (n_samples * n_outputs)) {
+            mp_raise_ValueError(MP_ERROR_TEXT("outputs length must be n_samples*n_outputs"));
+        }
+
+        for (int i=0; i<n_samples; i++) {
+            const int16_t *sample = trees_get_inputs(self, &inputs, i*n_features, n_features);
+            float *out = output_buffer + (i*n_outputs);
+            const EmlError err = (regression) ? \
+                trees_regress(&model, self->profile, sample, n_features, out, n_outputs) :
+                trees_predict_proba(&model, self->profile, sample, n_features, out, n_outputs);
+            if (err != EmlOk) {
+                mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("eml_trees_predict_proba error"));
+            }
+        }
+
+    } else if (regression) {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting float (f) output array for regression"));
+
+    } else if (output_type == 'B' || output_type == BYTEARRAY_TYPECODE || output_type == 'H') {
+        // most probable class
+        const int item_size = (output_type == 'H') ? sizeof(uint16_t) : sizeof(uint8_t);
+        const int output_length = bufinfo.len / item_size;
+        if (output_length != n_samples) {
+            mp_raise_ValueError(MP_ERROR_TEXT("outputs length must be n_samples"));
+        }
+
+        for (int i=0; i<n_samples; i++) {
+            const int16_t *sample = trees_get_inputs(self, &inputs, i*n_features, n_features);
+            const int32_t out = trees_predict(&model, self->profile, sample, n_features);
+            if (out < 0) {
+                mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("eml_trees_predict error"));
+            }
+            if (output_type == 'H') {
+                ((uint16_t *)bufinfo.buf)[i] = out;
+            } else {
+                ((uint8_t *)bufinfo.buf)[i] = out;
+            }
+        }
+
+    } else {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting float (f) or uint8/uint16 (B/H) output array"));
     }
 
     return mp_const_none;
 }
-static MP_DEFINE_CONST_FUN_OBJ_3(builder_predict_obj, builder_predict);
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(builder_predict_batch_obj, 3, 4, builder_predict_batch);
+
+
+// Predict with early stopping
+// Evaluates trees in order, and stops when the leading class cannot be overtaken by the remaining trees,
+// or when the vote margin between the two best classes is reached,
+// or when the leading class has enough votes to have at least the given probability over all trees.
+// Returns the number of trees evaluated. Outputs are probabilities over the evaluated trees
+static mp_obj_t builder_predict_early(size_t n_args, const mp_obj_t *args) {
+
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(args[0]);
+    EmlTreesBuilder *self = &o->builder;
+
+    const int min_margin = (n_args >= 4) ? mp_obj_get_int(args[3]) : 0;
+    const float min_proba = (n_args >= 5) ? mp_obj_get_float_to_f(args[4]) : 0.0f;
+
+    TreesModel model;
+    trees_get_model(self, (n_args >= 6) ? mp_obj_get_int(args[5]) : 0, &model);
+
+    const int n_classes = model.n_classes;
+    const int n_trees = model.n_trees;
+    if (n_classes == 0 || n_trees == 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("model not loaded"));
+    }
+    if (model.leaf_bits != 0) {
+        mp_raise_ValueError(MP_ERROR_TEXT("only supported for majority voting classifiers"));
+    }
+
+    // Extract buffer pointer and verify typecode
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(args[1], &bufinfo, MP_BUFFER_READ);
+    const int n_features = trees_inputs_length(&bufinfo);
+    if (n_features != model.n_features) {
+        mp_raise_ValueError(MP_ERROR_TEXT("inputs length must be n_features"));
+    }
+    const int16_t *features = trees_get_inputs(self, &bufinfo, 0, n_features);
+
+    // Extract output
+    mp_get_buffer_raise(args[2], &bufinfo, MP_BUFFER_RW);
+    if (bufinfo.typecode != 'f') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting float output array"));
+    }
+    float *votes = bufinfo.buf;
+    const int output_length = bufinfo.len / sizeof(*votes);
+    if (output_length != n_classes) {
+        mp_raise_ValueError(MP_ERROR_TEXT("outputs length must be n_classes"));
+    }
+
+    for (int i=0; i<n_classes; i++) {
+        votes[i] = 0.0f;
+    }
+    if (self->profile) {
+        self->profile->predictions += 1;
+    }
+
+    int evaluated = 0;
+    while (evaluated < n_trees) {
+
+        const int32_t leaf = trees_predict_tree(&model, self->profile,
+            model.tree_roots[evaluated], features);
+        const int class_no = model.leaves[leaf];
+        if (class_no >= n_classes) {
+            mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("invalid class predicted"));
+        }
+        votes[class_no] += 1.0f;
+        evaluated += 1;
+
+        // Find the two classes with the most votes
+        float first = -1.0f;
+        float second = 0.0f;
+        for (int i=0; i<n_classes; i++) {
+            if (votes[i] > first) {
+                second = first;
+                first = votes[i];
+            } else if (votes[i] > second) {
+                second = votes[i];
+            }
+        }
+        const float margin = first - second;
+        const int remaining = n_trees - evaluated;
+
+        if (margin > remaining) {
+            break; // cannot be overtaken
+        }
+        if (min_margin > 0 && margin >= min_margin) {
+            break;
+        }
+        if (min_proba > 0.0f && (first / n_trees) >= min_proba) {
+            break;
+        }
+    }
+
+#if EMLEARN_MICROPYTHON_DEBUG
+    mp_printf(&mp_plat_print, "emltrees-predict-early evaluated=%d trees=%d \n", evaluated, n_trees);
+#endif
+
+    // compute mean
+    for (int i=0; i<n_classes; i++) {
+        votes[i] = votes[i] / evaluated;
+    }
+
+    return mp_obj_new_int(evaluated);
+}
+static MP_DEFINE_CONST_FUN_OBJ_VAR_BETWEEN(builder_predict_early_obj, 3, 6, builder_predict_early);
+
+
+// Run all the models in the pool on the same inputs
+// Outputs of each model are stored after each other, in the order the models were added
+// Each model uses the first n_features of the inputs
+static mp_obj_t builder_predict_all(mp_obj_t self_obj, mp_obj_t features_obj, mp_obj_t output_obj) {
+
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(self_obj);
+    EmlTreesBuilder *self = &o->builder;
+
+    // Find the sizes needed
+    int max_features = 0;
+    int total_outputs = 0;
+    for (int m=0; m<self->n_models; m++) {
+        TreesModel model;
+        trees_get_model(self, m, &model);
+        const int n_outputs = trees_outputs(&model);
+        if (model.n_features == 0 || n_outputs == 0) {
+            mp_raise_ValueError(MP_ERROR_TEXT("model not loaded"));
+        }
+        if (model.n_features > max_features) {
+            max_features = model.n_features;
+        }
+        total_outputs += n_outputs;
+    }
+
+    // Extract buffer pointer and verify typecode
+    mp_buffer_info_t bufinfo;
+    mp_get_buffer_raise(features_obj, &bufinfo, MP_BUFFER_READ);
+    const int n_features = trees_inputs_length(&bufinfo);
+    if (n_features < max_features) {
+        mp_raise_ValueError(MP_ERROR_TEXT("inputs length must be at least n_features"));
+    }
+    const int16_t *features = trees_get_inputs(self, &bufinfo, 0, n_features);
+
+    // Extract output
+    mp_get_buffer_raise(output_obj, &bufinfo, MP_BUFFER_RW);
+    if (bufinfo.typecode != 'f') {
+        mp_raise_ValueError(MP_ERROR_TEXT("expecting float output array"));
+    }
+    float *output_buffer = bufinfo.buf;
+    const int output_length = bufinfo.len / sizeof(*output_buffer);
+    if (output_length != total_outputs) {
+        mp_raise_ValueError(MP_ERROR_TEXT("outputs length must be the sum of model outputs"));
+    }
+
+    float *out = output_buffer;
+    for (int m=0; m<self->n_models; m++) {
+        TreesModel model;
+        trees_get_model(self, m, &model);
+        const int n_outputs = trees_outputs(&model);
+        const EmlError err = trees_is_regression(&model) ? \
+            trees_regress(&model, self->profile, features, model.n_features, out, n_outputs) :
+            trees_predict_proba(&model, self->profile, features, model.n_features, out, n_outputs);
+        if (err != EmlOk) {
+            mp_raise_msg(&mp_type_RuntimeError, MP_ERROR_TEXT("eml_trees_predict_proba error"));
+        }
+        out += n_outputs;
+    }
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_3(builder_predict_all_obj, builder_predict_all);
+
+
+// Enable or disable profiling
+// Enabling also resets the counters
+static mp_obj_t builder_setprofile(mp_obj_t self_obj, mp_obj_t enable_obj) {
+
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(self_obj);
+    EmlTreesBuilder *self = &o->builder;
+
+    trees_profile_free(self);
+
+    if (mp_obj_is_true(enable_obj)) {
+        // Feature counters are shared by all the models
+        int n_features = 0;
+        for (int m=0; m<self->n_models; m++) {
+            if (self->models[m].n_features > n_features) {
+                n_features = self->models[m].n_features;
+            }
+        }
+        if (n_features == 0) {
+            mp_raise_ValueError(MP_ERROR_TEXT("model not loaded"));
+        }
+        TreesProfile *profile = m_new(TreesProfile, 1);
+        memset(profile, 0, sizeof(TreesProfile));
+        profile->features = m_new(uint32_t, n_features);
+        memset(profile->features, 0, sizeof(uint32_t) * n_features);
+        profile->n_features = n_features;
+        self->profile = profile;
+    }
+
+    return mp_const_none;
+}
+static MP_DEFINE_CONST_FUN_OBJ_2(builder_setprofile_obj, builder_setprofile);
+
+// Create a tuple of integers from array of counters
+static mp_obj_t trees_counters_tuple(const uint32_t *values, int length) {
+
+    mp_obj_t *items = m_new(mp_obj_t, length);
+    for (int i=0; i<length; i++) {
+        items[i] = mp_obj_new_int_from_uint(values[i]);
+    }
+    mp_obj_t tuple = mp_obj_new_tuple(length, items);
+    m_del(mp_obj_t, items, length);
+
+    return tuple;
+}
+
+// Get profiling counters
+// Returns tuple: (predictions, trees, nodes, max_depth, depth histogram, feature splits)
+static mp_obj_t builder_getprofile(mp_obj_t self_obj) {
+
+    mp_obj_trees_builder_t *o = MP_OBJ_TO_PTR(self_obj);
+    EmlTreesBuilder *self = &o->builder;
+
+    const TreesProfile *profile = self->profile;
+    if (profile == NULL) {
+        mp_raise_ValueError(MP_ERROR_TEXT("profiling not enabled"));
+    }
+
+    // histogram goes up to the deepest tree seen
+    const uint32_t depth_bins = (profile->max_depth < TREES_PROFILE_MAX_DEPTH) ? \
+        (profile->max_depth + 1) : TREES_PROFILE_MAX_DEPTH;
+
+    mp_obj_t items[6];
+    items[0] = mp_obj_new_int_from_uint(profile->predictions);
+    items[1] = mp_obj_new_int_from_uint(profile->trees);
+    items[2] = mp_obj_new_int_from_uint(profile->nodes);
+    items[3] = mp_obj_new_int_from_uint(profile->max_depth);
+    items[4] = trees_counters_tuple(profile->depths, depth_bins);
+    items[5] = trees_counters_tuple(profile->features, profile->n_features);
+
+    return mp_obj_new_tuple(6, items);
+}
+static MP_DEFINE_CONST_FUN_OBJ_1(builder_getprofile_obj, builder_getprofile);
 
 
 #ifdef MICROPY_ENABLE_DYNRUNTIME
-mp_map_elem_t trees_locals_dict_table[7];
+mp_map_elem_t trees_locals_dict_table[16];
 static MP_DEFINE_CONST_DICT(trees_locals_dict, trees_locals_dict_table);
 
 // This is the entry point and is called when the module is imported
@@ -293,8 +1436,17 @@ mp_obj_t mpy_init(mp_obj_fun_bc_t *self, size_t n_args, size_t n_kw, mp_obj_t *a
     trees_locals_dict_table[4] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR___del__), MP_OBJ_FROM_PTR(&builder_del_obj) };
     trees_locals_dict_table[5] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_setdata), MP_OBJ_FROM_PTR(&builder_setdata_obj) };
     trees_locals_dict_table[6] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_outputs), MP_OBJ_FROM_PTR(&builder_get_outputs_obj) };
-
-    MP_OBJ_TYPE_SET_SLOT(&trees_builder_type, locals_dict, (void*)&trees_locals_dict, 7);
+    trees_locals_dict_table[7] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_predict_batch), MP_OBJ_FROM_PTR(&builder_predict_batch_obj) };
+    trees_locals_dict_table[8] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_loadbinary), MP_OBJ_FROM_PTR(&builder_loadbinary_obj) };
+    trees_locals_dict_table[9] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_shrink), MP_OBJ_FROM_PTR(&builder_shrink_obj) };
+    trees_locals_dict_table[10] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_predict_early), MP_OBJ_FROM_PTR(&builder_predict_early_obj) };
+    trees_locals_dict_table[11] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_setprofile), MP_OBJ_FROM_PTR(&builder_setprofile_obj) };
+    trees_locals_dict_table[12] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_getprofile), MP_OBJ_FROM_PTR(&builder_getprofile_obj) };
+    trees_locals_dict_table[13] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_reorder), MP_OBJ_FROM_PTR(&builder_reorder_obj) };
+    trees_locals_dict_table[14] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_addmodel), MP_OBJ_FROM_PTR(&builder_addmodel_obj) };
+    trees_locals_dict_table[15] = (mp_map_elem_t){ MP_OBJ_NEW_QSTR(MP_QSTR_predict_all), MP_OBJ_FROM_PTR(&builder_predict_all_obj) };
+
+    MP_OBJ_TYPE_SET_SLOT(&trees_builder_type, locals_dict, (void*)&trees_locals_dict, 16);
 
     // This must be last, it restores the globals dict
     MP_DYNRUNTIME_INIT_EXIT
@@ -312,6 +1464,15 @@ static const mp_rom_map_elem_t emlearn_trees_builder_locals_dict_table[] = {
     { MP_ROM_QSTR(MP_QSTR___del__), MP_ROM_PTR(&builder_del_obj) },
     { MP_ROM_QSTR(MP_QSTR_setdata), MP_ROM_PTR(&builder_setdata_obj) },
     { MP_ROM_QSTR(MP_QSTR_outputs), MP_ROM_PTR(&builder_get_outputs_obj) },
+    { MP_ROM_QSTR(MP_QSTR_predict_batch), MP_ROM_PTR(&builder_predict_batch_obj) },
+    { MP_ROM_QSTR(MP_QSTR_loadbinary), MP_ROM_PTR(&builder_loadbinary_obj) },
+    { MP_ROM_QSTR(MP_QSTR_shrink), MP_ROM_PTR(&builder_shrink_obj) },
+    { MP_ROM_QSTR(MP_QSTR_predict_early), MP_ROM_PTR(&builder_predict_early_obj) },
+    { MP_ROM_QSTR(MP_QSTR_setprofile), MP_ROM_PTR(&builder_setprofile_obj) },
+    { MP_ROM_QSTR(MP_QSTR_getprofile), MP_ROM_PTR(&builder_getprofile_obj) },
+    { MP_ROM_QSTR(MP_QSTR_reorder), MP_ROM_PTR(&builder_reorder_obj) },
+    { MP_ROM_QSTR(MP_QSTR_addmodel), MP_ROM_PTR(&builder_addmodel_obj) },
+    { MP_ROM_QSTR(MP_QSTR_predict_all), MP_ROM_PTR(&builder_predict_all_obj) },
 };
 static MP_DEFINE_CONST_DICT(emlearn_trees_builder_locals_dict, emlearn_trees_builder_locals_dict_table);
 
@@ -11,11 +11,26 @@ Implemented using *eml_fft* from the emlearn C library (https://github.com/emlea
 import array
 import typing
 
+KERNEL_RADIX2 : int = 0
+"""Radix-2 Cooley-Tukey FFT kernel"""
+KERNEL_RADIX4 : int = 1
+"""Radix-4 FFT kernel. Fewer multiplications and passes over the data than KERNEL_RADIX2"""
+
 
 class FFT():
     """Fast Fourier Transform (FFT)
     """
-    def __init__(self, length : int):
+    def __init__(self, length : int, table : FFT = None):
+        """
+        Create an FFT of given length
+
+        The coefficient tables are computed when the instance is created.
+        Instances can share the tables of another instance with the same or larger length,
+        so that several FFTs (for example one per axis) do not duplicate the memory.
+
+        :param length: Length of the FFT. Must be a power of 2
+        :param table: Optional. FFT instance to share coefficient tables with
+        """
         pass
 
     def run(self, real : array.array, imag : array.array):
@@ -24,18 +39,60 @@ class FFT():
 
         Note: operates in-place, will modify both arrays.
 
-        To perform a real-only (RFFT), let imag be all zeroes.
+        For real-valued data, rfft() is faster.
 
         :param real: the real part of data. Typecode 'f' (float)
         :param imag: the imaginary part of data. Typecode 'f' (float)
         """
         pass
 
+    def rfft(self, real : array.array, imag : array.array):
+        """
+        Perform the FFT transformation of real-valued data
+
+        Uses a complex FFT of half the length, so it is about twice as fast as run().
+        Gives the first length/2+1 bins. The rest are the complex conjugate of these.
+
+        Note: operates in-place, will modify both arrays.
+        The values in real after the first length/2+1 are not meaningful.
+
+        :param real: the input data, and the real part of the output. Typecode 'f' (float), length
+        :param imag: the imaginary part of the output. Typecode 'f' (float), length/2+1
+        """
+        pass
+
+    def run_q15(self, real : array.array, imag : array.array) -> int:
+        """
+        Perform the FFT transformation on fixed-point q15 data
+
+        Uses only integer arithmetic, for MCUs without a floating-point unit.
+        Block floating point is used to avoid overflow:
+        before each stage, all values are scaled down by powers of 2 as needed.
+
+        Note: operates in-place, will modify both arrays.
+        Always uses a radix-2 kernel.
+
+        :param real: the real part of data. Typecode 'h' (int16)
+        :param imag: the imaginary part of data. Typecode 'h' (int16)
+        :return: Number of right shifts done. The FFT result is (real + j*imag) * 2**shift
+        """
+        pass
+
+    def setkernel(self, kernel : int):
+        """
+        Set the kernel used to compute the FFT, for both run() and rfft()
+
+        KERNEL_RADIX4 is faster, but the results are not bit-identical to KERNEL_RADIX2.
+
+        :param kernel: KERNEL_RADIX2 (default) or KERNEL_RADIX4
+        """
+        pass
+
     def fill(self, sin : array.array, cos : array.array):
         """
         Set up FFT coefficients
 
-        Note: Do not use this directly. Instead use the module-level fill() function.
+        Note: Not needed, the coefficients are computed when creating the instance.
 
         :param sin: Precomputed coefficients
         :param cos: Precomputed coefficients 
@@ -46,11 +103,157 @@ def fill(fft : FFT, n : int):
     """
     Set up FFT coefficients
 
-    NB: Must be called before attempting to use FFT.run()
+    Note: Not needed anymore, the coefficients are computed when creating the instance.
+    Kept for compatibility.
 
     :param fft: FFT instance
     :param n: Length of the FFT transform
     """
     pass
 
+def magnitude_q15(real : array.array, imag : array.array, out : array.array):
+    """
+    Compute the magnitude of complex q15 values, such as the output of FFT.run_q15()
+
+    :param real: the real part. Typecode 'h' (int16)
+    :param imag: the imaginary part. Typecode 'h' (int16)
+    :param out: Where to store the magnitudes. Typecode 'H' (uint16), or 'h' (int16) to saturate at 32767.
+        Can be the same as real or imag
+    """
+    pass
+
+def magnitude(real : array.array, imag : array.array, out : array.array, offset : int = 0):
+    """
+    Compute the magnitude spectrum, sqrt(real**2 + imag**2)
+
+    Computes as many values as the shortest of the arrays.
+    So it can be used directly on the output of FFT.rfft().
+
+    :param real: the real part. Typecode 'f' (float)
+    :param imag: the imaginary part. Typecode 'f' (float)
+    :param out: Where to store the magnitudes. Typecode 'f' (float). Can be the same as real or imag
+    :param offset: Index in out to write the first value. For example a frame in a spectrogram
+    """
+    pass
+
+def power(real : array.array, imag : array.array, out : array.array, offset : int = 0):
+    """
+    Compute the power spectrum, real**2 + imag**2
+
+    Computes as many values as the shortest of the arrays.
+
+    :param real: the real part. Typecode 'f' (float)
+    :param imag: the imaginary part. Typecode 'f' (float)
+    :param out: Where to store the power. Typecode 'f' (float). Can be the same as real or imag
+    :param offset: Index in out to write the first value. For example a frame in a spectrogram
+    """
+    pass
+
+def abs_scale(values : array.array, out : array.array, scale : float, offset : int = 0):
+    """
+    Compute absolute values multiplied by scale. For example to normalize spectrum bins
+
+    Computes as many values as the shortest of values and the rest of out.
+    So it can write straight into an array with all the features.
 
+    :param values: Input values. Typecode 'f' (float). Can be a memoryview of part of an array
+    :param out: Where to store the values. Typecode 'f' (float)
+    :param scale: Multiplier for each absolute value
+    :param offset: Index in out to write the first value
+    """
+    pass
+
+def apply_filterbank(spectrum : array.array, bands : array.array, weights : array.array,
+        out : array.array, n_bands : int, offset : int = 0):
+    """
+    Sum spectrum bins into bands, using a triangular filterbank
+
+    Note: Do not use this directly. Instead use FilterBank.apply()
+    """
+    pass
+
+class FilterBank():
+    """Triangular filterbank, to sum spectrum bins into bands
+
+    Each band is a triangle, going from the center of the previous band
+    to the center of the next band.
+    The filterbank is precomputed, and applying it is done natively.
+    """
+    def __init__(self, n_bins : int, n_bands : int, samplerate : float,
+            fmin : float = 0.0, fmax : float = None, scale : str = 'mel'):
+        """
+        :param n_bins: Number of bins in spectrum. Typically length/2+1 for FFT.rfft()
+        :param n_bands: Number of bands to output
+        :param samplerate: Samplerate of the input signal
+        :param fmin: Lowest frequency. Must be above 0 for scale='log'
+        :param fmax: Highest frequency. Default: samplerate/2
+        :param scale: Spacing of the bands. 'mel', 'linear' or 'log'
+        """
+        pass
+
+    def apply(self, spectrum : array.array, out : array.array, offset : int = 0):
+        """
+        Sum spectrum into the bands
+
+        :param spectrum: Magnitude or power spectrum. Typecode 'f' (float), at least n_bins
+        :param out: Where to write the band values. Typecode 'f' (float).
+            For example an array with all the features
+        :param offset: Index in out to write the first band
+        """
+        pass
+
+def push_window(buffer : array.array, chunk : array.array, window : array.array, out : array.array):
+    """
+    Shift chunk into the end of buffer, and write buffer multiplied by window to out
+
+    Note: Do not use this directly. Instead use STFT.push()
+    """
+    pass
+
+def hann(length : int) -> array.array:
+    """
+    Periodic Hann window
+
+    :param length: Number of samples
+    :return: The window. Typecode 'f' (float)
+    """
+    pass
+
+def hamming(length : int) -> array.array:
+    """
+    Periodic Hamming window
+
+    :param length: Number of samples
+    :return: The window. Typecode 'f' (float)
+    """
+    pass
+
+class STFT():
+    """Streaming Short-Time Fourier Transform
+
+    Computes a spectrogram frame for each hop of samples, from the last length samples.
+    The window is precomputed, and all buffers are allocated up-front,
+    so no allocations happen per frame.
+    """
+    def __init__(self, length : int, hop : int, window = 'hann',
+            filterbank : FilterBank = None, spectrum : str = 'magnitude'):
+        """
+        :param length: Number of samples in each frame. Must be a power of 2
+        :param hop: Number of new samples per frame. Between 1 and length
+        :param window: 'hann', 'hamming', 'rectangular', or an array of length with typecode 'f' (float)
+        :param filterbank: Optional. If given, frames are the bands instead of the spectrum bins
+        :param spectrum: 'magnitude' or 'power'
+        """
+        pass
+
+    def push(self, chunk : array.array, out : array.array, frame : int = 0):
+        """
+        Add a chunk of samples, and compute a spectrogram frame
+
+        Frames have length/2+1 values, or FilterBank.n_bands with a filterbank.
+
+        :param chunk: hop new samples. Typecode 'h' (int16) or 'f' (float)
+        :param out: Spectrogram, n_frames x frame values stored frame-by-frame. Typecode 'f' (float)
+        :param frame: Index of the frame in out to write
+        """
+        pass
@@ -11,6 +11,31 @@ Implemented using *eml_neighbors* from the emlearn C library (https://github.com
 import array
 import typing
 
+SELECT_AUTO : int = 0
+"""Use SELECT_TOPK when the model has 32 items or more, else SELECT_SORT. The default"""
+SELECT_SORT : int = 1
+"""Sort the distances to all the items. Needed to get all results with getresult()"""
+SELECT_TOPK : int = 2
+"""Only find the k nearest items. Much faster with many items.
+getresult() then only gives the k nearest"""
+
+METRIC_EUCLIDEAN : int = 0
+"""Euclidean distance, rounded down to integer"""
+METRIC_SQEUCLIDEAN : int = 1
+"""Squared euclidean distance. Same neighbors as METRIC_EUCLIDEAN, but faster"""
+METRIC_MANHATTAN : int = 2
+"""Manhattan (L1) distance. Sum of absolute differences"""
+METRIC_CHEBYSHEV : int = 3
+"""Chebyshev (L-infinity) distance. Largest absolute difference"""
+
+STORE_FIXED : int = 0
+"""additem() raises an error when the model is full"""
+STORE_RING : int = 1
+"""additem() replaces the oldest item when the model is full"""
+STORE_RESERVOIR : int = 2
+"""additem() uses reservoir sampling when the model is full.
+Replaces a random item, or drops the new item, such that all items seen have the same probability of being kept"""
+
 
 class Model():
     """A nearest-neighbors model
@@ -19,17 +44,117 @@ class Model():
         """
         Run inference using the model
 
-        :param inputs: the input data. Typecode 'h' (int16)
+        :param inputs: the input data. Typecode 'h' (int16) or 'b' (int8)
         :return: the resulting label/class
         """
         pass
 
-    def additem(self, values : array.array, label : int):
+    def predict_batch(self, inputs : array.array, outputs : array.array):
+        """
+        Run inference on many samples in one call
+
+        After the call, getresult() and neighbors_into() give the neighbors of the last sample.
+
+        :param inputs: the input data, n_samples x n_features stored row-by-row. Typecode 'h' (int16) or 'b' (int8)
+        :param outputs: where to put the resulting label/class of each sample. Typecode 'h' (int16)
+        """
+        pass
+
+    def neighbors_into(self, indices : array.array, distances : array.array, labels : array.array) -> int:
+        """
+        Get the k nearest neighbors from the last predict(), without creating any objects
+
+        Same information as getresult(), for the k nearest neighbors.
+        Each array must have space for k items. Any of them can be None, to skip it.
+
+        :param indices: Where to put the index of each item. Typecode 'h' (int16)
+        :param distances: Where to put the distance to each item. Typecode 'I' (uint32)
+        :param labels: Where to put the label of each item. Typecode 'h' (int16)
+        :return: Number of neighbors written. k, or less when the model has fewer items
+        """
+        pass
+
+    def additem(self, values : array.array, label : int) -> int:
         """
         Add an item into the model
 
-        :param values: the data/features of this item. Typecode 'h' (int16)
+        What happens when the model is full is set by setstore().
+
+        :param values: the data/features of this item. Typecode 'h' (int16) or 'b' (int8)
         :param label: the label/class to associate with this item
+        :return: Index of the item. -1 if dropped by STORE_RESERVOIR
+        """
+        pass
+
+    def removeitem(self, item : int):
+        """
+        Remove an item from the model
+
+        The items after it are moved down by one index.
+
+        :param item: Index of item
+        """
+        pass
+
+    def clear(self):
+        """
+        Remove all items from the model
+        """
+        pass
+
+    def savesize(self) -> int:
+        """
+        Get the size needed to save the model with save_into()
+
+        :return: Size in bytes
+        """
+        pass
+
+    def save_into(self, buffer) -> int:
+        """
+        Save all the items in the model, in binary format
+
+        Much faster than getitem() for each item.
+        The data can for example be written to a file, and later restored with load_from().
+
+        :param buffer: Where to write the data. bytearray or array, with at least savesize() bytes
+        :return: Number of bytes written
+        """
+        pass
+
+    def load_from(self, buffer) -> int:
+        """
+        Load items saved with save_into(), replacing all the items in the model
+
+        The model must have the same number of features, item_bits and item_shift as the saved model,
+        and capacity for all the items.
+
+        :param buffer: Data in binary format. bytes, bytearray or array
+        :return: Number of items loaded
+        """
+        pass
+
+    def setmetric(self, metric : int):
+        """
+        Set the distance metric used to find the nearest neighbors
+
+        With top-k selection, computation of a distance stops early
+        once it is larger than the k'th nearest so far.
+        This is used by default (SELECT_AUTO) when the model has 32 items or more, and more than k.
+        With SELECT_SORT, all distances are computed fully, since getresult() gives all of them.
+
+        :param metric: METRIC_EUCLIDEAN (default), METRIC_SQEUCLIDEAN, METRIC_MANHATTAN or METRIC_CHEBYSHEV
+        """
+        pass
+
+    def setstore(self, store : int, seed : int = None):
+        """
+        Set what additem() does when the model is full
+
+        Allows continuous learning on device, with a fixed amount of memory.
+
+        :param store: STORE_FIXED (default), STORE_RING or STORE_RESERVOIR
+        :param seed: Seed for the random number generator used by STORE_RESERVOIR
         """
         pass
 
@@ -38,7 +163,8 @@ class Model():
         Access data of an item stored in the model
 
         :param item: Index of item
-        :param outputs: Where to copy the data from the item. Typecode 'h' (int16)
+        :param outputs: Where to copy the data from the item. Typecode 'h' (int16), or 'b' (int8) with item_bits=8.
+            With item_shift, int16 values are scaled back, and int8 values are as stored
         """
         pass
 
@@ -46,21 +172,53 @@ class Model():
         """
         Get details on the comparisons between predict() data and items stored in model
 
+        When top-k selection was used (see selection()), only the k nearest are known,
+        and IndexError is raised for larger idx.
+        By default, this happens when the model has 32 items or more, and more than k.
+        To get the results for all items, use setselect(SELECT_SORT).
+
         :param item: Index of the comparison to retrieve. Smaller number are the nearest neighbors.
         :return: Tuple with (item-index, distance-to-item, label-of-item)
         """
         pass
 
-def new(max_items : int, features : int, k_neighbors : int) -> Model:
+    def setselect(self, select : int):
+        """
+        Set how the k nearest neighbors are found in predict()
+
+        Sorting all items costs O(n log n), while top-k selection is O(n) for small k.
+        But with top-k, getresult() only gives the k nearest items.
+
+        :param select: SELECT_AUTO (default), SELECT_SORT or SELECT_TOPK
+        """
+        pass
+
+    def selection(self) -> int:
+        """
+        Get the algorithm used to find the nearest neighbors in the last prediction
+
+        :return: SELECT_SORT or SELECT_TOPK
+        """
+        pass
+
+def new(max_items : int, features : int, k_neighbors : int, item_bits : int = 16, item_shift : int = 0) -> Model:
     """
     Construct an empty neighbors model
 
     The model is created with a specified maximum capacity.
     Memory usage will be determined by this capacity.
 
+    With item_bits=8, items use half the memory, and distances are faster to compute.
+    int16 values are then divided by 2**item_shift, rounded, and saturated to the int8 range (-128 to 127),
+    both for items and inputs. int8 values are used as-is, in the same units as the stored items.
+    Distances are scaled back to the units of the int16 inputs.
+    For example, with item_shift=4, values up to 2032 are stored with a resolution of 16.
+
     :param max_items: Maximum number of items in the dataset
     :param features: Number of features in a data item
     :param k_neighbors: Number of neighbors to consider
+    :param item_bits: Storage of each feature value in the items. 16 for int16, or 8 for int8
+    :param item_shift: Quantization of int16 values with item_bits=8. 0 to 8
     """
     pass
 
@@ -4,6 +4,14 @@
 """
 Tree-based models (Random Forest et.c.)
 
+Supports classification, and regression (single output).
+Models can have up to 65535 input features.
+For models with more than 127 features, use method='inline' in emlearn.convert() on the host,
+since emlearn limits method='loadable' to 127 features.
+
+Several models can share one pool of trees/nodes/leaves, see load_models().
+Each model is then identified by its model id, in the order they were added.
+
 Implemented using *eml_trees* from the emlearn C library (https://github.com/emlearn/emlearn).
 """
 
@@ -15,31 +23,146 @@ class Model():
 
     Note: Normally not constructed directly. Instead use
     """
-    def predict(self, inputs : array.array, outputs: array.array):
+    def predict(self, inputs : array.array, outputs: array.array, model : int = 0):
         """
         Run inference using the model
 
-        :param inputs: the input data. Typecode 'h' (int16)
-        :param outputs: where to put model outputs. Typecode 'f' (float)
+        The model uses int16 inputs. Float inputs are converted in the same way as int(),
+        with values outside the int16 range saturated to the min/max.
+
+        :param inputs: the input data. Typecode 'h' (int16) or 'f' (float)
+        :param outputs: where to put model outputs. Typecode 'f' (float).
+            Class probabilities for classifiers, and the predicted value for regressors.
+        :param model: Model id, when several models are loaded
+        """
+        pass
+
+    def predict_all(self, inputs : array.array, outputs: array.array):
+        """
+        Run inference using all the models, on the same inputs
+
+        Each model uses the first n_features of the inputs.
+
+        :param inputs: the input data. Typecode 'h' (int16) or 'f' (float)
+        :param outputs: where to put model outputs. Typecode 'f' (float).
+            The outputs of each model after each other, in order of model id.
+        """
+        pass
+
+    def predict_batch(self, inputs : array.array, outputs: array.array, model : int = 0):
+        """
+        Run inference on many samples in one call
+
+        Much faster than calling predict() once per sample,
+        as the per-call overhead is only paid once.
+
+        :param inputs: the input data, n_samples x n_features stored row-by-row. Typecode 'h' (int16) or 'f' (float)
+        :param outputs: where to put model outputs.
+            Typecode 'f' (float) for class probabilities, n_samples x n_classes.
+            Typecode 'B' (uint8) or 'H' (uint16) for the most probable class, n_samples.
+            For regressors, typecode 'f' (float) with the predicted value, n_samples.
+        :param model: Model id, when several models are loaded
+        """
+        pass
+
+    def predict_early(self, inputs : array.array, outputs : array.array,
+            min_margin : int = 0, min_proba : float = 0.0, model : int = 0) -> int:
+        """
+        Run inference, stopping early when the result is clear
+
+        Trees are evaluated in order. Stops as soon as the leading class cannot be overtaken by the remaining trees.
+        Can also stop when the leading class is @min_margin votes ahead of the second best,
+        or has enough votes to have @min_proba probability over all the trees.
+        Lower thresholds use less CPU time, but may reduce accuracy.
+
+        Only supported for classifiers with majority voting.
+
+        :param inputs: the input data. Typecode 'h' (int16) or 'f' (float)
+        :param outputs: where to put class probabilities, over the evaluated trees. Typecode 'f' (float)
+        :param min_margin: Number of votes the leading class must be ahead. 0 to disable
+        :param min_proba: Probability the leading class must have over all trees. 0.0 to disable
+        :param model: Model id, when several models are loaded
+        :returns: Number of trees evaluated
+        """
+        pass
+
+    def reorder(self, samples : array.array = None):
+        """
+        Reorder the decision nodes, to improve memory locality during inference
+
+        Done once, after the model has been loaded.
+        Without samples, the nodes of each tree are laid out breadth-first.
+        With samples, the most visited child of each node is placed directly after it (hot path first).
+        Does not change the predictions.
+
+        Temporarily uses around 24 bytes of memory per decision node.
+        Not supported for models loaded with in_place=True.
+        Samples are only supported when a single model is loaded.
+
+        :param samples: representative input data, n_samples x n_features stored row-by-row. Typecode 'h' (int16)
+        """
+        pass
+
+    def setprofile(self, enable : bool):
+        """
+        Enable or disable profiling of inference
+
+        When enabled, counters are accumulated over all predictions.
+        Enabling again resets the counters.
+        Profiling makes inference slower, so it should normally be disabled.
+
+        :param enable: Whether to enable profiling
         """
         pass
 
-    def outputs(self) -> int:
+    def getprofile(self) -> tuple:
+        """
+        Get the profiling counters
+
+        Returns a tuple with (predictions, trees, nodes, max_depth, depths, features).
+        trees is the number of trees evaluated, and nodes the number of decision nodes visited.
+        The average depth per tree is nodes/trees.
+        depths is a histogram with the number of trees evaluated with each depth, up to max_depth.
+        features is the number of splits done on each feature.
+
+        Raises ValueError if profiling is not enabled.
+        """
+        pass
+
+    def outputs(self, model : int = 0) -> int:
         """
         Get the output dimensions/size of the model
 
         Useful to know how large an array to pass to predict()
+        Number of classes for classifiers, and 1 for regressors.
+
+        :param model: Model id, when several models are loaded
         """
         pass
 
-    def setdata(self, features : int, classes : int):
+    def setdata(self, features : int, classes : int, leaf_bits : int = 0):
         """
         Set data about the model
 
         Note: Usually not used directly. Instead use load_model().
 
         :param features: Number of input features
-        :param classes: Number of classes
+        :param classes: Number of classes. 0 for regression
+        :param leaf_bits: Kind of leaves. Must be set before adding leaves.
+            0 for class number (classification), 16 for int16 value or 32 for float value (regression)
+        """
+        pass
+
+    def addmodel(self) -> int:
+        """
+        Start a new model, stored after the previous models
+
+        Following calls to setdata(), addroot(), addnode(), addleaf() and loadbinary() are for the new model.
+        All models must have the same kind of leaves (leaf_bits).
+
+        Note: Usually not used directly. Instead use load_models().
+
+        :returns: Model id of the new model
         """
         pass
 
@@ -61,22 +184,47 @@ class Model():
 
         :param left: Left child (node or leaf)
         :param right: Right child (node or leaf)
-        :param feature: Feature index 
+        :param feature: Feature index. 0-65535
         :param value: Threshold to compute feature to
         """
         pass
 
+    def loadbinary(self, data, in_place : bool = False):
+        """
+        Load a complete model from binary format
+
+        Note: Usually not used directly. Instead use load_model_binary().
+
+        The data is validated before use. Raises ValueError if it is truncated,
+        or refers to nodes, leaves or features outside of the model.
+
+        :param data: Model in binary format. bytes, bytearray, array or memoryview
+        :param in_place: Use the data directly from buffer, instead of copying it.
+            Only supported when a single model is loaded.
+        """
+        pass
+
+    def shrink(self):
+        """
+        Release unused capacity
+
+        Call after the model has been loaded into a model created with new(),
+        to free the memory for trees/nodes/leaves that were not used.
+        No more trees/nodes/leaves can be added afterwards.
+        """
+        pass
+
     def addleaf(self, value : int):
         """
         Add a leaf node
 
         Note: Usually not used directly. Instead use load_model().
 
-        :param value: 
+        :param value: Class number (int), or the regression value (int or float)
         """
         pass
 
-def new(max_trees : int, max_nodes : int, max_leaves : int) -> Model:
+def new(max_trees : int, max_nodes : int, max_leaves : int, max_models : int = 1) -> Model:
     """
     Construct an empty tree-based model
 
@@ -86,6 +234,7 @@ def new(max_trees : int, max_nodes : int, max_leaves : int) -> Model:
     :param max_trees: Maximum number of trees in ensemble
     :param max_nodes: Maximum number of decision nodes (across all trees)
     :param max_leaves: Maximum number of leaves (across all trees)
+    :param max_models: Maximum number of models sharing the trees/nodes/leaves
     """
     pass
 
@@ -99,3 +248,69 @@ def load_model(trees : Model, file : typing.BinaryIO):
     """
     pass
 
+def load(file : typing.TextIO) -> Model:
+    """
+    Create a model and load the definition from a file
+
+    The model is allocated with exactly the capacity needed.
+    The file is read twice, first to find the model size, so it must support seek().
+
+    :param file: Model in CSV format, as written by emlearn
+    """
+    pass
+
+def load_models(files : list) -> Model:
+    """
+    Create a model and load several model definitions into it
+
+    The models share one pool of trees/nodes/leaves, allocated with exactly the capacity needed.
+    Model ids are given by the order in @files.
+    Use predict() with a model id to run one of the models, or predict_all() to run all of them.
+
+    :param files: Models in CSV format, as written by emlearn. Must support seek()
+    """
+    pass
+
+def load_binary(data, in_place : bool = False) -> Model:
+    """
+    Create a model and load the definition in binary format
+
+    The model is allocated with exactly the capacity needed, using the sizes in the header.
+    See load_model_binary() for a description of @in_place.
+
+    :param data: Model in binary format. A file opened in binary mode, or bytes-like object
+    :param in_place: Use the data directly, instead of copying it.
+    """
+    pass
+
+def load_model_binary(trees : Model, data, in_place : bool = False):
+    """
+    Load model definition in binary format
+
+    Much faster than load_model(), and does not create temporary objects.
+    Use convert_csv_to_binary() to create the binary format.
+
+    By default the data is copied into the model,
+    which must be constructed with sufficient capacity (trees, nodes, leaves).
+
+    With in_place=True, the decision nodes and leaves are used directly from @data, without copying.
+    The model then only needs capacity for the trees, and can be constructed with new(trees, 0, 0).
+    This is useful with a bytes object in a frozen module, which is stored in FLASH.
+    For example, a module containing MODEL = b'EMLT...' generated from repr() of the binary data.
+
+    :param trees: Model to load into
+    :param data: Model in binary format. A file opened in binary mode, or bytes-like object
+    :param in_place: Use the data directly, instead of copying it.
+    """
+    pass
+
+def convert_csv_to_binary(inp : typing.TextIO, out : typing.BinaryIO):
+    """
+    Convert model definition from CSV to binary format
+
+    Can be done on the host, or once on device.
+
+    :param inp: Model in CSV format, as written by emlearn
+    :param out: Where to write the binary format
+    """
+    pass
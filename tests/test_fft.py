@@ -3,6 +3,7 @@ import emlearn_fft
 
 import array
 import gc
+import math
 
 def test_fft_del():
     """
@@ -43,6 +44,267 @@ def test_fft_run():
 
     # FIXME: use some reasonable input data and assert the output data
 
+def test_fft_rfft():
+    """
+    Real FFT should give same as first half of complex FFT
+    """
+
+    for fft_length in [ 4, 16, 128 ]:
+        signal = [ ((i * 7919) % 101) / 50.0 - 1.0 for i in range(fft_length) ]
+        model = emlearn_fft.FFT(fft_length)
+        emlearn_fft.fill(model, fft_length)
+
+        expect_real = array.array('f', signal)
+        expect_imag = array.array('f', (0.0 for _ in range(fft_length)))
+        model.run(expect_real, expect_imag)
+
+        real = array.array('f', signal)
+        imag = array.array('f', (0.0 for _ in range(fft_length//2+1)))
+        model.rfft(real, imag)
+
+        for k in range(fft_length//2+1):
+            assert abs(real[k] - expect_real[k]) < 1e-3, (fft_length, k, real[k], expect_real[k])
+            assert abs(imag[k] - expect_imag[k]) < 1e-3, (fft_length, k, imag[k], expect_imag[k])
+
+def test_fft_tables():
+    """
+    Coefficients computed natively should give the correct FFT, also when shared
+    """
+
+    def dft(signal):
+        n = len(signal)
+        out = []
+        for k in range(n):
+            re = sum([ signal[t] * math.cos(2*math.pi*k*t/n) for t in range(n) ])
+            im = sum([ -signal[t] * math.sin(2*math.pi*k*t/n) for t in range(n) ])
+            out.append((re, im))
+        return out
+
+    large = emlearn_fft.FFT(256)
+
+    for fft_length in [ 2, 8, 64 ]:
+        signal = [ ((i * 7919) % 101) / 50.0 - 1.0 for i in range(fft_length) ]
+        expect = dft(signal)
+
+        for model in [ emlearn_fft.FFT(fft_length), emlearn_fft.FFT(fft_length, large) ]:
+            real = array.array('f', signal)
+            imag = array.array('f', (0.0 for _ in range(fft_length)))
+            model.run(real, imag)
+            for k in range(fft_length):
+                assert abs(real[k] - expect[k][0]) < 1e-3, (fft_length, k, real[k], expect[k])
+                assert abs(imag[k] - expect[k][1]) < 1e-3, (fft_length, k, imag[k], expect[k])
+
+    # can share from an instance that is itself shared
+    shared = emlearn_fft.FFT(128, large)
+    emlearn_fft.FFT(16, shared)
+
+    # only same size or smaller can share
+    try:
+        emlearn_fft.FFT(512, large)
+        assert False, 'should raise'
+    except ValueError:
+        pass
+
+def test_fft_kernels():
+    """
+    Radix-4 and radix-2 kernels should give the same results
+    """
+
+    large = emlearn_fft.FFT(1024)
+    for fft_length in [ 2, 4, 8, 32, 128, 512 ]:
+        signal = [ ((i * 7919) % 101) / 50.0 - 1.0 for i in range(fft_length) ]
+
+        for model in [ emlearn_fft.FFT(fft_length), emlearn_fft.FFT(fft_length, large) ]:
+            # default is radix-2
+            default_real = array.array('f', signal)
+            default_imag = array.array('f', (0.0 for _ in range(fft_length)))
+            model.run(default_real, default_imag)
+
+            outputs = []
+            for kernel in [ emlearn_fft.KERNEL_RADIX2, emlearn_fft.KERNEL_RADIX4 ]:
+                model.setkernel(kernel)
+                real = array.array('f', signal)
+                imag = array.array('f', (0.0 for _ in range(fft_length)))
+                model.run(real, imag)
+                rreal = array.array('f', signal)
+                rimag = array.array('f', (0.0 for _ in range(fft_length//2+1)))
+                model.rfft(rreal, rimag)
+                outputs.append((real, imag, rreal, rimag))
+
+            for a, b in zip(outputs[0], outputs[1]):
+                for k in range(len(a)):
+                    assert abs(a[k] - b[k]) < 1e-3, (fft_length, k, a[k], b[k])
+            assert list(default_real) == list(outputs[0][0])
+            assert list(default_imag) == list(outputs[0][1])
+
+def test_fft_q15():
+    """
+    Fixed-point FFT should give approximately the same as float FFT
+    """
+
+    for fft_length in [ 8, 64, 256 ]:
+        signal = [ ((i * 7919) % 2001) * 16 - 16000 for i in range(fft_length) ]
+        model = emlearn_fft.FFT(fft_length)
+
+        expect_real = array.array('f', signal)
+        expect_imag = array.array('f', (0.0 for _ in range(fft_length)))
+        model.run(expect_real, expect_imag)
+
+        real = array.array('h', signal)
+        imag = array.array('h', (0 for _ in range(fft_length)))
+        shift = model.run_q15(real, imag)
+        assert shift >= 1, shift
+
+        scale = 2**shift
+        # rounding error grows with the number of stages
+        tolerance = 2 * scale * math.log(fft_length, 2)
+        for k in range(fft_length):
+            assert abs(real[k]*scale - expect_real[k]) <= tolerance, (fft_length, k, real[k]*scale, expect_real[k])
+            assert abs(imag[k]*scale - expect_imag[k]) <= tolerance, (fft_length, k, imag[k]*scale, expect_imag[k])
+
+        # magnitude
+        out = array.array('H', (0 for _ in range(fft_length)))
+        emlearn_fft.magnitude_q15(real, imag, out)
+        for k in range(fft_length):
+            expect = (expect_real[k]**2 + expect_imag[k]**2) ** 0.5
+            assert abs(out[k]*scale - expect) <= 2*tolerance, (fft_length, k, out[k]*scale, expect)
+
+    # in-place magnitude saturates to int16
+    real = array.array('h', [ 32767, 3, -4 ])
+    imag = array.array('h', [ 32767, 4, 3 ])
+    emlearn_fft.magnitude_q15(real, imag, real)
+    assert list(real) == [ 32767, 5, 5 ], real
+
+def test_fft_spectrum():
+    """
+    Magnitude, power and filterbank bands should be computed from FFT output
+    """
+
+    fft_length = 256
+    samplerate = 1000
+    n_bins = fft_length//2+1
+    # sine at the center frequency of bin 40
+    signal = [ math.sin(2*math.pi*40*i/fft_length) for i in range(fft_length) ]
+
+    model = emlearn_fft.FFT(fft_length)
+    real = array.array('f', signal)
+    imag = array.array('f', (0.0 for _ in range(n_bins)))
+    model.rfft(real, imag)
+
+    power = array.array('f', (0.0 for _ in range(n_bins)))
+    emlearn_fft.power(real, imag, power)
+    magnitude = array.array('f', (0.0 for _ in range(n_bins)))
+    emlearn_fft.magnitude(real, imag, magnitude)
+    for k in range(n_bins):
+        p = real[k]**2 + imag[k]**2
+        assert abs(power[k] - p) <= 1e-3 * max(p, 1.0), (k, power[k], p)
+        assert abs(magnitude[k] - p**0.5) <= 1e-3 * max(p**0.5, 1.0), (k, magnitude[k], p**0.5)
+    assert abs(magnitude[40] - fft_length/2) < 1e-2, magnitude[40]
+
+    # absolute values scaled into a feature array, after other features
+    features = array.array('f', (-1.0 for _ in range(2+8)))
+    emlearn_fft.abs_scale(real, features, 0.5, 2)
+    assert features[0] == -1.0 and features[1] == -1.0, features
+    for k in range(8):
+        assert abs(features[2+k] - 0.5*abs(real[k])) < 1e-3, (k, features[2+k], real[k])
+
+    # in-place
+    emlearn_fft.magnitude(real, imag, real)
+    assert abs(real[40] - magnitude[40]) < 1e-3
+
+    # flat spectrum into linear bands. Inner bands all the same
+    n_bands = 8
+    bank = emlearn_fft.FilterBank(n_bins, n_bands, samplerate, scale='linear')
+    flat = array.array('f', (1.0 for _ in range(n_bins)))
+    bands = array.array('f', (0.0 for _ in range(n_bands)))
+    bank.apply(flat, bands)
+    for b in range(1, n_bands-1):
+        assert abs(bands[b] - bands[1]) < 0.2, list(bands)
+    expect_width = (n_bins-1) / (n_bands+1)
+    assert abs(bands[1] - expect_width) < 0.2, (bands[1], expect_width)
+
+    # peak goes into the band(s) around it, written at offset in a feature array
+    for scale in ['mel', 'linear', 'log']:
+        bank = emlearn_fft.FilterBank(n_bins, n_bands, samplerate, fmin=10.0, scale=scale)
+        features = array.array('f', (-1.0 for _ in range(2+n_bands)))
+        bank.apply(magnitude, features, 2)
+        assert features[0] == -1.0 and features[1] == -1.0, features
+        strongest = max(range(n_bands), key=lambda b: features[2+b])
+        for b in range(n_bands):
+            if b != strongest:
+                assert features[2+b] < features[2+strongest], (scale, list(features))
+        assert bank.bands[40] in (strongest, strongest+1), (scale, bank.bands[40], strongest)
+
+def test_fft_stft():
+    """
+    Streaming STFT should give the same frames as windowing and FFT of each frame
+    """
+
+    fft_length = 128
+    hop = 32
+    n_bins = fft_length//2+1
+    n_frames = 8
+    # integer values, so int16 and float input are the same
+    signal = [ float(round(1000 * math.sin(2*math.pi*10*i/fft_length) + 500 * math.sin(2*math.pi*23*i/fft_length)))
+        for i in range(hop*n_frames) ]
+
+    stft = emlearn_fft.STFT(fft_length, hop)
+    out = array.array('f', (0.0 for _ in range(n_frames*n_bins)))
+    for f in range(n_frames):
+        chunk = array.array('f', signal[f*hop:(f+1)*hop])
+        stft.push(chunk, out, f)
+
+    # reference, with zeros before the start of the signal
+    window = emlearn_fft.hann(fft_length)
+    model = emlearn_fft.FFT(fft_length)
+    padded = [ 0.0 ] * (fft_length-hop) + signal
+    for f in range(n_frames):
+        frame = padded[f*hop:f*hop+fft_length]
+        real = array.array('f', (frame[i] * window[i] for i in range(fft_length)))
+        imag = array.array('f', (0.0 for _ in range(n_bins)))
+        model.rfft(real, imag)
+        for k in range(n_bins):
+            expect = (real[k]**2 + imag[k]**2)**0.5
+            got = out[f*n_bins+k]
+            assert abs(got - expect) <= 1e-3 * max(expect, 10.0), (f, k, got, expect)
+
+    # full frame has peaks at the two frequencies
+    last = out[(n_frames-1)*n_bins:]
+    strongest = sorted(range(n_bins), key=lambda k: last[k])[-2:]
+    assert sorted(strongest) == [10, 23], strongest
+
+    # int16 input gives the same frames
+    stft16 = emlearn_fft.STFT(fft_length, hop)
+    out16 = array.array('f', (0.0 for _ in range(n_frames*n_bins)))
+    for f in range(n_frames):
+        chunk = array.array('h', (int(v) for v in signal[f*hop:(f+1)*hop]))
+        stft16.push(chunk, out16, f)
+    for i in range(len(out)):
+        assert abs(out16[i] - out[i]) <= 1e-3 * max(out[i], 10.0), (i, out16[i], out[i])
+
+    # with filterbank, each frame has n_bands values
+    n_bands = 6
+    bank = emlearn_fft.FilterBank(n_bins, n_bands, 1000, scale='linear')
+    stft = emlearn_fft.STFT(fft_length, hop, window='hamming', filterbank=bank, spectrum='power')
+    bands = array.array('f', (0.0 for _ in range(n_frames*n_bands)))
+    for f in range(n_frames):
+        stft.push(array.array('f', signal[f*hop:(f+1)*hop]), bands, f)
+    assert max(bands[(n_frames-1)*n_bands:]) > 0.0, list(bands)
+
+    # wrong chunk size, or frame outside of out
+    for chunk, frame in [(array.array('f', signal[:hop+1]), 0), (array.array('f', signal[:hop]), n_frames)]:
+        try:
+            stft.push(chunk, bands, frame)
+            assert False, 'should have raised'
+        except ValueError:
+            pass
+
 if __name__ == '__main__':
     test_fft_del()
     test_fft_run()
+    test_fft_rfft()
+    test_fft_tables()
+    test_fft_kernels()
+    test_fft_q15()
+    test_fft_spectrum()
+    test_fft_stft()
@@ -62,7 +62,181 @@ def test_kmeans_many_features():
     assert min(assignments) >= 0
     assert max(assignments) < n_clusters
 
+def test_kmeans_step():
+    """
+    One step should assign samples to nearest centroid, and move centroids to the mean
+    """
+
+    n_features = 3
+    dataset, centroids = make_two_cluster_data('B')
+    assignments = array.array('B', [255, 255, 255, 255])
+
+    changes = emlearn_kmeans.kmeans_step(dataset, centroids, assignments, n_features)
+    assert changes == 4, changes
+    assert list(assignments) == [0, 0, 1, 1], assignments
+    assert list(centroids) == [5, 2, 1, 227, 152, 177], centroids
+
+    # converged, no more changes
+    changes = emlearn_kmeans.kmeans_step(dataset, centroids, assignments, n_features)
+    assert changes == 0, changes
+
+    # the iterator gives the changes for each step
+    dataset, centroids = make_two_cluster_data('B')
+    assignments = array.array('B', [255, 255, 255, 255])
+    changes = list(emlearn_kmeans.cluster_iter(dataset, centroids, assignments, n_features))
+    assert changes == [4, 0], changes
+
+def test_kmeans_assign():
+    """
+    Assigning many points at once should give same as euclidean_argmin on each
+    """
+
+    channels = 3
+    palette = bytearray([
+        0, 0, 0,
+        255, 255, 255,
+        255, 0, 0,
+        0, 0, 255,
+    ])
+    n_points = 50
+    points = bytearray(( (i * 7919) % 256 for i in range(n_points*channels) ))
+
+    indices = array.array('B', (0 for _ in range(n_points)))
+    distances = array.array('I', (0 for _ in range(n_points)))
+    emlearn_kmeans.assign(points, palette, indices, channels, distances)
+
+    for i in range(n_points):
+        p = points[i*channels:(i+1)*channels]
+        idx, dist = emlearn_kmeans.euclidean_argmin(palette, p)
+        assert indices[i] == idx, (i, indices[i], idx)
+        assert distances[i] == dist, (i, distances[i], dist)
+
+    # distances are optional
+    indices2 = bytearray(n_points)
+    emlearn_kmeans.assign(points, palette, indices2, channels)
+    assert list(indices2) == list(indices)
+
+def make_blobs(centers, n_samples, spread=10):
+    """Deterministic pseudo-random samples around each of @centers"""
+
+    values = []
+    for i in range(n_samples):
+        center = centers[i % len(centers)]
+        for j, c in enumerate(center):
+            offset = ((i * 7919 + j * 104729) % (2*spread+1)) - spread
+            values.append(c + offset)
+    return values
+
+def test_kmeans_plusplus():
+    """
+    k-means++ should pick initial centroids from different clusters
+    """
+
+    n_features = 2
+    centers = [ (30, 30), (220, 40), (120, 220) ]
+    dataset = array.array('B', make_blobs(centers, 60))
+
+    for seed in (1, 2, 3):
+        centroids = array.array('B', (0 for _ in range(len(centers)*n_features)))
+        emlearn_kmeans.kmeans_plusplus(dataset, centroids, n_features, seed)
+
+        # one initial centroid from each of the clusters
+        found = set()
+        for center in centers:
+            idx, dist = emlearn_kmeans.euclidean_argmin(centroids, array.array('B', center))
+            assert dist < 2*(10*10), (seed, center, dist)
+            found.add(idx)
+        assert len(found) == len(centers), (seed, found)
+
+    # Can be used in cluster()
+    centroids = array.array('B', (0 for _ in range(len(centers)*n_features)))
+    assignments = emlearn_kmeans.cluster(dataset, centroids, n_features, init='k-means++')
+    for i in range(len(centers)):
+        assert assignments[i] == assignments[i+len(centers)], (i, assignments)
+    assert len(set(assignments)) == len(centers), assignments
+
+def test_kmeans_minibatch():
+    """
+    Pushing data in chunks should give centroids close to the cluster centers
+    """
+
+    n_features = 2
+    centers = [ (30, 30), (220, 40), (120, 220) ]
+    dataset = array.array('B', make_blobs(centers, 600))
+
+    centroids = array.array('B', (0 for _ in range(len(centers)*n_features)))
+    model = emlearn_kmeans.MiniBatch(centroids, n_features, max_count=50)
+    chunk = 20 * n_features
+    for start in range(0, len(dataset), chunk):
+        model.push(dataset[start:start+chunk])
+
+    for center in centers:
+        idx, dist = emlearn_kmeans.euclidean_argmin(centroids, array.array('B', center))
+        assert dist <= 2*(3*3), (center, list(centroids))
+
+def test_kmeans_int16_float():
+    """
+    int16 and float data should cluster the same as uint8
+    """
+
+    n_features = 2
+    centers = [ (-3000, 2000), (12000, -20000), (100, 25000) ]
+    values = make_blobs(centers, 60, spread=500)
+
+    for typecode in ['h', 'f']:
+        dataset = array.array(typecode, values)
+        centroids = array.array(typecode, (0 for _ in range(len(centers)*n_features)))
+        assignments = emlearn_kmeans.cluster(dataset, centroids, n_features, init='k-means++')
+
+        # samples from same blob in same cluster
+        for i in range(len(centers)):
+            assert assignments[i] == assignments[i+len(centers)], (typecode, i, assignments)
+        assert len(set(assignments)) == len(centers), (typecode, assignments)
+
+        # centroids close to the centers
+        for center in centers:
+            idx, dist = emlearn_kmeans.euclidean_argmin(centroids, array.array(typecode, center))
+            assert dist <= 2*(100*100), (typecode, center, dist, list(centroids))
+
+        # distances are float for float data
+        indices = array.array('H', (0 for _ in range(len(assignments))))
+        distances = array.array('f' if typecode == 'f' else 'I', (0 for _ in range(len(assignments))))
+        emlearn_kmeans.assign(dataset, centroids, indices, n_features, distances)
+        assert list(indices) == list(assignments), (typecode, indices)
+        assert max(distances) <= 2*(600*600), (typecode, max(distances))
+
+        # mini-batch
+        centroids = array.array(typecode, (0 for _ in range(len(centers)*n_features)))
+        model = emlearn_kmeans.MiniBatch(centroids, n_features)
+        model.push(dataset)
+        for center in centers:
+            idx, dist = emlearn_kmeans.euclidean_argmin(centroids, array.array(typecode, center))
+            assert dist <= 2*(200*200), (typecode, center, dist, list(centroids))
+
+def test_kmeans_many_clusters():
+    """
+    More than 255 clusters and features should be supported
+    """
+
+    n_features = 300
+    n_clusters = 260
+    dataset = array.array('B', ((i * 7919) % 256 for i in range(n_features*n_clusters)))
+    # make all samples unique
+    for i in range(n_clusters):
+        dataset[i*n_features+0] = i % 256
+        dataset[i*n_features+1] = i // 256
+    centroids = array.array('B', dataset)
+
+    # each sample is its own cluster
+    assignments = emlearn_kmeans.cluster(dataset, centroids, features=n_features, max_iter=2)
+    assert list(assignments) == list(range(n_clusters)), assignments
+
 if __name__ == '__main__':
     test_kmeans_two_clusters()
     test_kmeans_many_features()
-
+    test_kmeans_step()
+    test_kmeans_assign()
+    test_kmeans_plusplus()
+    test_kmeans_minibatch()
+    test_kmeans_int16_float()
+    test_kmeans_many_clusters()
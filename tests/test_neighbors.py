@@ -78,8 +78,332 @@ def test_neighbors_get_results():
     assert model.getresult(0)[2] == 0
     assert model.getresult(3)[2] == 1
 
+def test_neighbors_predict_batch():
+    """
+    Batched predictions should give same results as one-by-one
+    """
+
+    model = emlearn_neighbors.new(100, 3, 1)
+    data = [
+        (array.array('h', [-100, -100, -2]), 0),
+        (array.array('h', [100, 100, 2]), 1),
+        (array.array('h', [-100, 100, 0]), 2),
+    ]
+    for x, y in data:
+        model.additem(x, y)
+
+    queries = [ [-90, -90, 0], [90, 80, 2], [-80, 90, 1], [100, 100, 2] ]
+    expect = [ model.predict(array.array('h', q)) for q in queries ]
+    assert expect == [0, 1, 2, 1], expect
+
+    inputs = array.array('h', [ v for q in queries for v in q ])
+    out = array.array('h', range(len(queries)))
+    model.predict_batch(inputs, out)
+    assert list(out) == expect, out
+
+def test_neighbors_into():
+    """
+    Nearest neighbors can be copied into arrays, same as getresult()
+    """
+
+    k = 3
+    model = emlearn_neighbors.new(100, 2, k)
+    for i in range(10):
+        model.additem(array.array('h', [i*10, 0]), i % 2)
+
+    model.predict(array.array('h', [32, 0]))
+
+    indices = array.array('h', range(k))
+    distances = array.array('I', range(k))
+    labels = array.array('h', range(k))
+    n = model.neighbors_into(indices, distances, labels)
+    assert n == k, n
+    for i in range(k):
+        assert (indices[i], distances[i], labels[i]) == model.getresult(i)
+    assert sorted(indices) == [2, 3, 4], indices
+
+    # arrays not needed can be skipped
+    n = model.neighbors_into(None, distances, None)
+    assert n == k
+    assert list(distances) == [2, 8, 12], distances
+
+def test_neighbors_select():
+    """
+    Top-k selection should give the same nearest neighbors as sorting all items
+    """
+
+    k = 5
+    n_items = 200
+    model = emlearn_neighbors.new(n_items, 2, k)
+    for i in range(n_items):
+        # deterministic pseudo-random data
+        x = (i * 7919) % 1000
+        y = (i * 104729) % 1000
+        model.additem(array.array('h', [x, y]), i % 3)
+
+    # by default, top-k is used with many items
+    model.predict(array.array('h', [500, 500]))
+    assert model.selection() == emlearn_neighbors.SELECT_TOPK
+
+    # with SELECT_SORT, all results are available
+    model.setselect(emlearn_neighbors.SELECT_SORT)
+    model.predict(array.array('h', [500, 500]))
+    assert model.selection() == emlearn_neighbors.SELECT_SORT
+    all_distances = [ model.getresult(i)[1] for i in range(n_items) ]
+    assert all_distances == sorted(all_distances)
+
+    # with SELECT_AUTO and many items, top-k is used
+    queries = [ [500, 500], [0, 0], [999, 10], [123, 456] ]
+    for q in queries:
+        inputs = array.array('h', q)
+
+        model.setselect(emlearn_neighbors.SELECT_SORT)
+        expect = model.predict(inputs)
+        assert model.selection() == emlearn_neighbors.SELECT_SORT
+        expect_distances = [ model.getresult(i)[1] for i in range(k) ]
+
+        model.setselect(emlearn_neighbors.SELECT_AUTO)
+        out = model.predict(inputs)
+        assert model.selection() == emlearn_neighbors.SELECT_TOPK
+        distances = [ model.getresult(i)[1] for i in range(k) ]
+
+        assert distances == expect_distances, (q, distances, expect_distances)
+        assert out == expect, (q, out, expect)
+
+        # only the k nearest are known
+        try:
+            model.getresult(k)
+            assert False, 'should have raised'
+        except IndexError:
+            pass
+
+def test_neighbors_store():
+    """
+    Items can be removed, and replaced when model is full
+    """
+
+    def labels(model, n):
+        item = array.array('h', [0])
+        out = []
+        for i in range(n):
+            model.getitem(i, item)
+            out.append(item[0])
+        return out
+
+    # Fixed size: raises when full
+    model = emlearn_neighbors.new(4, 1, 1)
+    for i in range(4):
+        model.additem(array.array('h', [i]), i)
+    try:
+        model.additem(array.array('h', [4]), 4)
+        assert False, 'should raise when full'
+    except ValueError:
+        pass
+
+    # Remove item. Later items are moved down
+    model.removeitem(1)
+    assert labels(model, 3) == [0, 2, 3]
+    model.additem(array.array('h', [4]), 4)
+    assert labels(model, 4) == [0, 2, 3, 4]
+
+    # Ring buffer: replaces the oldest item
+    model.clear()
+    model.setstore(emlearn_neighbors.STORE_RING)
+    for i in range(6):
+        model.additem(array.array('h', [i]), i)
+    assert labels(model, 4) == [4, 5, 2, 3]
+
+    # Removing keeps the age order, so the oldest is still replaced
+    model.removeitem(3) # item with label 3
+    model.additem(array.array('h', [6]), 6)
+    model.additem(array.array('h', [7]), 7)
+    assert sorted(labels(model, 4)) == [4, 5, 6, 7], labels(model, 4)
+
+    # predict uses the new items
+    assert model.predict(array.array('h', [7])) == 7
+
+    # Reservoir sampling: keeps a random subset of all the items seen
+    model = emlearn_neighbors.new(10, 1, 1)
+    model.setstore(emlearn_neighbors.STORE_RESERVOIR, 1234)
+    dropped = 0
+    for i in range(100):
+        idx = model.additem(array.array('h', [i]), i)
+        if idx < 0:
+            dropped += 1
+    assert dropped > 50, dropped
+    kept = labels(model, 10)
+    assert len(set(kept)) == 10, kept
+    assert max(kept) >= 10, kept
+
+def test_neighbors_metrics():
+    """
+    Distance metrics and int8 items should find the correct nearest neighbors
+    """
+
+    def distance(metric, a, b):
+        diffs = [ abs(x - y) for x, y in zip(a, b) ]
+        if metric == emlearn_neighbors.METRIC_MANHATTAN:
+            return sum(diffs)
+        elif metric == emlearn_neighbors.METRIC_CHEBYSHEV:
+            return max(diffs)
+        squared = sum([ d*d for d in diffs ])
+        if metric == emlearn_neighbors.METRIC_SQEUCLIDEAN:
+            return squared
+        return int(squared ** 0.5)
+
+    k = 3
+    n_features = 4
+    items = []
+    for i in range(100):
+        # deterministic pseudo-random data, in int8 range
+        items.append([ ((i * 7919 + f * 104729) % 251) - 125 for f in range(n_features) ])
+    queries = [ [0, 0, 0, 0], [100, -100, 50, -50], [-120, 120, -120, 120] ]
+
+    metrics = [
+        emlearn_neighbors.METRIC_EUCLIDEAN,
+        emlearn_neighbors.METRIC_SQEUCLIDEAN,
+        emlearn_neighbors.METRIC_MANHATTAN,
+        emlearn_neighbors.METRIC_CHEBYSHEV,
+    ]
+    for item_bits, typecode in [ (16, 'h'), (8, 'b') ]:
+        model = emlearn_neighbors.new(len(items), n_features, k, item_bits)
+        for i, item in enumerate(items):
+            model.additem(array.array(typecode, item), i % 2)
+
+        # items are stored as given
+        out = array.array(typecode, range(n_features))
+        model.getitem(7, out)
+        assert list(out) == items[7], (item_bits, list(out))
+
+        for metric in metrics:
+            model.setmetric(metric)
+            for select in (emlearn_neighbors.SELECT_SORT, emlearn_neighbors.SELECT_TOPK, emlearn_neighbors.SELECT_AUTO):
+                model.setselect(select)
+                for q in queries:
+                    model.predict(array.array(typecode, q))
+                    # by default, top-k with early termination is used for many items
+                    if select != emlearn_neighbors.SELECT_SORT:
+                        assert model.selection() == emlearn_neighbors.SELECT_TOPK
+                    distances = [ model.getresult(i)[1] for i in range(k) ]
+                    expect = sorted([ distance(metric, q, item) for item in items ])[:k]
+                    assert distances == expect, (item_bits, metric, select, q, distances, expect)
+
+def test_neighbors_save_load():
+    """
+    Saving and loading should give the same items
+    """
+
+    for item_bits, typecode in [ (16, 'h'), (8, 'b') ]:
+        n_features = 3
+        model = emlearn_neighbors.new(10, n_features, 1, item_bits)
+        for i in range(5):
+            model.additem(array.array(typecode, [i, -i, 3*i]), i)
+
+        buf = bytearray(model.savesize())
+        written = model.save_into(buf)
+        assert written == len(buf), (written, len(buf))
+
+        loaded = emlearn_neighbors.new(10, n_features, 1, item_bits)
+        loaded.additem(array.array(typecode, [100, 100, 100]), 9) # replaced
+        n = loaded.load_from(buf)
+        assert n == 5, n
+
+        a = array.array(typecode, range(n_features))
+        b = array.array(typecode, range(n_features))
+        for i in range(5):
+            model.getitem(i, a)
+            loaded.getitem(i, b)
+            assert a == b, (i, a, b)
+            assert loaded.predict(a) == i
+
+        # too small buffer, or model that does not match
+        try:
+            model.save_into(bytearray(len(buf)-1))
+            assert False, 'should raise'
+        except ValueError:
+            pass
+        try:
+            emlearn_neighbors.new(10, n_features+1, 1, item_bits).load_from(buf)
+            assert False, 'should raise'
+        except ValueError:
+            pass
+
+def test_neighbors_quantized():
+    """
+    With item_bits=8 and item_shift, values larger than int8 should still find the right neighbors
+    """
+
+    # durations in milliseconds, like in the sequence lock example
+    k = 1
+    items = [
+        [ 100, 100, 300, 300 ],
+        [ 300, 300, 100, 100 ],
+        [ 200, 600, 200, 600 ],
+        [ 1000, 1500, 1000, 1500 ],
+    ]
+    queries = [
+        ([ 110, 90, 310, 280 ], 0),
+        ([ 290, 320, 90, 100 ], 1),
+        ([ 210, 580, 190, 620 ], 2),
+        ([ 990, 1510, 1020, 1490 ], 3),
+    ]
+
+    model = emlearn_neighbors.new(len(items), 4, k, 8, 4)
+    for i, item in enumerate(items):
+        model.additem(array.array('h', item), i)
+
+    for q, expect in queries:
+        out = model.predict(array.array('h', q))
+        assert out == expect, (q, out, expect)
+        # distance is in the units of the inputs, within the quantization step
+        _, distance, _ = model.getresult(0)
+        true_distance = sum([ (a-b)**2 for a, b in zip(q, items[expect]) ]) ** 0.5
+        assert abs(distance - true_distance) <= 2 * 16, (q, distance, true_distance)
+
+    # int16 items are scaled back. int8 gives the stored values
+    out = array.array('h', range(4))
+    model.getitem(3, out)
+    assert list(out) == [ 1008, 1504, 1008, 1504 ], list(out)
+    out = array.array('b', range(4))
+    model.getitem(3, out)
+    assert list(out) == [ 63, 94, 63, 94 ], list(out)
+
+    # same results after saving and loading, only into a model with the same item_shift
+    buf = bytearray(model.savesize())
+    model.save_into(buf)
+    loaded = emlearn_neighbors.new(len(items), 4, k, 8, 4)
+    loaded.load_from(buf)
+    for q, expect in queries:
+        assert loaded.predict(array.array('h', q)) == expect
+    try:
+        emlearn_neighbors.new(len(items), 4, k, 8, 3).load_from(buf)
+        assert False, 'should raise'
+    except ValueError:
+        pass
+
+    # without a shift, the values saturate and some items are not distinguishable
+    saturated = emlearn_neighbors.new(len(items), 4, k, 8)
+    for i, item in enumerate(items):
+        saturated.additem(array.array('h', item), i)
+    saturated.predict(array.array('h', queries[3][0]))
+    assert saturated.getresult(0)[1] == saturated.getresult(1)[1] == 0
+
+    # item_shift is only for int8 items
+    for bits, shift in [ (16, 1), (8, 9), (8, -1) ]:
+        try:
+            emlearn_neighbors.new(10, 4, k, bits, shift)
+            assert False, 'should raise'
+        except ValueError:
+            pass
+
 if __name__ == '__main__':
     test_neighbors_del()
     test_neighbors_trivial()
     test_neighbors_get_results()
-
+    test_neighbors_predict_batch()
+    test_neighbors_into()
+    test_neighbors_select()
+    test_neighbors_store()
+    test_neighbors_metrics()
+    test_neighbors_save_load()
+    test_neighbors_quantized()
@@ -3,6 +3,8 @@ import emlearn_trees
 
 import array
 import gc
+import io
+import struct
 
 def argmax(arr):
     idx_max = 0
@@ -63,7 +65,443 @@ def test_trees_xor():
         result = argmax(out)
         assert result == expect, (ex, expect, result)
 
+    # inputs must have n_features values
+    for short in (array.array('h', [0]), array.array('f', [0.0])):
+        try:
+            model.predict(short, out)
+            assert False, 'should have raised'
+        except RuntimeError:
+            pass
+
+def test_trees_predict_batch():
+    """
+    Batched predictions should give same results as one-by-one
+    """
+
+    model = emlearn_trees.new(5, 30, 4)
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        emlearn_trees.load_model(model, f)
+
+    s = 32767 # max int16
+    examples = [
+        # input, expected output
+        ( [0, 0], 0 ),
+        ( [1*s, 1*s], 0 ),
+        ( [0, 1*s], 1 ),
+        ( [1*s, 0], 1 ),
+    ]
+    n_samples = len(examples)
+    n_classes = model.outputs()
+
+    X = array.array('h', [ v for ex, _ in examples for v in ex ])
+
+    # class probabilities
+    proba = array.array('f', (0 for _ in range(n_samples*n_classes)))
+    model.predict_batch(X, proba)
+    out = array.array('f', range(n_classes))
+    for i, (ex, expect) in enumerate(examples):
+        model.predict(array.array('h', ex), out)
+        assert list(out) == list(proba[i*n_classes:(i+1)*n_classes]), (ex, out)
+
+    # most probable class
+    for typecode in ('B', 'H'):
+        classes = array.array(typecode, (0 for _ in range(n_samples)))
+        model.predict_batch(X, classes)
+        assert list(classes) == [ expect for _, expect in examples ], classes
+
+    # inputs must be a whole number of samples
+    try:
+        model.predict_batch(array.array('h', [0, 0, 0]), classes)
+        assert False, 'should have raised'
+    except ValueError:
+        pass
+
+def test_trees_binary():
+    """
+    Binary model format should give same results as CSV, both copied and in-place
+    """
+
+    reference = emlearn_trees.new(5, 30, 4)
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        emlearn_trees.load_model(reference, f)
+
+    # Convert to binary format
+    buf = io.BytesIO()
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        emlearn_trees.convert_csv_to_binary(f, buf)
+    data = buf.getvalue()
+
+    copied = emlearn_trees.new(5, 30, 4)
+    emlearn_trees.load_model_binary(copied, io.BytesIO(data))
+    in_place = emlearn_trees.new(5, 0, 0)
+    emlearn_trees.load_model_binary(in_place, data, in_place=True)
+
+    s = 32767 # max int16
+    examples = [ [0, 0], [1*s, 1*s], [0, 1*s], [1*s, 0], [s//2, s//3] ]
+
+    expect = array.array('f', range(reference.outputs()))
+    out = array.array('f', range(reference.outputs()))
+    for ex in examples:
+        f = array.array('h', ex)
+        reference.predict(f, expect)
+        for model in (copied, in_place):
+            assert model.outputs() == reference.outputs()
+            model.predict(f, out)
+            assert list(out) == list(expect), (ex, out, expect)
+
+    # Capacity is checked when copying
+    small = emlearn_trees.new(5, 3, 4)
+    try:
+        emlearn_trees.load_model_binary(small, data)
+        assert False, 'should have raised'
+    except ValueError:
+        pass
+
+    # Invalid data is rejected
+    try:
+        emlearn_trees.load_model_binary(small, b'NOPE' + data[4:])
+        assert False, 'should have raised'
+    except ValueError:
+        pass
+
+    # Truncated data, or counts in header that would overflow, are rejected
+    header = struct.unpack_from(emlearn_trees.BINARY_HEADER, data, 0)
+    huge = struct.pack(emlearn_trees.BINARY_HEADER, *(header[:-3] + (0x40000000, 0x20000000, 0)))
+    for invalid in (data[:-1], huge + data[24:]):
+        for in_place in (False, True):
+            model = emlearn_trees.new(5, 30, 4)
+            try:
+                emlearn_trees.load_model_binary(model, invalid, in_place=in_place)
+                assert False, 'should have raised'
+            except ValueError:
+                pass
+
+    # References outside of the model are rejected
+    invalid_csvs = [
+        [ 'r,0', 'n,0,0,-1,5', 'l,0' ], # child node
+        [ 'r,0', 'n,0,0,-1,0', 'l,0' ], # child node pointing to itself
+        [ 'r,0', 'n,0,0,-1,-2', 'l,0' ], # child leaf
+        [ 'r,1', 'n,0,0,-1,-1', 'l,0' ], # root node
+        [ 'r,-2', 'n,0,0,-1,-1', 'l,0' ], # root leaf
+        [ 'r,0', 'n,2,0,-1,-1', 'l,0' ], # feature
+    ]
+    for lines in invalid_csvs:
+        buf = io.BytesIO()
+        emlearn_trees.convert_csv_to_binary(io.StringIO('\r\n'.join([ 'f,2', 'c,2' ] + lines)), buf)
+        for in_place in (False, True):
+            model = emlearn_trees.new(5, 30, 4)
+            try:
+                emlearn_trees.load_model_binary(model, buf.getvalue(), in_place=in_place)
+                assert False, ('should have raised', lines)
+            except ValueError:
+                pass
+            # model is left empty
+            try:
+                model.outputs()
+                assert False, 'should have raised'
+            except ValueError:
+                pass
+
+def test_trees_load_sized():
+    """
+    Auto-sized loading and shrink() should give a model with no spare capacity
+    """
+
+    reference = emlearn_trees.new(10, 1000, 10)
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        emlearn_trees.load_model(reference, f)
+    reference.shrink()
+
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        loaded = emlearn_trees.load(f)
+
+    buf = io.BytesIO()
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        emlearn_trees.convert_csv_to_binary(f, buf)
+    loaded_binary = emlearn_trees.load_binary(buf.getvalue())
+    loaded_in_place = emlearn_trees.load_binary(buf.getvalue(), in_place=True)
+
+    s = 32767 # max int16
+    examples = [ [0, 0], [1*s, 1*s], [0, 1*s], [1*s, 0] ]
+
+    expect = array.array('f', range(reference.outputs()))
+    out = array.array('f', range(reference.outputs()))
+    for ex in examples:
+        f = array.array('h', ex)
+        reference.predict(f, expect)
+        assert argmax(expect) == (ex[0] != ex[1]), (ex, expect)
+        for model in (loaded, loaded_binary, loaded_in_place):
+            model.predict(f, out)
+            assert list(out) == list(expect), (ex, out, expect)
+
+    # Models are full, no more capacity left
+    for model in (reference, loaded, loaded_binary):
+        try:
+            model.addnode(0, 0, 0, 0)
+            assert False, 'should have raised'
+        except ValueError:
+            pass
+
+def test_trees_regression():
+    """
+    Regression with float and int16 leaves should give average of leaf values
+    """
+
+    # Two trees. First splits on feature 0, second on feature 1
+    def make_csv(leaf_bits, leaves):
+        lines = [ 'f,2', 'c,0', f'lb,{leaf_bits}' ]
+        lines += [ f'l,{l}' for l in leaves ]
+        lines += [ 'r,0', 'r,1', 'n,0,0,-1,-2', 'n,1,100,-3,-2' ]
+        return '\r\n'.join(lines)
+
+    examples = [
+        # input, expected output
+        ( [-5, 0], (1.5+4.0)/2 ),
+        ( [5, 200], -2.5 ),
+        ( [5, 0], (-2.5+4.0)/2 ),
+        ( [-5, 200], (1.5-2.5)/2 ),
+    ]
+
+    for leaf_bits, leaves, scale in [ (32, [1.5, -2.5, 4.0], 1), (16, [15, -25, 40], 10) ]:
+        csv = make_csv(leaf_bits, leaves)
+        model = emlearn_trees.load(io.StringIO(csv))
+        assert model.outputs() == 1
+
+        buf = io.BytesIO()
+        emlearn_trees.convert_csv_to_binary(io.StringIO(csv), buf)
+        in_place = emlearn_trees.load_binary(buf.getvalue(), in_place=True)
+
+        out = array.array('f', [0])
+        for m in (model, in_place):
+            for ex, expect in examples:
+                m.predict(array.array('h', ex), out)
+                assert out[0] == expect*scale, (leaf_bits, ex, out[0], expect)
+
+        inputs = array.array('h', [ v for ex, _ in examples for v in ex ])
+        outputs = array.array('f', range(len(examples)))
+        model.predict_batch(inputs, outputs)
+        assert list(outputs) == [ expect*scale for _, expect in examples ], outputs
+
+def test_trees_predict_early():
+    """
+    Early stopping should give same class as evaluating all trees
+    """
+
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        model = emlearn_trees.load(f)
+
+    s = 32767 # max int16
+    examples = [ [0, 0], [1*s, 1*s], [0, 1*s], [1*s, 0] ]
+
+    n_classes = model.outputs()
+    expect = array.array('f', range(n_classes))
+    out = array.array('f', range(n_classes))
+    for ex in examples:
+        f = array.array('h', ex)
+        model.predict(f, expect)
+
+        # stops when leading class cannot be overtaken
+        evaluated = model.predict_early(f, out)
+        assert 1 <= evaluated <= 3, evaluated
+        assert argmax(out) == argmax(expect), (ex, out, expect)
+
+        # margin of 1 vote, and probability (1 of 3 trees) reached after the first tree
+        assert model.predict_early(f, out, 1) == 1
+        assert max(out) == 1.0, out
+        assert model.predict_early(f, out, 0, 0.3) == 1
+
+def test_trees_profile():
+    """
+    Profiling counters should be consistent with the predictions done
+    """
+
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        model = emlearn_trees.load(f)
+
+    s = 32767 # max int16
+    examples = [ [0, 0], [1*s, 1*s], [0, 1*s], [1*s, 0] ]
+    out = array.array('f', range(model.outputs()))
+
+    model.setprofile(True)
+    for ex in examples:
+        model.predict(array.array('h', ex), out)
+
+    predictions, trees, nodes, max_depth, depths, features = model.getprofile()
+    assert predictions == len(examples), predictions
+    assert trees == 3*len(examples), trees
+    assert 1 <= max_depth <= 3, max_depth
+    assert len(depths) == max_depth+1, depths
+    assert sum(depths) == trees, depths
+    assert sum(d*n for d, n in enumerate(depths)) == nodes, (depths, nodes)
+    assert len(features) == 2, features
+    assert sum(features) == nodes, (features, nodes)
+
+    # Enabling again resets, disabling removes counters
+    model.setprofile(True)
+    assert model.getprofile()[0:4] == (0, 0, 0, 0)
+    model.setprofile(False)
+    try:
+        model.getprofile()
+        assert False, 'should have raised'
+    except ValueError:
+        pass
+
+def test_trees_reorder():
+    """
+    Reordering nodes should not change the predictions
+    """
+
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        reference = emlearn_trees.load(f)
+
+    s = 32767 # max int16
+    examples = [ [0, 0], [1*s, 1*s], [0, 1*s], [1*s, 0], [s//2, s//3], [s//3, s//2] ]
+    inputs = array.array('h', [ v for ex in examples for v in ex ])
+    expect = array.array('f', range(len(examples)*reference.outputs()))
+    reference.predict_batch(inputs, expect)
+
+    # breadth-first, and hot-path first using sample data
+    for samples in (None, inputs):
+        with open('examples/xor_trees/xor_model.csv', 'r') as f:
+            model = emlearn_trees.load(f)
+        model.reorder(samples)
+        out = array.array('f', range(len(expect)))
+        model.predict_batch(inputs, out)
+        assert list(out) == list(expect), (samples, out, expect)
+
+def test_trees_many_features():
+    """
+    Models with more than 128 features should be supported
+    """
+
+    # One tree, splits on feature 200 then 299
+    csv = '\r\n'.join([ 'f,300', 'c,3', 'lb,0', 'l,0', 'l,1', 'l,2',
+        'r,0', 'n,200,0,-1,1', 'n,299,100,-2,-3' ])
+
+    model = emlearn_trees.load(io.StringIO(csv))
+    buf = io.BytesIO()
+    emlearn_trees.convert_csv_to_binary(io.StringIO(csv), buf)
+    in_place = emlearn_trees.load_binary(buf.getvalue(), in_place=True)
+
+    examples = [
+        # feature 200, feature 299, expected class
+        ( -1, 0, 0 ),
+        ( 1, 0, 1 ),
+        ( 1, 200, 2 ),
+    ]
+    features = array.array('h', range(300))
+    classes = array.array('B', [0])
+    for f200, f299, expect in examples:
+        features[200] = f200
+        features[299] = f299
+        for m in (model, in_place):
+            m.predict_batch(features, classes)
+            assert classes[0] == expect, (f200, f299, classes[0], expect)
+
+def test_trees_float_inputs():
+    """
+    Float inputs should give same results as int16, converted like int()
+    """
+
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        model = emlearn_trees.load(f)
+
+    s = 32767 # max int16
+    examples = [ [0.0, 0.0], [1e9, 1e9], [-0.9, 32766.9], [40000.0, -40000.0], [s/2, s/3] ]
+
+    n_outputs = model.outputs()
+    expect = array.array('f', range(n_outputs))
+    out = array.array('f', range(n_outputs))
+    for ex in examples:
+        converted = [ int(max(min(v, 32767), -32768)) for v in ex ]
+        model.predict(array.array('h', converted), expect)
+        model.predict(array.array('f', ex), out)
+        assert list(out) == list(expect), (ex, out, expect)
+
+    inputs = array.array('f', [ v for ex in examples for v in ex ])
+    classes = array.array('B', range(len(examples)))
+    model.predict_batch(inputs, classes)
+    expect_classes = array.array('B', range(len(examples)))
+    model.predict_batch(array.array('h', [ int(max(min(v, 32767), -32768)) for v in inputs ]), expect_classes)
+    assert list(classes) == list(expect_classes), (classes, expect_classes)
+
+def test_trees_multiple_models():
+    """
+    Several models in one pool should give same results as separate models
+    """
+
+    # Three classes. First tree splits on feature 1, second on feature 0
+    three_csv = '\r\n'.join([ 'f,2', 'c,3', 'l,0', 'l,1', 'l,2',
+        'r,0', 'r,1', 'n,1,0,-1,-3', 'n,0,0,-2,-3' ])
+
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        xor = emlearn_trees.load(f)
+    three = emlearn_trees.load(io.StringIO(three_csv))
+
+    # Load from CSV
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        pool = emlearn_trees.load_models([ f, io.StringIO(three_csv) ])
+
+    # Load from binary, with the second model after the first in the pool
+    buf = io.BytesIO()
+    emlearn_trees.convert_csv_to_binary(io.StringIO(three_csv), buf)
+    binary = emlearn_trees.new(5+2, 30+2, 4+3, 2)
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        emlearn_trees.load_model(binary, f)
+    assert binary.addmodel() == 1
+    binary.loadbinary(buf.getvalue())
+
+    s = 32767 # max int16
+    examples = [ [0, 0], [1*s, 1*s], [0, 1*s], [1*s, 0], [-s, 1*s], [-s, -s] ]
+
+    for m in (pool, binary):
+        assert m.outputs(0) == 2
+        assert m.outputs(1) == 3
+        for ex in examples:
+            inputs = array.array('h', ex)
+            expect = []
+            for model_id, separate in enumerate((xor, three)):
+                a = array.array('f', range(separate.outputs()))
+                b = array.array('f', range(separate.outputs()))
+                separate.predict(inputs, a)
+                m.predict(inputs, b, model_id)
+                assert list(a) == list(b), (model_id, ex, list(a), list(b))
+                expect += list(a)
+
+            out = array.array('f', range(2+3))
+            m.predict_all(inputs, out)
+            assert list(out) == expect, (ex, list(out), expect)
+
+    # A tree that is only a leaf, in a model after the first
+    leaf_csv = '\r\n'.join([ 'f,2', 'c,3', 'l,1', 'l,2', 'r,-2', 'r,0', 'n,0,0,-1,-2' ])
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        pool = emlearn_trees.load_models([ f, io.StringIO(leaf_csv) ])
+    buf = io.BytesIO()
+    emlearn_trees.convert_csv_to_binary(io.StringIO(leaf_csv), buf)
+    binary = emlearn_trees.new(5+2, 30+1, 4+2, 2)
+    with open('examples/xor_trees/xor_model.csv', 'r') as f:
+        emlearn_trees.load_model(binary, f)
+    binary.addmodel()
+    binary.loadbinary(buf.getvalue())
+
+    for m in (pool, binary):
+        out = array.array('f', range(3))
+        # first tree always votes class 2, second tree class 1 or 2
+        m.predict(array.array('h', [-s, 0]), out, 1)
+        assert list(out) == [0.0, 0.5, 0.5], list(out)
+        m.predict(array.array('h', [s, 0]), out, 1)
+        assert list(out) == [0.0, 0.0, 1.0], list(out)
+
 if __name__ == '__main__':
     test_trees_del()
     test_trees_xor()
-
+    test_trees_predict_batch()
+    test_trees_binary()
+    test_trees_load_sized()
+    test_trees_regression()
+    test_trees_predict_early()
+    test_trees_profile()
+    test_trees_reorder()
+    test_trees_many_features()
+    test_trees_float_inputs()
+    test_trees_multiple_models()